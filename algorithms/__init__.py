@@ -0,0 +1,22 @@
+import importlib
+
+# Реестр алгоритмов для headless-запуска: имя -> (модуль, класс).
+# Модули импортируются только при создании алгоритма, чтобы холодный старт CLI был быстрым.
+ALGORITHMS = {
+    'maxrects': ('algorithms.maxrects', 'MaxRectsPacker'),
+    'skyline': ('algorithms.skyline', 'SkylineBottomLeft'),
+    'guillotine': ('algorithms.guillotine', 'GuillotinePacker'),
+    'first_fit': ('algorithms.first_fit', 'FirstFitDecreasing'),
+    'optimizer': ('algorithms.optimizer', 'MultiStartOptimizer'),
+    'exact': ('algorithms.exact', 'BranchAndBoundSolver'),
+}
+
+
+def create_algorithm(name: str, **params):
+    """Создает PackingAlgorithm по имени из ALGORITHMS с параметрами конструктора"""
+    try:
+        module_name, class_name = ALGORITHMS[name]
+    except KeyError:
+        raise ValueError(f"Unknown algorithm: {name!r} (available: {', '.join(ALGORITHMS)})") from None
+    cls = getattr(importlib.import_module(module_name), class_name)
+    return cls(**params)
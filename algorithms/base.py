@@ -1,8 +1,45 @@
+import functools
 from abc import ABC, abstractmethod
-from typing import List
+from typing import Callable, List, Optional
+from instrumentation import METRICS
 from models.shape import Rectangle
+from models.part_store import FLAG_PLACED, PartStore
+
+# progress_callback(done, total, placed, sheet_no): placed - только что размещенная деталь или None
+ProgressCallback = Callable[[int, int, Optional[Rectangle], int], None]
+
+
+class PackingCancelled(Exception):
+    """Упаковка прервана: установлен cancel_event"""
+
+
+def _timed(kind: str, method):
+    """Обертка pack/pack_sheets: таймер '<kind>.<класс>' при включенных метриках, иначе прямой вызов"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if not METRICS.enabled:
+            return method(self, *args, **kwargs)
+        with METRICS.timer(f"{kind}.{type(self).__name__}"):
+            return method(self, *args, **kwargs)
+    wrapper.timed = True
+    return wrapper
+
 
 class PackingAlgorithm(ABC):
+    # Необязательные хуки для длинных упаковок (фоновый поток в UI).
+    # cancel_event - любой объект с is_set(), обычно threading.Event.
+    progress_callback: Optional[ProgressCallback] = None
+    cancel_event = None
+
+    def __init_subclass__(cls, **kwargs):
+        # Каждый алгоритм получает замер pack / pack_sheets без правок в самом алгоритме
+        super().__init_subclass__(**kwargs)
+        for kind in ('pack', 'pack_sheets'):
+            method = cls.__dict__.get(kind)
+            if method is not None and not getattr(method, '__isabstractmethod__', False) \
+                    and not getattr(method, 'timed', False):
+                setattr(cls, kind, _timed(kind, method))
+
     @abstractmethod
     def pack(self, shapes: List[Rectangle], sheet_width: float, sheet_height: float) -> List[Rectangle]:
         """
@@ -10,4 +47,68 @@ class PackingAlgorithm(ABC):
         Возвращает список размещенных деталей с обновленными координатами (x, y).
         Те детали, что не влезли, не попадают в возвращаемый список.
         """
-        pass
\ No newline at end of file
+        pass
+
+    def pack_sheets(self, shapes: List[Rectangle], sheet_width: float, sheet_height: float) -> List[List[Rectangle]]:
+        """
+        Раскладывает детали на столько листов, сколько потребуется.
+        Возвращает список раскладок - по одной на лист, координаты у каждого листа свои.
+        Детали, которые не влезают даже на пустой лист, не попадают ни в одну раскладку.
+
+        Базовая реализация просто вызывает pack() на остатках, лист за листом.
+        Алгоритмы со структурой свободного места переопределяют ее (см. first_fit_bins).
+        """
+        remaining = list(shapes)
+        sheets = []
+        callback = self.progress_callback
+        placed_total = 0
+
+        def forward(done, total, placed, sheet_no):
+            # Внутренний pack() считает прогресс по своему листу - пересчитываем на весь заказ
+            nonlocal placed_total
+            if placed is not None:
+                placed_total += 1
+            callback(placed_total, len(shapes), placed, len(sheets))
+
+        if callback is not None:
+            self.progress_callback = forward
+        try:
+            while remaining:
+                placed = self.pack(remaining, sheet_width, sheet_height)
+                if not placed:
+                    break
+                sheets.append(placed)
+                placed_ids = {id(s) for s in placed}
+                remaining = [s for s in remaining if id(s) not in placed_ids]
+        finally:
+            self.progress_callback = callback
+        return sheets
+
+    pack_sheets = _timed('pack_sheets', pack_sheets)
+
+    def pack_store(self, store: PartStore, sheet_width: float, sheet_height: float) -> int:
+        """
+        Упаковывает детали колоночного хранилища на несколько листов.
+        Алгоритм работает с легкими PartView, поэтому координаты и повороты
+        сразу пишутся в колонки; там же отмечаются FLAG_PLACED и номер листа.
+        Возвращает число листов.
+        """
+        for i in range(len(store)):
+            store.flags[i] &= ~FLAG_PLACED
+            store.sheet[i] = -1
+        sheets = self.pack_sheets(store.views(), sheet_width, sheet_height)
+        for sheet_no, sheet in enumerate(sheets):
+            for view in sheet:
+                store.flags[view.index] |= FLAG_PLACED
+                store.sheet[view.index] = sheet_no
+        return len(sheets)
+
+    def report_progress(self, done: int, total: int, placed: Optional[Rectangle] = None, sheet_no: int = 0):
+        """
+        Вызывается алгоритмом по ходу упаковки.
+        Бросает PackingCancelled, если запрошена отмена.
+        """
+        if self.cancel_event is not None and self.cancel_event.is_set():
+            raise PackingCancelled()
+        if self.progress_callback is not None:
+            self.progress_callback(done, total, placed, sheet_no)
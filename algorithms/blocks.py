@@ -0,0 +1,223 @@
+# algorithms/blocks.py
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+from instrumentation import METRICS
+from models.shape import Rectangle
+from models.item_class import ItemClass, group_items
+from algorithms.base import PackingAlgorithm
+
+
+@dataclass(slots=True)
+class Block(Rectangle):
+    """
+    Блок одинаковых деталей класса item, упакованный как одна деталь:
+    сверху cols x rows копий cell_width x cell_height, под ними cols2 x rows2 повернутых копий.
+    """
+    item: Optional[ItemClass] = None
+    cols: int = 1
+    rows: int = 1
+    cell_width: float = 0
+    cell_height: float = 0
+    cols2: int = 0
+    rows2: int = 0
+    first: int = 0 # индекс первой детали блока в item.parts
+
+    @property
+    def copies(self) -> int:
+        return self.cols * self.rows + self.cols2 * self.rows2
+
+    @property
+    def design_size(self) -> Tuple[float, float]:
+        """Размер блока до поворота: полосы сетки лежат одна под другой"""
+        return (max(self.cols * self.cell_width, self.cols2 * self.cell_height),
+                self.rows * self.cell_height + self.rows2 * self.cell_width)
+
+    def cells(self) -> List[Tuple[float, float, float, float]]:
+        """(x, y, width, height) копий в координатах блока до поворота, по порядку item.parts"""
+        w, h = self.cell_width, self.cell_height
+        cells = [(col * w, row * h, w, h) for row in range(self.rows) for col in range(self.cols)]
+        top = self.rows * h
+        cells += [(col * h, top + row * w, h, w) for row in range(self.rows2) for col in range(self.cols2)]
+        return cells
+
+
+class BlockPacker(PackingAlgorithm):
+    """
+    Упаковка по классам деталей поверх любого PackingAlgorithm.
+
+    Одинаковые детали (ItemClass: width, height, can_rotate, count) собираются в блоки:
+    целые листы (лучшая однородная раскладка класса), затем полоса из целых рядов,
+    а часть класса идет поштучно и закрывает щели.
+    Обернутый алгоритм видит блоки как обычные детали, поэтому число поисков позиции
+    зависит от числа классов и листов, а не от общего количества: 5000 кронштейнов -
+    несколько блоков вместо 5000 поисков. Позиции копий внутри блока раскладываются после упаковки.
+
+    Алгоритмы с планом резов (cut_sequences, гильотина) не поддерживаются: резы внутри блоков
+    в план не попали бы, и пила получила бы неполную последовательность.
+    """
+
+    def __init__(self, packer: PackingAlgorithm, min_copies: int = 4, min_fill: float = 0.95,
+                 reserve: float = 0.1, min_share: float = 0.5):
+        # min_copies - классы с меньшим числом деталей не собираются в блоки
+        # min_fill - доля площади листа, начиная с которой раскладка класса плотная:
+        #            остаток класса (меньше листа) собирается в полосу
+        # reserve - доля остатка (не меньше ряда), которая идет поштучно
+        # min_share - доля площади заказа, начиная с которой и неплотный класс собирается в целые листы
+        if hasattr(packer, 'cut_sequences'):
+            raise ValueError(f"{type(packer).__name__} produces a cut sequence; blocks are not supported for it")
+        self.packer = packer
+        self.min_copies = min_copies
+        self.min_fill = min_fill
+        self.reserve = reserve
+        self.min_share = min_share
+
+    @property
+    def allow_rotation(self) -> bool:
+        return getattr(self.packer, 'allow_rotation', True)
+
+    def _pattern(self, item: ItemClass, width: float,
+                 height: float) -> Tuple[float, float, int, int, int, int, bool]:
+        """
+        Раскладка с наибольшим числом копий на листе width x height:
+        (w, h, cols, rows, cols2, rows2, transposed) - rows рядов w x h и под ними rows2 рядов h x w.
+        Две полосы с разной ориентацией часто заполняют лист лучше одной сетки: 700x400 на 3000x1500 -
+        ряд стоя и два лежа, 15 копий против 14. transposed - полосы идут по повернутому листу (столбцами).
+        """
+        rotate = self.allow_rotation and item.can_rotate and item.width != item.height
+        orientations = [(item.width, item.height), (item.height, item.width)] if rotate else [(item.width, item.height)]
+        sheets = [(width, height, False), (height, width, True)] if rotate else [(width, height, False)]
+        best, best_count = (item.width, item.height, 0, 0, 0, 0, False), 0
+        for sheet_w, sheet_h, transposed in sheets:
+            for w, h in orientations:
+                if w > sheet_w or h > sheet_h:
+                    continue
+                cols, max_rows = int(sheet_w // w), int(sheet_h // h)
+                cols2 = int(sheet_w // h) if rotate and h <= sheet_w else 0
+                for rows in range(max_rows, 0, -1) if cols2 else (max_rows,):
+                    rows2 = int((sheet_h - rows * h) // w) if cols2 else 0
+                    count = cols * rows + cols2 * rows2
+                    if count > best_count:
+                        best, best_count = (w, h, cols, rows, cols2 if rows2 else 0, rows2, transposed), count
+        return best
+
+    def build_blocks(self, classes: List[ItemClass], sheet_width: float,
+                     sheet_height: float) -> Tuple[List[Block], List[Rectangle]]:
+        """
+        Классы -> блоки и детали, которые идут поштучно.
+        Каждые n копий (n - копий в лучшей однородной раскладке листа) - блок на целый лист.
+        Плотная раскладка (не меньше min_fill листа) собирается всегда, а ее остаток меньше листа -
+        в полосу из целых рядов; доля reserve остатка (не меньше ряда) идет поштучно и закрывает щели.
+        Неплотная - только если класс занимает не меньше min_share площади заказа: тогда поштучно он
+        был бы тысячами поисков, а щели его листов закрывать почти нечем. Неплотный класс-меньшинство
+        идет поштучно: его детали и соседние классы алгоритм смешивает лучше, чем листы блоков.
+        """
+        blocks, singles = [], []
+        total_area = sum(item.area for item in classes)
+        for item in classes:
+            if item.count < self.min_copies:
+                singles.extend(item.parts)
+                continue
+            w, h, cols, rows, cols2, rows2, transposed = self._pattern(item, sheet_width, sheet_height)
+            per_sheet = cols * rows + cols2 * rows2
+            if per_sheet < 2:
+                singles.extend(item.parts)
+                continue
+            dense = per_sheet * w * h >= self.min_fill * sheet_width * sheet_height
+            if not dense and item.area < self.min_share * total_area:
+                singles.extend(item.parts)
+                continue
+            full, rest = divmod(item.count, per_sheet)
+            shapes = [(cols, rows, cols2, rows2)] * full
+            if dense:
+                strip_rows = max(0, rest - max(cols, int(rest * self.reserve))) // cols
+                if cols * strip_rows > 1:
+                    shapes.append((cols, strip_rows, 0, 0))
+            first = 0
+            for block_cols, block_rows, block_cols2, block_rows2 in shapes:
+                block_w = max(block_cols * w, block_cols2 * h)
+                block_h = block_rows * h + block_rows2 * w
+                if transposed:
+                    # Полосы спроектированы для повернутого листа - блок сразу создается повернутым
+                    block_w, block_h = block_h, block_w
+                # Квадратный блок поворачивать незачем, а по размерам поворот было бы не отличить
+                block = Block(width=block_w, height=block_h, id=f"block{len(blocks)}",
+                              can_rotate=item.can_rotate and block_w != block_h,
+                              item=item, cols=block_cols, rows=block_rows, cell_width=w, cell_height=h,
+                              cols2=block_cols2, rows2=block_rows2, first=first)
+                blocks.append(block)
+                first += block.copies
+            singles.extend(item.parts[first:])
+        return blocks, singles
+
+    def _expand(self, block: Block) -> List[Rectangle]:
+        """
+        Раскладывает копии по полосам размещенного блока. Блок мог повернуть упаковщик или он создан
+        повернутым (раскладка для повернутого листа) - тогда полосы идут столбцами (транспонирование).
+        """
+        design_w, _ = block.design_size
+        turned = block.width != design_w
+        parts = block.item.parts[block.first:block.first + block.copies]
+        for part, (x, y, w, h) in zip(parts, block.cells()):
+            if turned:
+                x, y, w, h = y, x, h, w
+            if (part.width, part.height) != (w, h):
+                part.rotate()
+            part.x = block.x + x
+            part.y = block.y + y
+        return parts
+
+    def pack_classes(self, classes: List[ItemClass], sheet_width: float,
+                     sheet_height: float) -> List[List[Rectangle]]:
+        """Упаковывает классы деталей на листы; возвращает детали по листам, как pack_sheets"""
+        blocks, singles = self.build_blocks(classes, sheet_width, sheet_height)
+        total = sum(item.count for item in classes)
+        if METRICS.enabled:
+            METRICS.count('blocks', len(blocks))
+            METRICS.count('blocks.parts', total - len(singles))
+
+        callback = self.progress_callback
+        done = 0
+
+        def forward(_done, _total, placed, sheet_no):
+            # Обернутый алгоритм считает прогресс в блоках - пересчитываем в детали
+            nonlocal done
+            if placed is not None:
+                done += placed.copies if isinstance(placed, Block) else 1
+            callback(done, total, placed, sheet_no)
+
+        previous = self.packer.progress_callback, self.packer.cancel_event
+        self.packer.progress_callback = forward if callback is not None else previous[0]
+        self.packer.cancel_event = self.cancel_event if self.cancel_event is not None else previous[1]
+        try:
+            sheets = self.packer.pack_sheets(blocks + singles, sheet_width, sheet_height)
+            # Блок, не влезший даже на пустой лист (ограничения обернутого алгоритма), - поштучно
+            placed = {id(shape) for sheet in sheets for shape in sheet}
+            leftovers = [part for block in blocks if id(block) not in placed
+                         for part in block.item.parts[block.first:block.first + block.copies]]
+            if leftovers:
+                sheets += self.packer.pack_sheets(leftovers, sheet_width, sheet_height)
+        finally:
+            self.packer.progress_callback, self.packer.cancel_event = previous
+
+        return [[part for shape in sheet
+                 for part in (self._expand(shape) if isinstance(shape, Block) else (shape,))]
+                for sheet in sheets]
+
+    def pack_sheets(self, shapes: List[Rectangle], sheet_width: float, sheet_height: float) -> List[List[Rectangle]]:
+        return self.pack_classes(group_items(shapes, self.allow_rotation), sheet_width, sheet_height)
+
+    def pack(self, shapes: List[Rectangle], sheet_width: float, sheet_height: float) -> List[Rectangle]:
+        """Один лист: блоки не больше листа, поэтому лишние блоки класса просто не влезут"""
+        classes = group_items(shapes, self.allow_rotation)
+        blocks, singles = self.build_blocks(classes, sheet_width, sheet_height)
+        previous = self.packer.progress_callback, self.packer.cancel_event
+        if self.progress_callback is not None:
+            self.packer.progress_callback = self.progress_callback
+        if self.cancel_event is not None:
+            self.packer.cancel_event = self.cancel_event
+        try:
+            placed = self.packer.pack(blocks + singles, sheet_width, sheet_height)
+        finally:
+            self.packer.progress_callback, self.packer.cancel_event = previous
+        return [part for shape in placed
+                for part in (self._expand(shape) if isinstance(shape, Block) else (shape,))]
@@ -0,0 +1,198 @@
+# algorithms/cache.py
+import hashlib
+import json
+import os
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+from models.shape import Rectangle
+from algorithms.base import PackingAlgorithm
+
+# Запись раскладки: (позиция детали в каноническом порядке, лист, x, y, width, height)
+Placement = Tuple[int, int, float, float, float, float]
+
+
+def algorithm_params(packer: PackingAlgorithm) -> dict:
+    """Параметры алгоритма, влияющие на результат: публичные атрибуты простых типов"""
+    return {name: value for name, value in sorted(vars(packer).items())
+            if not name.startswith('_') and isinstance(value, (int, float, str, bool, tuple, type(None)))
+            and name not in ('progress_callback', 'cancel_event', 'evaluated')}
+
+
+class LayoutCache:
+    """
+    Кэш раскладок: LRU в памяти + (необязательно) каталог на диске, переживающий перезапуск.
+    Значение - список Placement, ключ - canonical_key().
+    """
+
+    def __init__(self, max_entries: int = 64, directory: Optional[str] = None, max_disk_entries: int = 4096):
+        # max_disk_entries - сколько файлов держать в directory; лишние удаляются, самые давние первыми
+        self.max_entries = max_entries
+        self.directory = directory
+        self.max_disk_entries = max_disk_entries
+        self._memory: 'OrderedDict[str, List[Placement]]' = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key: str) -> Optional[List[Placement]]:
+        layout = self._memory.get(key)
+        if layout is not None:
+            self._memory.move_to_end(key)
+            self.hits += 1
+            return layout
+        if self.directory and os.path.exists(self._path(key)):
+            try:
+                with open(self._path(key), encoding='utf-8') as f:
+                    layout = [tuple(entry) for entry in json.load(f)]
+            except (OSError, ValueError):
+                layout = None # битый файл - просто пересчитаем
+            if layout is not None:
+                try:
+                    os.utime(self._path(key)) # время использования - для вытеснения с диска
+                except OSError:
+                    pass
+                self._remember(key, layout)
+                self.hits += 1
+                return layout
+        self.misses += 1
+        return None
+
+    def put(self, key: str, layout: List[Placement]):
+        self._remember(key, layout)
+        if self.directory:
+            # Пишем во временный файл и атомарно переименовываем: параллельные процессы не увидят половину файла
+            tmp_path = f"{self._path(key)}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(layout, f)
+            os.replace(tmp_path, self._path(key))
+            self._evict_disk()
+
+    def _evict_disk(self):
+        """Оставляет на диске max_disk_entries самых недавно использованных раскладок"""
+        try:
+            entries = [entry for entry in os.scandir(self.directory)
+                       if entry.name.endswith('.json') and entry.is_file()]
+        except OSError:
+            return
+        if len(entries) <= self.max_disk_entries:
+            return
+        def used_at(entry):
+            try:
+                return entry.stat().st_mtime
+            except OSError:
+                return 0.0
+        entries.sort(key=used_at)
+        for entry in entries[:len(entries) - self.max_disk_entries]:
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass # уже удален соседним процессом
+
+    def _remember(self, key: str, layout: List[Placement]):
+        self._memory[key] = layout
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def clear(self):
+        self._memory.clear()
+
+
+class CachedPacker(PackingAlgorithm):
+    """
+    Мемоизация поверх любого PackingAlgorithm.
+
+    Ключ - хэш канонического мультимножества деталей (размеры + can_rotate), размеров листа,
+    имени и параметров алгоритма и context (например, отступ в UI). Детали отдаются
+    алгоритму в каноническом порядке, поэтому результат зависит только от ключа, а при
+    попадании позиции переносятся на Rectangle вызывающего кода: одинаковые детали взаимозаменяемы.
+    """
+
+    def __init__(self, packer: PackingAlgorithm, cache: Optional[LayoutCache] = None,
+                 context: Optional[Dict] = None):
+        self.packer = packer
+        self.cache = cache if cache is not None else LayoutCache()
+        self.context = context or {}
+
+    def _dims(self, shape: Rectangle) -> Tuple[float, float, bool]:
+        # Поворачиваемые детали при разрешенном повороте сравниваем в "лежачей" ориентации:
+        # 300x200 и 200x300 - одна и та же деталь
+        width, height = shape.width, shape.height
+        if shape.can_rotate and width < height and getattr(self.packer, 'allow_rotation', False):
+            width, height = height, width
+        return float(width), float(height), bool(shape.can_rotate)
+
+    def _canonical(self, shapes: List[Rectangle]) -> List[Rectangle]:
+        """Канонический порядок деталей; сами детали не меняются"""
+        return sorted(shapes, key=self._dims)
+
+    def canonical_key(self, canonical: List[Rectangle], sheet_width: float, sheet_height: float,
+                      multi_sheet: bool) -> str:
+        counts = OrderedDict()
+        for s in canonical:
+            dims = self._dims(s)
+            counts[dims] = counts.get(dims, 0) + 1
+        payload = {
+            'algorithm': f"{type(self.packer).__module__}.{type(self.packer).__name__}",
+            'params': algorithm_params(self.packer),
+            'sheet': [float(sheet_width), float(sheet_height)],
+            'multi_sheet': multi_sheet,
+            'context': self.context,
+            'parts': [[w, h, rot, count] for (w, h, rot), count in counts.items()],
+        }
+        raw = json.dumps(payload, sort_keys=True, default=str)
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def _run(self, shapes: List[Rectangle], sheet_width: float, sheet_height: float,
+             multi_sheet: bool) -> List[List[Rectangle]]:
+        canonical = self._canonical(list(shapes))
+        key = self.canonical_key(canonical, sheet_width, sheet_height, multi_sheet)
+
+        layout = self.cache.get(key)
+        if layout is None:
+            # Промах: считаем честно, прогресс и отмена - как у обернутого алгоритма.
+            # Алгоритму детали отдаются в канонической ориентации, чтобы результат зависел только от ключа;
+            # неразмещенным ниже возвращается исходная ориентация
+            turned = [s for s in canonical if (s.width, s.height) != self._dims(s)[:2]]
+            for s in turned:
+                s.rotate()
+            previous = self.packer.progress_callback, self.packer.cancel_event
+            self.packer.progress_callback = self.progress_callback
+            self.packer.cancel_event = self.cancel_event
+            try:
+                if multi_sheet:
+                    sheets = self.packer.pack_sheets(canonical, sheet_width, sheet_height)
+                else:
+                    sheets = [self.packer.pack(canonical, sheet_width, sheet_height)]
+                position = {id(s): i for i, s in enumerate(canonical)}
+                layout = [(position[id(s)], sheet_no, s.x, s.y, s.width, s.height)
+                          for sheet_no, sheet in enumerate(sheets) for s in sheet]
+            finally:
+                self.packer.progress_callback, self.packer.cancel_event = previous
+                for s in turned:
+                    s.rotate()
+            self.cache.put(key, layout)
+
+        # Попадание (или свежий результат): переносим позиции на детали вызывающего кода
+        result: List[List[Rectangle]] = []
+        for index, sheet_no, x, y, w, h in layout:
+            shape = canonical[index]
+            if (shape.width, shape.height) != (w, h):
+                shape.rotate() # через rotate(), чтобы PartView отметил поворот в хранилище
+            shape.x, shape.y = x, y
+            while len(result) <= sheet_no:
+                result.append([])
+            result[sheet_no].append(shape)
+        self.report_progress(len(shapes), len(shapes))
+        return result
+
+    def pack(self, shapes: List[Rectangle], sheet_width: float, sheet_height: float) -> List[Rectangle]:
+        sheets = self._run(shapes, sheet_width, sheet_height, multi_sheet=False)
+        return sheets[0] if sheets else []
+
+    def pack_sheets(self, shapes: List[Rectangle], sheet_width: float, sheet_height: float) -> List[List[Rectangle]]:
+        return self._run(shapes, sheet_width, sheet_height, multi_sheet=True)
@@ -0,0 +1,448 @@
+# algorithms/exact.py
+import math
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+from instrumentation import METRICS
+from models.shape import Rectangle
+from algorithms.base import PackingAlgorithm
+from algorithms.maxrects import MaxRectsBin
+from algorithms.multi_sheet import first_fit_bins, fits_empty_sheet, sort_decreasing
+
+# Деталь для решателя: (width, height, can_rotate)
+Dims = Tuple[float, float, bool]
+# Размещение на листе: (x, y, width, height) - width/height уже с учетом поворота
+Placement = Tuple[float, float, float, float]
+
+
+@dataclass
+class SolverReport:
+    """
+    Итог последнего запуска. objective - найденное решение, bound - доказанная оценка:
+    для pack_sheets - число листов и нижняя граница, для pack - размещенная площадь и верхняя граница.
+    """
+    objective: float
+    bound: float
+    optimal: bool
+    nodes: int
+    elapsed: float
+
+    @property
+    def gap(self) -> float:
+        """Относительный зазор между решением и оценкой (0 - оптимальность доказана)"""
+        if self.optimal:
+            return 0.0
+        return abs(self.objective - self.bound) / max(self.objective, self.bound, 1e-9)
+
+
+class _OutOfBudget(Exception):
+    """Внутренний перебор одного листа исчерпал лимит узлов или времени"""
+
+
+def _dims_fit(w: float, h: float, rot: bool, sheet_width: float, sheet_height: float) -> bool:
+    return (w <= sheet_width and h <= sheet_height) or (rot and h <= sheet_width and w <= sheet_height)
+
+
+def _sample(values: List[float], limit: int = 40) -> List[float]:
+    """Не больше limit значений параметра: максимум по подмножеству - тоже нижняя граница"""
+    if len(values) <= limit:
+        return values
+    step = len(values) / limit
+    return [values[int(k * step)] for k in range(limit)]
+
+
+def lower_bound(dims: Sequence[Dims], sheet_width: float, sheet_height: float, allow_rotation: bool = True) -> int:
+    """
+    Нижняя граница числа листов: max из площадной (L1), "непрерывных" одномерных оценок
+    и L2 (Martello & Vigo, 1998). Для поворачиваемых деталей L2 и одномерные оценки
+    считаются по вписанному квадрату min(w, h) x min(w, h) - он влезает в любой ориентации,
+    поэтому оценка остается корректной.
+    """
+    if not dims:
+        return 0
+    sheet_area = sheet_width * sheet_height
+    bound = math.ceil(sum(w * h for w, h, _ in dims) / sheet_area - 1e-9)
+
+    relaxed = []
+    for w, h, rot in dims:
+        if allow_rotation and rot:
+            side = min(w, h)
+            relaxed.append((side, side))
+        else:
+            relaxed.append((w, h))
+
+    # Детали шире половины листа не стоят рядом - только друг под другом (и аналогично по высоте)
+    wide = sum(h for w, h in relaxed if w > sheet_width / 2)
+    tall = sum(w for w, h in relaxed if h > sheet_height / 2)
+    bound = max(bound, math.ceil(wide / sheet_height - 1e-9), math.ceil(tall / sheet_width - 1e-9))
+
+    # L2: I1 - детали, рядом с которыми не встанет ничто из I3, I2 - "больше половины" по обеим осям
+    ps = _sample(sorted({0} | {w for w, _ in relaxed if w <= sheet_width / 2}))
+    qs = _sample(sorted({0} | {h for _, h in relaxed if h <= sheet_height / 2}))
+    for p in ps:
+        for q in qs:
+            big = 0
+            i2_residual = 0.0
+            i3_area = 0.0
+            for w, h in relaxed:
+                if w > sheet_width - p and h > sheet_height - q:
+                    big += 1
+                elif w > sheet_width / 2 and h > sheet_height / 2:
+                    big += 1
+                    i2_residual += sheet_area - w * h
+                elif w >= p and h >= q:
+                    i3_area += w * h
+            extra = math.ceil((i3_area - i2_residual) / sheet_area - 1e-9)
+            bound = max(bound, big + max(0, extra))
+    return bound
+
+
+class SheetFeasibility:
+    """
+    Точная проверка "влезает ли набор деталей на один лист".
+
+    Сначала быстрые жадные попытки (MaxRects с разными эвристиками), затем полный перебор
+    по угловым точкам огибающей (Martello, Pisinger & Vigo, 2000): детали ставятся только
+    в вогнутые углы "лестницы" уже размещенных, что не теряет решений.
+    Отсечения: свободная площадь вне огибающей и запоминание уже провалившихся состояний
+    (одинаковый остаток деталей + одинаковая огибающая = одинаковый исход).
+    Результаты кэшируются по мультимножеству размеров.
+    """
+
+    def __init__(self, sheet_width: float, sheet_height: float, allow_rotation: bool = True,
+                 node_limit: int = 20000):
+        self.sheet_width = sheet_width
+        self.sheet_height = sheet_height
+        self.allow_rotation = allow_rotation
+        self.node_limit = node_limit
+        self.deadline = float('inf')
+        self.nodes = 0
+        self.unresolved = 0 # сколько проверок не уложились в лимит (ответ "не знаю")
+        self._cache: Dict[tuple, object] = {}
+
+    def check(self, dims: Sequence[Dims]):
+        """
+        Возвращает список Placement в порядке key(dims) - влезает; False - доказано, что нет;
+        None - лимит исчерпан, ответ неизвестен.
+        """
+        key = tuple(sorted(dims, reverse=True))
+        if key in self._cache:
+            return self._cache[key]
+        result = self._solve(key)
+        if result is None:
+            self.unresolved += 1
+        else:
+            self._cache[key] = result
+        return result
+
+    def _solve(self, items: Tuple[Dims, ...]):
+        sheet_w, sheet_h = self.sheet_width, self.sheet_height
+        if sum(w * h for w, h, _ in items) > sheet_w * sheet_h:
+            return False
+        if not all(_dims_fit(w, h, self.allow_rotation and r, sheet_w, sheet_h) for w, h, r in items):
+            return False
+
+        greedy = self._greedy(items)
+        if greedy is not None:
+            return greedy
+
+        placements = [None] * len(items)
+        remaining = list(range(len(items)))
+        failed = set()
+        budget = [self.node_limit]
+        try:
+            if self._search(items, remaining, [], placements, failed, budget):
+                return placements
+            return False
+        except _OutOfBudget:
+            return None
+
+    def _greedy(self, items: Tuple[Dims, ...]):
+        for heuristic in MaxRectsBin.HEURISTICS:
+            free_space = MaxRectsBin(self.sheet_width, self.sheet_height, heuristic, self.allow_rotation)
+            shapes = [Rectangle(w, h, id=str(i), can_rotate=r) for i, (w, h, r) in enumerate(items)]
+            if all(free_space.insert(s) for s in sort_decreasing(shapes, self.allow_rotation)):
+                placements = [None] * len(items)
+                for s in shapes:
+                    placements[int(s.id)] = (s.x, s.y, s.width, s.height)
+                return placements
+        return None
+
+    def _corners(self, placed: List[Placement]):
+        """Вогнутые углы огибающей и ее площадь. Ось Y вниз, огибающая прижата к углу (0, 0)."""
+        if not placed:
+            return [(0, 0)], 0.0
+        rights = sorted({0} | {x + w for x, _, w, _ in placed})
+        corners = []
+        area = 0.0
+        prev_y = None
+        for k, x in enumerate(rights):
+            y = max((py + ph for px, py, pw, ph in placed if px + pw > x), default=0)
+            next_x = rights[k + 1] if k + 1 < len(rights) else x
+            area += (next_x - x) * y
+            if (prev_y is None or y < prev_y) and x < self.sheet_width and y < self.sheet_height:
+                corners.append((x, y))
+            prev_y = y
+        return corners, area
+
+    def _search(self, items, remaining: List[int], placed: List[Placement], placements,
+                failed: set, budget: List[int]) -> bool:
+        if not remaining:
+            return True
+        budget[0] -= 1
+        self.nodes += 1
+        if budget[0] < 0 or (self.nodes & 255 == 0 and time.monotonic() > self.deadline):
+            raise _OutOfBudget()
+
+        corners, envelope_area = self._corners(placed)
+        left_area = sum(items[i][0] * items[i][1] for i in remaining)
+        if left_area > self.sheet_width * self.sheet_height - envelope_area:
+            return False
+        state = (tuple(sorted(items[i] for i in remaining)), tuple(corners))
+        if state in failed:
+            return False
+
+        tried = set()
+        for pos, i in enumerate(remaining):
+            w, h, rot = items[i]
+            if items[i] in tried:
+                continue # одинаковые детали взаимозаменяемы
+            tried.add(items[i])
+            orientations = [(w, h)]
+            if self.allow_rotation and rot and w != h:
+                orientations.append((h, w))
+            rest = remaining[:pos] + remaining[pos + 1:]
+            for x, y in corners:
+                for ow, oh in orientations:
+                    if x + ow > self.sheet_width or y + oh > self.sheet_height:
+                        continue
+                    placed.append((x, y, ow, oh))
+                    placements[i] = (x, y, ow, oh)
+                    if self._search(items, rest, placed, placements, failed, budget):
+                        return True
+                    placed.pop()
+        failed.add(state)
+        return False
+
+
+class BranchAndBoundSolver(PackingAlgorithm):
+    """
+    Точный (в пределах лимита времени) решатель для небольших и средних заказов.
+
+    pack_sheets: минимизация числа листов. Ветвление - в какой лист пойдет очередная деталь
+    (по убыванию площади); начальное решение - лучший жадный MaxRects; отсечение по нижней
+    границе (остаточная площадь открытых листов, L1/L2 в корне). Доминирование: одинаковые
+    детали идут в листы по неубыванию номера, листы с одинаковым содержимым пробуются один раз,
+    новый лист открывается одним способом.
+    pack: максимизация размещенной площади на одном листе (включить/исключить деталь).
+
+    После запуска self.last_report (SolverReport): доказана ли оптимальность и какой остался зазор.
+    Если отдельная проверка листа не уложилась в node_limit, ветка считается невозможной,
+    а оптимальность не заявляется - зазор считается от корневой оценки.
+    """
+
+    def __init__(self, time_limit: float = 30.0, allow_rotation: bool = True, node_limit: int = 20000):
+        # time_limit - секунды на поиск; node_limit - узлов перебора на одну проверку листа
+        self.time_limit = time_limit
+        self.allow_rotation = allow_rotation
+        self.node_limit = node_limit
+        self.last_report: Optional[SolverReport] = None
+
+    # --- Общее ---
+
+    def _prepare(self, shapes: List[Rectangle], sheet_width: float, sheet_height: float):
+        """Детали, влезающие на пустой лист, в порядке убывания площади (одинаковые подряд)"""
+        fitting = [s for s in shapes if fits_empty_sheet(s, sheet_width, sheet_height, self.allow_rotation)]
+        fitting.sort(key=lambda s: (s.width * s.height, max(s.width, s.height), s.width, s.can_rotate), reverse=True)
+        dims = [(s.width, s.height, bool(s.can_rotate)) for s in fitting]
+        return fitting, dims
+
+    def _apply(self, shapes: List[Rectangle], bins: List[List[int]], feasibility: SheetFeasibility,
+               dims: List[Dims]) -> List[List[Rectangle]]:
+        """Переносит размещения листов (из кэша проверок) на исходные детали"""
+        sheets = []
+        for content in bins:
+            placements = feasibility.check([dims[i] for i in content])
+            # Порядок размещений - как у ключа проверки: сортировка размеров по убыванию (стабильная)
+            ordered = sorted(content, key=lambda i: dims[i], reverse=True)
+            sheet = []
+            for i, (x, y, w, h) in zip(ordered, placements):
+                shape = shapes[i]
+                if (w, h) != (shape.width, shape.height):
+                    shape.rotate()
+                shape.x, shape.y = x, y
+                sheet.append(shape)
+            sheets.append(sheet)
+        return sheets
+
+    def _progress(self, started: float):
+        # Прогресс - доля израсходованного лимита времени (заодно проверка отмены)
+        budget_ms = max(1, int(self.time_limit * 1000))
+        self.report_progress(min(budget_ms, int((time.monotonic() - started) * 1000)), budget_ms)
+
+    # --- Минимум листов ---
+
+    def _greedy_bins(self, dims: List[Dims], sheet_width: float, sheet_height: float) -> List[List[int]]:
+        best = None
+        for heuristic in MaxRectsBin.HEURISTICS:
+            copies = [Rectangle(w, h, id=str(i), can_rotate=r) for i, (w, h, r) in enumerate(dims)]
+            sheets = first_fit_bins(sort_decreasing(copies, self.allow_rotation), sheet_width, sheet_height,
+                                    lambda: MaxRectsBin(sheet_width, sheet_height, heuristic, self.allow_rotation),
+                                    self.allow_rotation)
+            if best is None or len(sheets) < len(best):
+                best = [[int(s.id) for s in sheet] for sheet in sheets]
+        return best
+
+    def pack_sheets(self, shapes: List[Rectangle], sheet_width: float, sheet_height: float) -> List[List[Rectangle]]:
+        started = time.monotonic()
+        deadline = started + self.time_limit
+        fitting, dims = self._prepare(shapes, sheet_width, sheet_height)
+        feasibility = SheetFeasibility(sheet_width, sheet_height, self.allow_rotation, self.node_limit)
+        feasibility.deadline = deadline
+        if not fitting:
+            self.last_report = SolverReport(0, 0, True, 0, 0.0)
+            return []
+
+        incumbent = self._greedy_bins(dims, sheet_width, sheet_height)
+        for content in incumbent:
+            # Жадные листы заведомо реализуемы - кладем их в кэш проверок
+            feasibility.check([dims[i] for i in content])
+        root_bound = lower_bound(dims, sheet_width, sheet_height, self.allow_rotation)
+
+        sheet_area = sheet_width * sheet_height
+        areas = [w * h for w, h, _ in dims]
+        area_after = [0.0] * (len(dims) + 1)
+        for i in range(len(dims) - 1, -1, -1):
+            area_after[i] = area_after[i + 1] + areas[i]
+
+        best = [incumbent]
+        nodes = [0]
+        timed_out = [False]
+        bins: List[List[int]] = []
+        used: List[float] = []
+        bin_of = [-1] * len(dims)
+
+        def search(i: int):
+            if len(best[0]) <= root_bound:
+                return # достигнута нижняя граница - лучше не бывает
+            nodes[0] += 1
+            if nodes[0] & 63 == 0:
+                self._progress(started)
+                if time.monotonic() > deadline:
+                    timed_out[0] = True
+            if timed_out[0]:
+                return
+            if i == len(dims):
+                best[0] = [list(b) for b in bins]
+                return
+            # Нижняя граница узла: остаток площади сверх свободного места открытых листов
+            free = sum(sheet_area - u for u in used)
+            need = len(bins) + max(0, math.ceil((area_after[i] - free) / sheet_area - 1e-9))
+            if need >= len(best[0]):
+                return
+
+            first_bin = bin_of[i - 1] if i > 0 and dims[i] == dims[i - 1] else 0
+            tried = set()
+            for b in range(max(0, first_bin), len(bins)):
+                if used[b] + areas[i] > sheet_area:
+                    continue
+                content_key = tuple(sorted(dims[j] for j in bins[b]))
+                if content_key in tried:
+                    continue
+                tried.add(content_key)
+                if not feasibility.check([dims[j] for j in bins[b]] + [dims[i]]):
+                    continue
+                bins[b].append(i)
+                used[b] += areas[i]
+                bin_of[i] = b
+                search(i + 1)
+                bins[b].pop()
+                used[b] -= areas[i]
+            if len(bins) + 1 < len(best[0]):
+                bins.append([i])
+                used.append(areas[i])
+                bin_of[i] = len(bins) - 1
+                search(i + 1)
+                bins.pop()
+                used.pop()
+            bin_of[i] = -1
+
+        search(0)
+
+        solution = best[0]
+        exhaustive = not timed_out[0] and feasibility.unresolved == 0
+        proved = len(solution) <= root_bound or exhaustive
+        self.last_report = SolverReport(objective=len(solution),
+                                        bound=len(solution) if proved else root_bound,
+                                        optimal=proved, nodes=nodes[0] + feasibility.nodes,
+                                        elapsed=time.monotonic() - started)
+        METRICS.count('exact.nodes', self.last_report.nodes)
+        return self._apply(fitting, solution, feasibility, dims)
+
+    # --- Максимум площади на одном листе ---
+
+    def pack(self, shapes: List[Rectangle], sheet_width: float, sheet_height: float) -> List[Rectangle]:
+        started = time.monotonic()
+        deadline = started + self.time_limit
+        fitting, dims = self._prepare(shapes, sheet_width, sheet_height)
+        feasibility = SheetFeasibility(sheet_width, sheet_height, self.allow_rotation, self.node_limit)
+        feasibility.deadline = deadline
+        sheet_area = sheet_width * sheet_height
+        areas = [w * h for w, h, _ in dims]
+
+        # Начальное решение - жадный MaxRects на одном листе
+        best_content: List[int] = []
+        for heuristic in MaxRectsBin.HEURISTICS:
+            free_space = MaxRectsBin(sheet_width, sheet_height, heuristic, self.allow_rotation)
+            copies = [Rectangle(w, h, id=str(i), can_rotate=r) for i, (w, h, r) in enumerate(dims)]
+            content = [int(s.id) for s in sort_decreasing(copies, self.allow_rotation) if free_space.insert(s)]
+            if sum(areas[i] for i in content) > sum(areas[i] for i in best_content):
+                best_content = content
+        if best_content:
+            feasibility.check([dims[i] for i in best_content])
+        best = [sum(areas[i] for i in best_content), best_content]
+        upper = min(sheet_area, sum(areas))
+
+        area_after = [0.0] * (len(dims) + 1)
+        for i in range(len(dims) - 1, -1, -1):
+            area_after[i] = area_after[i + 1] + areas[i]
+
+        nodes = [0]
+        timed_out = [False]
+        chosen: List[int] = []
+
+        def search(i: int, area: float):
+            if best[0] >= upper or timed_out[0]:
+                return
+            nodes[0] += 1
+            if nodes[0] & 63 == 0:
+                self._progress(started)
+                if time.monotonic() > deadline:
+                    timed_out[0] = True
+                    return
+            if area > best[0]:
+                best[0], best[1] = area, list(chosen)
+            if i == len(dims) or min(sheet_area, area + area_after[i]) <= best[0]:
+                return
+            # Одинаковые детали берем "слева направо": если предыдущую такую же не взяли,
+            # взять эту - та же ветка, что уже перебрана
+            skipped_twin = i > 0 and dims[i] == dims[i - 1] and (not chosen or chosen[-1] != i - 1)
+            # Сначала "взять" - быстрее находит хорошие решения
+            if (not skipped_twin and area + areas[i] <= sheet_area and
+                    feasibility.check([dims[j] for j in chosen] + [dims[i]])):
+                chosen.append(i)
+                search(i + 1, area + areas[i])
+                chosen.pop()
+            search(i + 1, area)
+
+        search(0, 0.0)
+
+        exhaustive = not timed_out[0] and feasibility.unresolved == 0
+        proved = best[0] >= upper or exhaustive
+        self.last_report = SolverReport(objective=best[0], bound=best[0] if proved else upper,
+                                        optimal=proved, nodes=nodes[0] + feasibility.nodes,
+                                        elapsed=time.monotonic() - started)
+        METRICS.count('exact.nodes', self.last_report.nodes)
+        if not best[1]:
+            return []
+        return self._apply(fitting, [best[1]], feasibility, dims)[0]
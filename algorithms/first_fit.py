@@ -1,50 +1,188 @@
 # algorithms/first_fit.py
-from typing import List
+from typing import List, Optional
+
+from instrumentation import METRICS
 from models.shape import Rectangle
+from models.spatial_index import SpatialGrid
+from models.collision import get_backend
 from algorithms.base import PackingAlgorithm
+from algorithms.multi_sheet import sort_decreasing
 
 class FirstFitDecreasing(PackingAlgorithm):
-    def __init__(self, step: int = 20):
+    def __init__(self, step: int = 20, allow_rotation: bool = True, backend: Optional[str] = None):
         # step - шаг сетки поиска. Чем меньше, тем плотнее, но медленнее.
+        # allow_rotation - пробовать поворот на 90° (только для деталей с can_rotate=True)
+        # backend - проверка коллизий: 'numpy' (пакетно, models/collision.py), 'python' (поштучно
+        #           через SpatialGrid), 'auto' или None (из CUTTING_COLLISION_BACKEND). Можно менять между вызовами.
         self.step = step
+        self.allow_rotation = allow_rotation
+        self.backend = backend
 
     def pack(self, shapes: List[Rectangle], sheet_width: float, sheet_height: float) -> List[Rectangle]:
         # 1. Сортируем: сначала самые высокие, потом широкие
         # Это эвристика: высокие детали сложнее всего впихнуть в оставшиеся щели
-        sorted_shapes = sorted(shapes, key=lambda s: s.height, reverse=True)
-        
+        sorted_shapes = sort_decreasing(shapes, self.allow_rotation)
+
+        collision = get_backend(self.backend)
+        if collision.name == 'numpy':
+            return self._pack_batched(sorted_shapes, sheet_width, sheet_height, collision)
+        return self._pack_scan(sorted_shapes, sheet_width, sheet_height)
+
+    def _orientations(self, shape: Rectangle):
+        orientations = [(shape.width, shape.height)]
+        if self.allow_rotation and shape.can_rotate and shape.width != shape.height:
+            orientations.append((shape.height, shape.width))
+        return orientations
+
+    def _pack_scan(self, sorted_shapes: List[Rectangle], sheet_width: float, sheet_height: float) -> List[Rectangle]:
+        """Поштучный перебор сетки: каждая точка проверяется через SpatialGrid"""
         placed_shapes = []
+        # Индекс уже размещенных: проверка коллизии смотрит только соседние ячейки
+        placed_index = SpatialGrid(cell_size=self._cell_size(sorted_shapes))
+        # Копии одной детали идут подряд (сортировка), а размещения только добавляют препятствия:
+        # точки сетки до места предыдущей копии так и остались занятыми - продолжаем с места остановки
+        last_class, resume = None, None # resume - (y, x) последней копии или None, если она не влезла
         
-        for shape in sorted_shapes:
+        for done, shape in enumerate(sorted_shapes, 1):
             # Сбрасываем позицию
             shape.x, shape.y = 0, 0
             is_placed = False
+
+            # Обе ориентации проверяются в одной и той же точке сетки, за один проход
+            original = (shape.width, shape.height)
+            orientations = self._orientations(shape)
+            min_w = min(w for w, _ in orientations)
+            min_h = min(h for _, h in orientations)
+            cols = len(range(0, int(sheet_width - min_w) + 1, self.step))
+            rows = len(range(0, int(sheet_height - min_h) + 1, self.step))
+
+            item_class = tuple(sorted(orientations))
+            start_y, start_x, skipped = 0, 0, 0
+            if item_class == last_class:
+                if resume is None:
+                    start_y = rows * self.step # предыдущая такая же не влезла - не влезет и эта
+                else:
+                    start_y, start_x = resume[0], resume[1] + self.step
+                skipped = min(rows * cols, start_y // self.step * cols + start_x // self.step)
+            last_class = item_class
             
             # 2. Перебираем координаты (Scanline)
             # Ищем позицию: Y (строки), потом X (столбцы)
             # Внимание: для скорости мы идем с шагом self.step
-            for y in range(0, int(sheet_height - shape.height) + 1, self.step):
-                for x in range(0, int(sheet_width - shape.width) + 1, self.step):
+            for y in range(start_y, int(sheet_height - min_h) + 1, self.step):
+                for x in range(start_x if y == start_y else 0, int(sheet_width - min_w) + 1, self.step):
+                    for w, h in orientations:
+                        if x + w > sheet_width or y + h > sheet_height:
+                            continue
                     
-                    # Пробуем поставить деталь сюда
-                    shape.x = x
-                    shape.y = y
+                        # Пробуем поставить деталь сюда
+                        shape.width, shape.height = w, h
+                        shape.x = x
+                        shape.y = y
                     
-                    # 3. Проверяем коллизии
-                    if not self._has_collision(shape, placed_shapes):
-                        placed_shapes.append(shape)
-                        is_placed = True
-                        break # Переходим к следующей детали
+                        # 3. Проверяем коллизии
+                        if not self._has_collision(shape, placed_index):
+                            placed_shapes.append(shape)
+                            placed_index.insert(shape)
+                            is_placed = True
+                            break # Переходим к следующей детали
+
+                    if is_placed:
+                        break
                 
                 if is_placed:
                     break
             
             # Если не влезла - просто не добавляем в placed_shapes
+            resume = (y, x) if is_placed else None
+            if not is_placed:
+                shape.width, shape.height = original
+            if METRICS.enabled:
+                # Сколько точек сетки перебрано - считаем по месту остановки, а не в горячем цикле
+                # (оценка сверху: каждая точка с каждой ориентацией - одна проверка коллизии)
+                tried = (y // self.step * cols + x // self.step + 1 if is_placed else rows * cols) - skipped
+                METRICS.count('candidates', tried * len(orientations))
+                METRICS.count('collision.checks', tried * len(orientations))
+            self.report_progress(done, len(sorted_shapes), shape if is_placed else None)
             
         return placed_shapes
 
-    def _has_collision(self, current: Rectangle, others: List[Rectangle]) -> bool:
-        for other in others:
-            if current.intersects(other):
-                return True
-        return False
\ No newline at end of file
+    def _pack_batched(self, sorted_shapes: List[Rectangle], sheet_width: float, sheet_height: float,
+                      collision) -> List[Rectangle]:
+        """
+        Тот же порядок перебора (Y, затем X, затем ориентация), но точки сетки проверяются
+        блоками строк: одна операция NumPy на блок против всех размещенных деталей.
+        """
+        import numpy as np
+        n = len(sorted_shapes)
+        # Колонки размещенных деталей: заранее выделяем место под все
+        placed_x, placed_y = np.empty(n), np.empty(n)
+        placed_w, placed_h = np.empty(n), np.empty(n)
+        count = 0
+        placed_shapes = []
+        # Как в _pack_scan: следующая копия той же детали ищет место только после предыдущей
+        last_class, resume = None, None
+
+        for done, shape in enumerate(sorted_shapes, 1):
+            best = None # (y, x, номер ориентации)
+            orientations = self._orientations(shape)
+            item_class = tuple(sorted(orientations))
+            same_class, last_class = item_class == last_class, item_class
+            if same_class and resume is None:
+                self.report_progress(done, n, None)
+                continue
+            for o, (w, h) in enumerate(orientations):
+                xs = np.arange(0, int(sheet_width - w) + 1, self.step, dtype=np.float64)
+                ys = np.arange(0, int(sheet_height - h) + 1, self.step, dtype=np.float64)
+                if xs.size == 0 or ys.size == 0:
+                    continue
+                rows_per_block = max(1, 4096 // xs.size)
+                first_row = int(np.searchsorted(ys, resume[0])) if same_class else 0
+                for start in range(first_row, ys.size, rows_per_block):
+                    block = ys[start:start + rows_per_block]
+                    if best is not None and block[0] > best[0]:
+                        break # дальше только позиции ниже уже найденной
+                    # В блок попадают только детали, пересекающие его полосу по Y
+                    band_top, band_bottom = block[0], block[-1] + h
+                    near = ((placed_y[:count] < band_bottom) &
+                            (placed_y[:count] + placed_h[:count] > band_top))
+                    cand_y = np.repeat(block, xs.size)
+                    cand_x = np.tile(xs, block.size)
+                    if METRICS.enabled:
+                        METRICS.count('candidates', cand_x.size)
+                    mask = collision.feasible_mask(cand_x, cand_y, w, h,
+                                                   placed_x[:count][near], placed_y[:count][near],
+                                                   placed_w[:count][near], placed_h[:count][near],
+                                                   sheet_width, sheet_height)
+                    if same_class and block[0] == resume[0]:
+                        mask[:xs.size] &= xs > resume[1]
+                    hits = np.flatnonzero(mask)
+                    if hits.size:
+                        first = hits[0]
+                        candidate = (cand_y[first], cand_x[first], o)
+                        if best is None or candidate < best:
+                            best = candidate
+                        break
+
+            if best is not None:
+                y, x, o = best
+                shape.width, shape.height = orientations[o]
+                shape.x, shape.y = float(x), float(y)
+                placed_x[count], placed_y[count] = shape.x, shape.y
+                placed_w[count], placed_h[count] = shape.width, shape.height
+                count += 1
+                placed_shapes.append(shape)
+            resume = (best[0], best[1]) if best is not None else None
+            self.report_progress(done, n, shape if best is not None else None)
+
+        return placed_shapes
+
+    def _cell_size(self, shapes: List[Rectangle]) -> float:
+        # Ячейка порядка среднего размера детали: в ней оказывается всего несколько соседей
+        if not shapes:
+            return max(self.step, 1)
+        average = sum(s.width + s.height for s in shapes) / (2 * len(shapes))
+        return max(average, self.step, 1)
+
+    def _has_collision(self, current: Rectangle, placed_index: SpatialGrid) -> bool:
+        return placed_index.any_intersects(current)
\ No newline at end of file
@@ -0,0 +1,256 @@
+# algorithms/guillotine.py
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+from instrumentation import METRICS
+from models.shape import Rectangle
+from algorithms.base import PackingAlgorithm
+from algorithms.multi_sheet import first_fit_bins, sort_decreasing
+
+
+@dataclass
+class Cut:
+    """
+    Один сквозной рез. Линия (x1, y1) - (x2, y2) проходит по границе детали (или рабочей
+    области листа), пропил шириной kerf уходит от нее в сторону отхода. depth - уровень в дереве резов:
+    0 - обрезка кромки, 1 - первые резы листа, 2 - резы полученных полос и т.д.
+    """
+    sheet: int
+    x1: float
+    y1: float
+    x2: float
+    y2: float
+    depth: int
+
+    @property
+    def vertical(self) -> bool:
+        return self.x1 == self.x2
+
+
+class GuillotineBin:
+    """
+    Гильотинный раскрой одного листа (J. Jylänki, GUILLOTINE): свободное место - набор
+    непересекающихся прямоугольников, каждая деталь ставится в угол одного из них,
+    остаток делится одним сквозным резом и еще одним резом полосы с деталью.
+    Так любая раскладка режется форматно-раскроечной пилой.
+
+    Пропил учитывается так: деталь занимает w + kerf, а рабочая область расширена
+    на kerf - у правого/нижнего края пропил уходит в обрезанную кромку.
+    Узлы дерева резов (свободные прямоугольники и их разрезы) хранятся для cut_sequence().
+    """
+
+    CHOICES = ('baf', 'bssf', 'blsf')
+    SPLITS = ('sas', 'las', 'slas', 'llas', 'minas', 'maxas')
+
+    def __init__(self, width: float, height: float, choice: str = 'baf', split: str = 'slas',
+                 kerf: float = 0, trim: float = 0, allow_rotation: bool = True):
+        if choice not in self.CHOICES:
+            raise ValueError(f"Unknown guillotine choice heuristic: {choice!r}")
+        if split not in self.SPLITS:
+            raise ValueError(f"Unknown guillotine split rule: {split!r}")
+        self.width = width
+        self.height = height
+        self.choice = choice
+        self.split = split
+        self.kerf = kerf
+        self.trim = trim
+        self.allow_rotation = allow_rotation
+        # Рабочая область без кромок; + kerf - пропил за последней деталью не нужен
+        self._limit_x = width - trim
+        self._limit_y = height - trim
+        usable_w = max(0, width - 2 * trim) + kerf
+        usable_h = max(0, height - 2 * trim) + kerf
+        # Свободный прямоугольник: (x, y, w, h, номер узла дерева резов)
+        self.free_rects: List[Tuple[float, float, float, float, int]] = []
+        self._node_cuts: List[List[Tuple[float, float, float, float]]] = []
+        self._node_children: List[List[int]] = []
+        if width > 2 * trim and height > 2 * trim:
+            self.free_rects.append((trim, trim, usable_w, usable_h, self._new_node()))
+        self.used_area = 0
+        self._max_free_w = usable_w if self.free_rects else 0
+        self._max_free_h = usable_h if self.free_rects else 0
+
+    def _new_node(self) -> int:
+        self._node_cuts.append([])
+        self._node_children.append([])
+        return len(self._node_cuts) - 1
+
+    def _score(self, fw, fh, w, h):
+        if self.choice == 'baf':
+            return (fw * fh - w * h, min(fw - w, fh - h))
+        if self.choice == 'bssf':
+            return (min(fw - w, fh - h), max(fw - w, fh - h))
+        return (max(fw - w, fh - h), min(fw - w, fh - h))
+
+    def find_position(self, w: float, h: float, can_rotate: bool = False) -> Optional[Tuple[int, tuple, bool]]:
+        """Лучший свободный прямоугольник для w x h: (позиция в free_rects, score, rotated) или None"""
+        kw, kh = w + self.kerf, h + self.kerf
+        if METRICS.enabled:
+            METRICS.count('candidates', len(self.free_rects) * (2 if can_rotate else 1))
+        best = None
+        for i, (_, _, fw, fh, _) in enumerate(self.free_rects):
+            if kw <= fw and kh <= fh:
+                score = self._score(fw, fh, kw, kh)
+                if best is None or score < best[1]:
+                    best = (i, score, False)
+                    if fw == kw and fh == kh:
+                        break # точнее не бывает
+            if can_rotate and kh <= fw and kw <= fh:
+                score = self._score(fw, fh, kh, kw)
+                if best is None or score < best[1]:
+                    best = (i, score, True)
+                    if fw == kh and fh == kw:
+                        break
+        return best
+
+    def _split_horizontal(self, fw, fh, w, h) -> bool:
+        """True - первый рез горизонтальный (нижний остаток на всю ширину свободного прямоугольника)"""
+        leftover_w, leftover_h = fw - w, fh - h
+        if self.split == 'sas':
+            return fw <= fh
+        if self.split == 'las':
+            return fw > fh
+        if self.split == 'slas':
+            return leftover_w <= leftover_h
+        if self.split == 'llas':
+            return leftover_w > leftover_h
+        if self.split == 'minas':
+            return w * leftover_h > leftover_w * h
+        return w * leftover_h <= leftover_w * h
+
+    def _cut(self, node: int, x1: float, y1: float, x2: float, y2: float):
+        # Рез по краю рабочей области не нужен: там только пропил, уходящий в кромку
+        if x1 == x2 and x1 >= self._limit_x or y1 == y2 and y1 >= self._limit_y:
+            return
+        self._node_cuts[node].append((x1, y1, min(x2, self._limit_x), min(y2, self._limit_y)))
+
+    def place(self, index: int, w: float, h: float) -> Tuple[float, float]:
+        """Ставит w x h в угол свободного прямоугольника index и делит остаток. Возвращает (x, y)"""
+        free_rects = self.free_rects
+        fx, fy, fw, fh, node = free_rects[index]
+        # Удаление без сдвига списка: порядок свободных прямоугольников не важен
+        free_rects[index] = free_rects[-1]
+        free_rects.pop()
+
+        kw, kh = w + self.kerf, h + self.kerf
+        right_w, bottom_h = fw - kw, fh - kh
+        if self._split_horizontal(fw, fh, kw, kh):
+            # Рез поперек всего прямоугольника под деталью, затем рез полосы справа от детали
+            if bottom_h > 0:
+                self._cut(node, fx, fy + h, fx + fw, fy + h)
+                self._add_free(node, fx, fy + kh, fw, bottom_h)
+            if right_w > 0:
+                strip_bottom = fy + h if bottom_h > 0 else fy + fh
+                self._cut(node, fx + w, fy, fx + w, strip_bottom)
+                self._add_free(node, fx + kw, fy, right_w, min(kh, fh))
+        else:
+            # Рез по всей высоте справа от детали, затем рез полосы под деталью
+            if right_w > 0:
+                self._cut(node, fx + w, fy, fx + w, fy + fh)
+                self._add_free(node, fx + kw, fy, right_w, fh)
+            if bottom_h > 0:
+                strip_right = fx + w if right_w > 0 else fx + fw
+                self._cut(node, fx, fy + h, strip_right, fy + h)
+                self._add_free(node, fx, fy + kh, min(kw, fw), bottom_h)
+
+        self.used_area += w * h
+        self._max_free_w = max((r[2] for r in free_rects), default=0)
+        self._max_free_h = max((r[3] for r in free_rects), default=0)
+        return fx, fy
+
+    def _add_free(self, parent: int, x, y, w, h):
+        child = self._new_node()
+        self._node_children[parent].append(child)
+        self.free_rects.append((x, y, w, h, child))
+
+    def might_fit(self, w: float, h: float, can_rotate: bool = False) -> bool:
+        kw, kh = w + self.kerf, h + self.kerf
+        if kw <= self._max_free_w and kh <= self._max_free_h:
+            return True
+        return can_rotate and kh <= self._max_free_w and kw <= self._max_free_h
+
+    def can_rotate(self, shape: Rectangle) -> bool:
+        return self.allow_rotation and shape.can_rotate and shape.width != shape.height
+
+    def insert(self, shape: Rectangle) -> bool:
+        found = self.find_position(shape.width, shape.height, self.can_rotate(shape))
+        if found is None:
+            return False
+        index, _, rotated = found
+        if rotated:
+            shape.rotate()
+        shape.x, shape.y = self.place(index, shape.width, shape.height)
+        return True
+
+    def cut_sequence(self, sheet_no: int = 0) -> List[Cut]:
+        """
+        Резы в порядке выполнения: сначала обрезка кромок, затем обход дерева резов
+        в глубину - каждый рез проходит через весь кусок, полученный предыдущими.
+        """
+        cuts = []
+        if self.trim > 0:
+            w, h, t = self.width, self.height, self.trim
+            cuts += [Cut(sheet_no, t, 0, t, h, 0), Cut(sheet_no, w - t, 0, w - t, h, 0),
+                     Cut(sheet_no, t, t, w - t, t, 0), Cut(sheet_no, t, h - t, w - t, h - t, 0)]
+        if not self._node_cuts:
+            return cuts
+        stack = [(0, 1)]
+        while stack:
+            node, depth = stack.pop()
+            for x1, y1, x2, y2 in self._node_cuts[node]:
+                cuts.append(Cut(sheet_no, x1, y1, x2, y2, depth))
+            # Обходим детей в исходном порядке
+            stack.extend((child, depth + 1) for child in reversed(self._node_children[node]))
+        return cuts
+
+
+class GuillotinePacker(PackingAlgorithm):
+    def __init__(self, choice: str = 'baf', split: str = 'slas', kerf: float = 0, trim: float = 0,
+                 allow_rotation: bool = True):
+        # choice: выбор свободного прямоугольника - 'baf' (Best Area Fit), 'bssf' / 'blsf' (Best Short / Long Side Fit)
+        # split: правило первого реза - 'sas'/'las' (короткая/длинная ось), 'slas'/'llas' (по остатку), 'minas'/'maxas' (по площади)
+        # kerf: ширина пропила между деталями, trim: обрезка кромки листа (мм)
+        if choice not in GuillotineBin.CHOICES:
+            raise ValueError(f"Unknown guillotine choice heuristic: {choice!r}")
+        if split not in GuillotineBin.SPLITS:
+            raise ValueError(f"Unknown guillotine split rule: {split!r}")
+        self.choice = choice
+        self.split = split
+        self.kerf = kerf
+        self.trim = trim
+        self.allow_rotation = allow_rotation
+        self.cut_sequences: List[List[Cut]] = [] # резы каждого листа последней упаковки
+
+    def _new_bin(self, sheet_width: float, sheet_height: float) -> GuillotineBin:
+        return GuillotineBin(sheet_width, sheet_height, self.choice, self.split,
+                             self.kerf, self.trim, self.allow_rotation)
+
+    def pack(self, shapes: List[Rectangle], sheet_width: float, sheet_height: float) -> List[Rectangle]:
+        sorted_shapes = sort_decreasing(shapes, self.allow_rotation)
+
+        free_space = self._new_bin(sheet_width, sheet_height)
+        placed_shapes = []
+
+        for done, shape in enumerate(sorted_shapes, 1):
+            is_placed = free_space.might_fit(shape.width, shape.height, free_space.can_rotate(shape)) and \
+                free_space.insert(shape)
+            if is_placed:
+                placed_shapes.append(shape)
+            self.report_progress(done, len(sorted_shapes), shape if is_placed else None)
+
+        self.cut_sequences = [free_space.cut_sequence(0)]
+        return placed_shapes
+
+    def pack_sheets(self, shapes: List[Rectangle], sheet_width: float, sheet_height: float) -> List[List[Rectangle]]:
+        bins = []
+
+        def make_bin():
+            free_space = self._new_bin(sheet_width, sheet_height)
+            bins.append(free_space)
+            return free_space
+
+        sheets = first_fit_bins(sort_decreasing(shapes, self.allow_rotation), sheet_width, sheet_height,
+                                make_bin, self.allow_rotation, self.report_progress)
+        # Листы открываются только после удачной вставки, поэтому пустые структуры просто пропускаем
+        used_bins = [b for b in bins if b.used_area > 0]
+        self.cut_sequences = [b.cut_sequence(n) for n, b in enumerate(used_bins)]
+        return sheets
@@ -0,0 +1,247 @@
+# algorithms/incremental.py
+from typing import Dict, Iterable, List, Optional, Tuple
+from models.shape import Rectangle
+from algorithms.maxrects import FreeRect, MaxRectsBin
+from algorithms.multi_sheet import fits_empty_sheet, sort_decreasing
+
+
+class IncrementalPacker:
+    """
+    Дорезка в уже готовую раскладку без полной переупаковки.
+
+    Между вызовами хранит свободное место каждого листа (MaxRectsBin), поэтому новые
+    детали встают в существующие дыры, а уже размещенные (и уже запрограммированные
+    под резку) остаются на месте. Закрепленные (pinned) детали не двигаются никогда,
+    остальные могут переезжать только внутри перестраиваемой области.
+
+    Списки листов общие с вызывающим кодом: load() их не копирует.
+    origin - сдвиг системы координат деталей относительно угла рабочей области листа
+    (в UI это margin: детали хранятся в мм от угла листа).
+    """
+
+    def __init__(self, sheet_width: float, sheet_height: float, heuristic: str = 'bssf',
+                 allow_rotation: bool = True, origin: Tuple[float, float] = (0, 0)):
+        self.sheet_width = sheet_width
+        self.sheet_height = sheet_height
+        self.heuristic = heuristic
+        self.allow_rotation = allow_rotation
+        self.origin = origin
+        self.sheets: List[List[Rectangle]] = []
+        self._bins: List[Optional[MaxRectsBin]] = [] # None - свободное место листа еще не строилось
+        self._sheet_of: Dict[int, int] = {} # id(деталь) -> номер листа
+        # id(деталь) -> занятый ею прямоугольник (x, y, w, h) в координатах рабочей области.
+        # Деталь можно передвинуть до remove()/place() (перетаскивание), а освободить надо старое место
+        self._occupied: Dict[int, FreeRect] = {}
+        self._pinned = set()                  # id(деталь) закрепленных деталей
+
+    # --- Состояние ---
+
+    def load(self, sheets: List[List[Rectangle]], pinned: Optional[List[Rectangle]] = None,
+             bins: Optional[List[MaxRectsBin]] = None):
+        """
+        Принимает готовую раскладку (например, результат полной упаковки).
+        bins - уже построенное свободное место листов (build_bin в фоновом потоке);
+        без них свободное место листа строится при первом обращении к нему.
+        """
+        ox, oy = self.origin
+        self.sheets = sheets
+        self._sheet_of = {id(p): n for n, sheet in enumerate(sheets) for p in sheet}
+        self._occupied = {id(p): (p.x - ox, p.y - oy, p.width, p.height) for sheet in sheets for p in sheet}
+        self._pinned = {id(p) for p in pinned or [] if id(p) in self._sheet_of}
+        self._bins = list(bins) if bins is not None else [None] * len(sheets)
+
+    def _new_bin(self) -> MaxRectsBin:
+        return MaxRectsBin(self.sheet_width, self.sheet_height, self.heuristic, self.allow_rotation)
+
+    def build_bin(self, rects: Iterable[FreeRect]) -> MaxRectsBin:
+        """
+        Свободное место листа по занятым прямоугольникам (x, y, w, h) в координатах рабочей области.
+        Состояние упаковщика не трогает - можно звать из фонового потока.
+        """
+        free_space = self._new_bin()
+        for x, y, w, h in rects:
+            free_space.place(x, y, w, h)
+        return free_space
+
+    def build_bins(self, layouts) -> List[MaxRectsBin]:
+        """build_bin для каждого листа результата упаковки [[(index, x, y, w, h), ...], ...] (PackWorker)"""
+        return [self.build_bin(entry[1:] for entry in sheet) for sheet in layouts]
+
+    def _bin(self, sheet_no: int) -> MaxRectsBin:
+        free_space = self._bins[sheet_no]
+        if free_space is None:
+            free_space = self._bins[sheet_no] = self.build_bin(
+                self._occupied[id(p)] for p in self.sheets[sheet_no])
+        return free_space
+
+    def _track(self, part: Rectangle, sheet_no: int):
+        """Запоминает деталь, уже стоящую на листе sheet_no в своих текущих координатах"""
+        self._sheet_of[id(part)] = sheet_no
+        self._occupied[id(part)] = (part.x - self.origin[0], part.y - self.origin[1], part.width, part.height)
+
+    def _insert(self, free_space: MaxRectsBin, part: Rectangle) -> bool:
+        if not free_space.might_fit(part.width, part.height, free_space.can_rotate(part)):
+            return False
+        if not free_space.insert(part):
+            return False
+        part.x += self.origin[0]
+        part.y += self.origin[1]
+        return True
+
+    def sheet_of(self, part: Rectangle) -> Optional[int]:
+        return self._sheet_of.get(id(part))
+
+    def pin(self, part: Rectangle):
+        if id(part) in self._sheet_of:
+            self._pinned.add(id(part))
+
+    def unpin(self, part: Rectangle):
+        self._pinned.discard(id(part))
+
+    def is_pinned(self, part: Rectangle) -> bool:
+        return id(part) in self._pinned
+
+    # --- Изменения раскладки ---
+
+    def add(self, parts: List[Rectangle], open_new_sheets: bool = True) -> List[Rectangle]:
+        """
+        Вставляет новые детали в свободное место существующих листов (First Fit, крупные первыми).
+        Если места нет и open_new_sheets - открывает новый лист. Возвращает не поместившиеся.
+        """
+        unplaced = []
+        for part in sort_decreasing(parts, self.allow_rotation):
+            target = next((n for n in range(len(self._bins)) if self._insert(self._bin(n), part)), None)
+            if (target is None and open_new_sheets and
+                    fits_empty_sheet(part, self.sheet_width, self.sheet_height, self.allow_rotation)):
+                free_space = self._new_bin()
+                if self._insert(free_space, part):
+                    self._bins.append(free_space)
+                    self.sheets.append([])
+                    target = len(self.sheets) - 1
+            if target is None:
+                unplaced.append(part)
+                continue
+            self.sheets[target].append(part)
+            self._track(part, target)
+        return unplaced
+
+    def remove(self, part: Rectangle) -> bool:
+        """Убирает деталь с листа и возвращает занятое ею место в свободное"""
+        sheet_no = self._sheet_of.get(id(part))
+        if sheet_no is None:
+            return False
+        self._detach(sheet_no, [part])
+        return True
+
+    def _detach(self, sheet_no: int, parts: List[Rectangle]):
+        """Снимает детали с листа sheet_no: один проход по листу, место каждой - в свободное"""
+        gone = {id(p) for p in parts}
+        sheet = self.sheets[sheet_no]
+        sheet[:] = [p for p in sheet if id(p) not in gone]
+        rects = [self._occupied.pop(key) for key in gone]
+        for key in gone:
+            del self._sheet_of[key]
+            self._pinned.discard(key)
+        free_space = self._bins[sheet_no]
+        if free_space is None:
+            return # еще не построенное свободное место соберется уже без этих деталей
+        if len(rects) > len(sheet):
+            # Снимают почти все - дешевле собрать свободное место по оставшимся
+            self._bins[sheet_no] = self.build_bin(self._occupied[id(p)] for p in sheet)
+        else:
+            for rect in rects:
+                free_space.free(*rect)
+
+    def place(self, part: Rectangle, sheet_no: int, pinned: bool = True) -> bool:
+        """
+        Ручная установка детали в ее текущие координаты (например, после перетаскивания).
+        Незакрепленные детали, на которые она легла, переезжают в свободное место
+        (сначала того же листа, потом остальных). Если мешает закрепленная деталь или
+        вытесненным некуда встать - раскладка не меняется и возвращается False.
+        """
+        saved = self._snapshot()
+        if id(part) in self._sheet_of:
+            self.remove(part)
+        sheet = self.sheets[sheet_no]
+        overlapping = [p for p in sheet if p.intersects(part)]
+        if any(id(p) in self._pinned for p in overlapping):
+            self._restore(saved)
+            return False
+
+        self._detach(sheet_no, overlapping)
+        self._bin(sheet_no).place(part.x - self.origin[0], part.y - self.origin[1], part.width, part.height)
+        sheet.append(part)
+        self._track(part, sheet_no)
+        if pinned:
+            self._pinned.add(id(part))
+
+        order = [sheet_no] + [n for n in range(len(self._bins)) if n != sheet_no]
+        for p in sort_decreasing(overlapping, self.allow_rotation):
+            target = next((n for n in order if self._insert(self._bin(n), p)), None)
+            if target is None:
+                self._restore(saved)
+                return False
+            self.sheets[target].append(p)
+            self._track(p, target)
+        return True
+
+    def reoptimize(self, sheet_no: int, x: Optional[float] = None, y: Optional[float] = None,
+                   width: Optional[float] = None, height: Optional[float] = None) -> bool:
+        """
+        Переупаковывает незакрепленные детали листа, задевающие область (x, y, width, height)
+        (без области - весь лист). Детали вне области и закрепленные не двигаются.
+        Если новая раскладка области не вмещает все ее детали, все остается как было.
+        """
+        sheet = self.sheets[sheet_no]
+        if x is None:
+            movable = [p for p in sheet if id(p) not in self._pinned]
+        else:
+            region = Rectangle(width, height, x, y, id='')
+            movable = [p for p in sheet if id(p) not in self._pinned and p.intersects(region)]
+        if not movable:
+            return True
+
+        saved = self._snapshot()
+        self._detach(sheet_no, movable)
+        base = self._bin(sheet_no)
+        # Плотная область может не собраться основной эвристикой - пробуем остальные
+        heuristics = [self.heuristic] + [h for h in MaxRectsBin.HEURISTICS if h != self.heuristic]
+        for heuristic in heuristics:
+            free_space = base.copy()
+            free_space.heuristic = heuristic
+            if all(self._insert(free_space, p) for p in sort_decreasing(movable, self.allow_rotation)):
+                free_space.heuristic = self.heuristic
+                self._bins[sheet_no] = free_space
+                sheet.extend(movable)
+                for p in movable:
+                    self._track(p, sheet_no)
+                return True
+            self._reset_positions(movable, saved[3])
+        self._restore(saved)
+        return False
+
+    def _snapshot(self):
+        """
+        Все, что нужно для отката: состав листов, их свободное место и занятые прямоугольники.
+        Координаты деталей восстанавливаются по занятым прямоугольникам, поэтому отдельно не копируются.
+        """
+        return ([list(sheet) for sheet in self.sheets],
+                [free_space.copy() if free_space is not None else None for free_space in self._bins],
+                dict(self._sheet_of), dict(self._occupied), set(self._pinned))
+
+    def _reset_positions(self, parts: Iterable[Rectangle], occupied: Dict[int, FreeRect]):
+        ox, oy = self.origin
+        for p in parts:
+            x, y, w, h = occupied[id(p)]
+            p.x, p.y, p.width, p.height = x + ox, y + oy, w, h
+
+    def _restore(self, saved):
+        sheets, bins, sheet_of, occupied, pinned = saved
+        for sheet, content in zip(self.sheets, sheets):
+            sheet[:] = content
+        self._bins = bins
+        self._sheet_of = sheet_of
+        self._occupied = occupied
+        self._pinned = pinned
+        for sheet in self.sheets:
+            self._reset_positions(sheet, occupied)
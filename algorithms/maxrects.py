@@ -0,0 +1,220 @@
+# algorithms/maxrects.py
+import copy
+from typing import List, Optional, Tuple
+from instrumentation import METRICS
+from models.shape import Rectangle
+from algorithms.base import PackingAlgorithm
+from algorithms.multi_sheet import first_fit_bins, sort_decreasing
+
+# Свободный прямоугольник храним кортежем (x, y, w, h) - так быстрее, чем объектом
+FreeRect = Tuple[float, float, float, float]
+
+
+class MaxRectsBin:
+    """
+    Свободное пространство одного листа в виде списка максимальных
+    свободных прямоугольников (MaxRects, J. Jylänki).
+    Стоимость поиска зависит от числа свободных прямоугольников, а не от размера листа.
+    """
+
+    HEURISTICS = ('bssf', 'baf', 'bl')
+
+    def __init__(self, width: float, height: float, heuristic: str = 'bssf', allow_rotation: bool = True):
+        if heuristic not in self.HEURISTICS:
+            raise ValueError(f"Unknown MaxRects heuristic: {heuristic!r}")
+        self.width = width
+        self.height = height
+        self.heuristic = heuristic
+        self.allow_rotation = allow_rotation
+        self.free_rects: List[FreeRect] = [(0, 0, width, height)]
+        self.used_area = 0
+        # Габариты самого широкого и самого высокого свободного прямоугольника
+        self._max_free_w = width
+        self._max_free_h = height
+
+    def _score(self, fx, fy, fw, fh, w, h):
+        """Оценка размещения w x h в свободном прямоугольнике. Меньше - лучше."""
+        if self.heuristic == 'bssf':
+            # Best Short Side Fit: минимальный короткий остаток, затем длинный
+            dw, dh = fw - w, fh - h
+            return (min(dw, dh), max(dw, dh))
+        if self.heuristic == 'baf':
+            # Best Area Fit: минимальный остаток площади
+            dw, dh = fw - w, fh - h
+            return (fw * fh - w * h, min(dw, dh))
+        # Bottom-Left: как можно выше (у нас ось Y вниз), затем левее
+        return (fy + h, fx)
+
+    def find_position(self, w: float, h: float, can_rotate: bool = False) -> Optional[Tuple[float, float, tuple, bool]]:
+        """
+        Ищет лучшую позицию для детали w x h. Возвращает (x, y, score, rotated) или None.
+        При can_rotate обе ориентации оцениваются за один проход по свободным прямоугольникам.
+        """
+        if METRICS.enabled:
+            METRICS.count('candidates', len(self.free_rects) * (2 if can_rotate else 1))
+        best = None
+        for fx, fy, fw, fh in self.free_rects:
+            if w <= fw and h <= fh:
+                score = self._score(fx, fy, fw, fh, w, h)
+                if best is None or score < best[2]:
+                    best = (fx, fy, score, False)
+            if can_rotate and h <= fw and w <= fh:
+                score = self._score(fx, fy, fw, fh, h, w)
+                if best is None or score < best[2]:
+                    best = (fx, fy, score, True)
+        return best
+
+    def place(self, x: float, y: float, w: float, h: float):
+        """Занимает прямоугольник (x, y, w, h) и перестраивает список свободных"""
+        right, bottom = x + w, y + h
+        kept = []
+        touching = [] # нетронутые прямоугольники, примыкающие к занятому: только они могут содержать новые
+        created = []
+        for free in self.free_rects:
+            fx, fy, fw, fh = free
+            f_right, f_bottom = fx + fw, fy + fh
+            # Не пересекается - оставляем как есть
+            if x >= f_right or right <= fx or y >= f_bottom or bottom <= fy:
+                kept.append(free)
+                if x <= f_right and right >= fx and y <= f_bottom and bottom >= fy:
+                    touching.append(free)
+                continue
+
+            # Разрезаем свободный прямоугольник на (до) 4 максимальных остатка
+            if x > fx:
+                created.append((fx, fy, x - fx, fh))
+            if right < f_right:
+                created.append((right, fy, f_right - right, fh))
+            if y > fy:
+                created.append((fx, fy, fw, y - fy))
+            if bottom < f_bottom:
+                created.append((fx, bottom, fw, f_bottom - bottom))
+
+        self.free_rects = kept + self._prune(created, touching)
+        self.used_area += w * h
+        self._max_free_w = max((r[2] for r in self.free_rects), default=0)
+        self._max_free_h = max((r[3] for r in self.free_rects), default=0)
+
+    def free(self, x: float, y: float, w: float, h: float):
+        """
+        Возвращает занятый прямоугольник (x, y, w, h) в свободное место без пересборки листа.
+        Освободившийся прямоугольник сливается с соседними свободными: из каждой пары касающихся
+        получается прямоугольник по общей проекции, и так до тех пор, пока появляются новые.
+        Вложенные прямоугольники выбрасываются, как в place().
+        """
+        rects = self.free_rects
+        pending = [(x, y, w, h)]
+        rects.append(pending[0])
+        while pending:
+            ax, ay, aw, ah = pending.pop()
+            a_right, a_bottom = ax + aw, ay + ah
+            candidates = []
+            for bx, by, bw, bh in rects:
+                b_right, b_bottom = bx + bw, by + bh
+                # Общий отрезок по x, по y касаются или перекрываются - столбец общей ширины
+                lo, hi = max(ax, bx), min(a_right, b_right)
+                if hi > lo and ay <= b_bottom and by <= a_bottom:
+                    top = min(ay, by)
+                    candidates.append((lo, top, hi - lo, max(a_bottom, b_bottom) - top))
+                # То же по y - полоса общей высоты
+                lo, hi = max(ay, by), min(a_bottom, b_bottom)
+                if hi > lo and ax <= b_right and bx <= a_right:
+                    left = min(ax, bx)
+                    candidates.append((left, lo, max(a_right, b_right) - left, hi - lo))
+            for candidate in candidates:
+                if any(self._contains(other, candidate) for other in rects):
+                    continue
+                rects[:] = [r for r in rects if not self._contains(candidate, r)]
+                rects.append(candidate)
+                pending.append(candidate)
+        self.used_area -= w * h
+        self._max_free_w = max((r[2] for r in rects), default=0)
+        self._max_free_h = max((r[3] for r in rects), default=0)
+
+    def copy(self) -> 'MaxRectsBin':
+        """Независимая копия свободного места (для отката и пробных раскладок)"""
+        clone = copy.copy(self)
+        clone.free_rects = list(self.free_rects)
+        return clone
+
+    def might_fit(self, w: float, h: float, can_rotate: bool = False) -> bool:
+        """Быстрая отбраковка без перебора свободных прямоугольников"""
+        if w <= self._max_free_w and h <= self._max_free_h:
+            return True
+        return can_rotate and h <= self._max_free_w and w <= self._max_free_h
+
+    @staticmethod
+    def _contains(a: FreeRect, b: FreeRect) -> bool:
+        """a полностью содержит b"""
+        return (b[0] >= a[0] and b[1] >= a[1] and
+                b[0] + b[2] <= a[0] + a[2] and
+                b[1] + b[3] <= a[1] + a[3])
+
+    def _prune(self, created: List[FreeRect], kept: List[FreeRect]) -> List[FreeRect]:
+        """
+        Удаляет новые прямоугольники, вложенные в другие.
+        Старые (kept) друг в друга не вложены, поэтому сравниваем только новые.
+        Новый прямоугольник прилегает к занятому по всей своей стороне, поэтому содержать его может
+        только старый, который касается занятого, - place() передает только такие.
+        """
+        result = []
+        for i, rect in enumerate(created):
+            if any(self._contains(other, rect) for other in kept):
+                continue
+            dominated = False
+            for j, other in enumerate(created):
+                if i != j and self._contains(other, rect):
+                    # При равенстве оставляем первый из дубликатов
+                    if other != rect or j < i:
+                        dominated = True
+                        break
+            if not dominated:
+                result.append(rect)
+        return result
+
+    def can_rotate(self, shape: Rectangle) -> bool:
+        return self.allow_rotation and shape.can_rotate and shape.width != shape.height
+
+    def insert(self, shape: Rectangle) -> bool:
+        """Пробует разместить деталь. Координаты (и поворот) пишутся прямо в shape."""
+        found = self.find_position(shape.width, shape.height, self.can_rotate(shape))
+        if found is None:
+            return False
+        x, y, _, rotated = found
+        if rotated:
+            shape.rotate()
+        shape.x, shape.y = x, y
+        self.place(x, y, shape.width, shape.height)
+        return True
+
+
+class MaxRectsPacker(PackingAlgorithm):
+    def __init__(self, heuristic: str = 'bssf', allow_rotation: bool = True):
+        # heuristic: 'bssf' (Best Short Side Fit), 'baf' (Best Area Fit), 'bl' (Bottom-Left)
+        # allow_rotation: пробовать поворот на 90° (только для деталей с can_rotate=True)
+        if heuristic not in MaxRectsBin.HEURISTICS:
+            raise ValueError(f"Unknown MaxRects heuristic: {heuristic!r}")
+        self.heuristic = heuristic
+        self.allow_rotation = allow_rotation
+
+    def _sorted(self, shapes: List[Rectangle]) -> List[Rectangle]:
+        return sort_decreasing(shapes, self.allow_rotation)
+
+    def pack(self, shapes: List[Rectangle], sheet_width: float, sheet_height: float) -> List[Rectangle]:
+        sorted_shapes = self._sorted(shapes)
+
+        free_space = MaxRectsBin(sheet_width, sheet_height, self.heuristic, self.allow_rotation)
+        placed_shapes = []
+
+        for done, shape in enumerate(sorted_shapes, 1):
+            is_placed = free_space.insert(shape)
+            if is_placed:
+                placed_shapes.append(shape)
+            self.report_progress(done, len(sorted_shapes), shape if is_placed else None)
+
+        return placed_shapes
+
+    def pack_sheets(self, shapes: List[Rectangle], sheet_width: float, sheet_height: float) -> List[List[Rectangle]]:
+        return first_fit_bins(self._sorted(shapes), sheet_width, sheet_height,
+                              lambda: MaxRectsBin(sheet_width, sheet_height, self.heuristic, self.allow_rotation),
+                              self.allow_rotation, self.report_progress)
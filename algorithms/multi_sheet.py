@@ -0,0 +1,80 @@
+# algorithms/multi_sheet.py
+from typing import Callable, List, Optional
+from models.shape import Rectangle
+
+
+def sort_decreasing(shapes: List[Rectangle], allow_rotation: bool) -> List[Rectangle]:
+    """
+    Порядок "decreasing" для жадных упаковщиков: сначала высокие, потом широкие.
+    Если поворот разрешен, ориентация еще не выбрана - сортируем по длинной стороне.
+    """
+    if allow_rotation:
+        return sorted(shapes, key=lambda s: (max(s.width, s.height), min(s.width, s.height)) if s.can_rotate
+                      else (s.height, s.width), reverse=True)
+    return sorted(shapes, key=lambda s: (s.height, s.width), reverse=True)
+
+
+def fits_empty_sheet(shape: Rectangle, sheet_width: float, sheet_height: float, allow_rotation: bool) -> bool:
+    if shape.width <= sheet_width and shape.height <= sheet_height:
+        return True
+    return (allow_rotation and shape.can_rotate and
+            shape.height <= sheet_width and shape.width <= sheet_height)
+
+
+def first_fit_bins(sorted_shapes: List[Rectangle], sheet_width: float, sheet_height: float,
+                   make_bin: Callable[[], object], allow_rotation: bool = False,
+                   progress: Optional[Callable] = None) -> List[List[Rectangle]]:
+    """
+    First Fit по открытым листам: каждая деталь идет в первый лист, где нашлось место,
+    иначе открывается новый лист.
+
+    make_bin() создает структуру свободного места одного листа (MaxRectsBin, Skyline),
+    у которой есть insert(shape), might_fit(w, h, can_rotate) и used_area.
+    Лист закрывается, как только его свободная площадь меньше самой маленькой
+    из оставшихся деталей, поэтому новая деталь не перебирает все листы подряд.
+    progress(done, total, placed, sheet_no) - см. PackingAlgorithm.report_progress.
+    """
+    # min_area_after[i] - минимальная площадь среди деталей i, i+1, ...
+    min_area_after = [0.0] * (len(sorted_shapes) + 1)
+    min_area_after[-1] = float('inf')
+    for i in range(len(sorted_shapes) - 1, -1, -1):
+        min_area_after[i] = min(min_area_after[i + 1], sorted_shapes[i].area)
+
+    sheet_area = sheet_width * sheet_height
+    sheets = []         # раскладки всех листов
+    open_bins = []      # (структура свободного места, индекс листа в sheets)
+
+    total = len(sorted_shapes)
+    for i, shape in enumerate(sorted_shapes):
+        if not fits_empty_sheet(shape, sheet_width, sheet_height, allow_rotation):
+            if progress is not None:
+                progress(i + 1, total, None, len(sheets) - 1)
+            continue # не влезет даже на пустой лист
+
+        rotatable = allow_rotation and shape.can_rotate
+        target = None
+        for free_space, sheet_index in open_bins:
+            if free_space.might_fit(shape.width, shape.height, rotatable) and free_space.insert(shape):
+                target = sheet_index
+                break
+
+        if target is None:
+            free_space = make_bin()
+            if not free_space.insert(shape):
+                if progress is not None:
+                    progress(i + 1, total, None, len(sheets) - 1)
+                continue
+            target = len(sheets)
+            sheets.append([])
+            open_bins.append((free_space, target))
+
+        sheets[target].append(shape)
+        if progress is not None:
+            progress(i + 1, total, shape, target)
+
+        # Закрываем листы, куда не войдет уже ни одна из оставшихся деталей
+        smallest_left = min_area_after[i + 1]
+        open_bins = [(b, idx) for b, idx in open_bins
+                     if sheet_area - b.used_area >= smallest_left]
+
+    return sheets
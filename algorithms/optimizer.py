@@ -0,0 +1,276 @@
+# algorithms/optimizer.py
+import os
+import random
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import List, Optional, Sequence, Tuple
+from models.shape import Rectangle
+from algorithms.base import PackingAlgorithm, PackingCancelled
+from algorithms.maxrects import MaxRectsBin
+from algorithms.multi_sheet import first_fit_bins, sort_decreasing
+from algorithms.skyline import Skyline
+
+# Кандидат: (порядок деталей, флаги предварительного поворота, эвристика размещения)
+Candidate = Tuple[Tuple[int, ...], Tuple[bool, ...], str]
+# Результат оценки: (оценка - меньше лучше, [(индекс детали, лист, x, y, повернута)])
+Evaluation = Tuple[tuple, List[Tuple[int, int, float, float, bool]]]
+
+# Состояние процесса-воркера: размеры деталей передаются один раз через initializer,
+# а в каждую задачу уходит только кандидат
+_worker_state = {}
+
+
+def _init_worker(dims, sheet_width, sheet_height, multi_sheet, allow_rotation, deadline):
+    _worker_state.update(dims=dims, sheet_width=sheet_width, sheet_height=sheet_height,
+                         multi_sheet=multi_sheet, allow_rotation=allow_rotation, deadline=deadline)
+
+
+def _evaluate_in_worker(candidate: Candidate) -> Optional[Evaluation]:
+    """None - оценка не успела до конца бюджета (time.monotonic общий для процессов машины)"""
+    state = _worker_state
+    try:
+        return evaluate_candidate(candidate, state['dims'], state['sheet_width'], state['sheet_height'],
+                                  state['multi_sheet'], state['allow_rotation'], state['deadline'])
+    except PackingCancelled:
+        return None
+
+
+def evaluate_candidate(candidate: Candidate, dims: Sequence[Tuple[float, float, bool]],
+                       sheet_width: float, sheet_height: float,
+                       multi_sheet: bool, allow_rotation: bool,
+                       deadline: Optional[float] = None) -> Evaluation:
+    """
+    Раскладывает детали строго в порядке кандидата (без сортировки) и оценивает результат.
+    dims - [(width, height, can_rotate)] в исходном порядке.
+    deadline - момент time.monotonic(), после которого оценка прерывается PackingCancelled.
+    """
+    order, flips, heuristic = candidate
+    shapes = []
+    for index in order:
+        w, h, can_rotate = dims[index]
+        if flips[index] and can_rotate and allow_rotation:
+            w, h = h, w
+        shape = Rectangle(width=w, height=h, id=str(index), can_rotate=can_rotate)
+        shapes.append(shape)
+
+    def make_bin():
+        if heuristic == 'skyline':
+            return Skyline(sheet_width, sheet_height, allow_rotation)
+        return MaxRectsBin(sheet_width, sheet_height, heuristic, allow_rotation)
+
+    def check_deadline(*_):
+        if time.monotonic() >= deadline:
+            raise PackingCancelled()
+
+    progress = check_deadline if deadline is not None else None
+    if multi_sheet:
+        sheets = first_fit_bins(shapes, sheet_width, sheet_height, make_bin, allow_rotation, progress)
+    else:
+        free_space = make_bin()
+        sheet = []
+        for s in shapes:
+            if progress is not None:
+                progress()
+            if free_space.insert(s):
+                sheet.append(s)
+        sheets = [sheet]
+
+    placements = []
+    placed_area = 0
+    for sheet_no, sheet in enumerate(sheets):
+        for s in sheet:
+            index = int(s.id)
+            placements.append((index, sheet_no, s.x, s.y, (s.width, s.height) != dims[index][:2]))
+            placed_area += s.area
+
+    if multi_sheet:
+        # Меньше листов; при равенстве - самый пустой последний лист (его легче "освободить")
+        last_sheet_area = sum(s.area for s in sheets[-1]) if sheets else 0
+        score = (-placed_area, len(sheets), last_sheet_area)
+    else:
+        score = (-placed_area,)
+    return score, placements
+
+
+class MultiStartOptimizer(PackingAlgorithm):
+    """
+    Поиск поверх жадных упаковщиков: перебирает порядок деталей, повороты и эвристику
+    размещения (MaxRects BSSF/BAF/BL, Skyline). Стартует с классических "decreasing"
+    порядков, затем мутирует лучший найденный вариант, иногда делая случайный рестарт.
+
+    Кандидаты оцениваются параллельно в ProcessPoolExecutor. По истечении time_budget
+    возвращается лучшая раскладка, найденная к этому моменту.
+    """
+
+    HEURISTICS = ('bssf', 'baf', 'bl', 'skyline')
+
+    def __init__(self, time_budget: float = 10.0, workers: Optional[int] = None,
+                 heuristics: Sequence[str] = HEURISTICS, allow_rotation: bool = True,
+                 restart_rate: float = 0.1, seed: Optional[int] = None):
+        # time_budget - секунды на поиск (wall-clock)
+        # workers - число процессов (None - все ядра, 1 - без пула, в текущем процессе)
+        for heuristic in heuristics:
+            if heuristic not in self.HEURISTICS:
+                raise ValueError(f"Unknown heuristic: {heuristic!r}")
+        self.time_budget = time_budget
+        self.workers = workers
+        self.heuristics = tuple(heuristics)
+        self.allow_rotation = allow_rotation
+        self.restart_rate = restart_rate
+        self.seed = seed
+        self.evaluated = 0 # сколько кандидатов проверено в последнем запуске
+
+    def pack(self, shapes: List[Rectangle], sheet_width: float, sheet_height: float) -> List[Rectangle]:
+        sheets = self._optimize(shapes, sheet_width, sheet_height, multi_sheet=False)
+        return sheets[0] if sheets else []
+
+    def pack_sheets(self, shapes: List[Rectangle], sheet_width: float, sheet_height: float) -> List[List[Rectangle]]:
+        return self._optimize(shapes, sheet_width, sheet_height, multi_sheet=True)
+
+    # --- Поиск ---
+
+    def _initial_candidates(self, shapes: List[Rectangle]) -> List[Candidate]:
+        n = len(shapes)
+        index_of = {id(s): i for i, s in enumerate(shapes)}
+        no_flips = (False,) * n
+        orders = [
+            tuple(index_of[id(s)] for s in sort_decreasing(shapes, self.allow_rotation)),
+            tuple(sorted(range(n), key=lambda i: shapes[i].area, reverse=True)),
+            tuple(sorted(range(n), key=lambda i: shapes[i].width + shapes[i].height, reverse=True)),
+            tuple(sorted(range(n), key=lambda i: shapes[i].width, reverse=True)),
+        ]
+        candidates = []
+        for order in orders:
+            for heuristic in self.heuristics:
+                candidate = (order, no_flips, heuristic)
+                if candidate not in candidates:
+                    candidates.append(candidate)
+        return candidates
+
+    def _mutate(self, candidate: Candidate, rng: random.Random) -> Candidate:
+        order, flips, heuristic = list(candidate[0]), list(candidate[1]), candidate[2]
+        n = len(order)
+
+        if rng.random() < self.restart_rate:
+            # Рестарт: "decreasing" порядок, сильно перемешанный локальными обменами
+            for _ in range(max(1, n // 4)):
+                i = rng.randrange(n)
+                j = min(n - 1, i + rng.randint(1, 8))
+                order[i], order[j] = order[j], order[i]
+            if self.allow_rotation:
+                flips = [rng.random() < 0.5 for _ in range(n)]
+            return tuple(order), tuple(flips), rng.choice(self.heuristics)
+
+        for _ in range(rng.randint(1, 3)):
+            move = rng.random()
+            if move < 0.35 and n > 1:
+                # Обмен двух деталей
+                i, j = rng.randrange(n), rng.randrange(n)
+                order[i], order[j] = order[j], order[i]
+            elif move < 0.6 and n > 1:
+                # Перенос детали на другое место в очереди
+                item = order.pop(rng.randrange(n))
+                order.insert(rng.randrange(n), item)
+            elif move < 0.75 and n > 2:
+                # Разворот отрезка очереди
+                i, j = sorted(rng.sample(range(n), 2))
+                order[i:j + 1] = reversed(order[i:j + 1])
+            elif move < 0.9 and self.allow_rotation:
+                i = rng.randrange(n)
+                flips[i] = not flips[i]
+            else:
+                heuristic = rng.choice(self.heuristics)
+        return tuple(order), tuple(flips), heuristic
+
+    def _optimize(self, shapes: List[Rectangle], sheet_width: float, sheet_height: float,
+                  multi_sheet: bool) -> List[List[Rectangle]]:
+        if not shapes:
+            return []
+        deadline = time.monotonic() + self.time_budget
+        rng = random.Random(self.seed)
+        dims = [(s.width, s.height, s.can_rotate) for s in shapes]
+        args = (dims, sheet_width, sheet_height, multi_sheet, self.allow_rotation)
+
+        pending_candidates = self._initial_candidates(shapes)
+        # Первый кандидат (обычный жадный проход) считаем сразу: результат будет даже при нулевом бюджете
+        first = pending_candidates.pop(0)
+        best_candidate = first
+        best = evaluate_candidate(first, *args)
+        self.evaluated = 1
+        seen = {first}
+
+        budget_ms = int(self.time_budget * 1000)
+
+        def report():
+            # Прогресс поиска - доля израсходованного бюджета времени
+            left_ms = int((deadline - time.monotonic()) * 1000)
+            self.report_progress(min(budget_ms, budget_ms - left_ms), budget_ms)
+
+        def next_candidate():
+            while pending_candidates:
+                candidate = pending_candidates.pop(0)
+                if candidate not in seen:
+                    seen.add(candidate)
+                    return candidate
+            for _ in range(20):
+                candidate = self._mutate(best_candidate, rng)
+                if candidate not in seen:
+                    seen.add(candidate)
+                    return candidate
+            return None
+
+        workers = self.workers or os.cpu_count() or 1
+        if workers <= 1:
+            while time.monotonic() < deadline:
+                candidate = next_candidate()
+                if candidate is None:
+                    break
+                result = evaluate_candidate(candidate, *args)
+                self.evaluated += 1
+                if result[0] < best[0]:
+                    best, best_candidate = result, candidate
+                report()
+        elif time.monotonic() < deadline:
+            executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                           initargs=args + (deadline,))
+            try:
+                running = {}
+                while True:
+                    # Держим в очереди по две задачи на процесс, чтобы ядра не простаивали
+                    while len(running) < workers * 2 and time.monotonic() < deadline:
+                        candidate = next_candidate()
+                        if candidate is None:
+                            break
+                        running[executor.submit(_evaluate_in_worker, candidate)] = candidate
+                    remaining = deadline - time.monotonic()
+                    if not running or remaining <= 0:
+                        break
+                    done, _ = wait(running, timeout=remaining, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        candidate = running.pop(future)
+                        result = future.result()
+                        if result is None:
+                            continue
+                        self.evaluated += 1
+                        if result[0] < best[0]:
+                            best, best_candidate = result, candidate
+                    report()
+            finally:
+                # Бюджет исчерпан: очередь отменяем, а идущие оценки сами обрываются по deadline -
+                # дожидаемся их, чтобы процессы пула не грузили ядра после возврата
+                executor.shutdown(wait=True, cancel_futures=True)
+
+        return self._apply(shapes, best[1])
+
+    def _apply(self, shapes: List[Rectangle], placements) -> List[List[Rectangle]]:
+        """Переносит лучшую найденную раскладку на исходные объекты Rectangle"""
+        sheets = []
+        for index, sheet_no, x, y, rotated in placements:
+            shape = shapes[index]
+            if rotated:
+                shape.rotate()
+            shape.x, shape.y = x, y
+            while len(sheets) <= sheet_no:
+                sheets.append([])
+            sheets[sheet_no].append(shape)
+        return sheets
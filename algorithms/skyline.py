@@ -0,0 +1,143 @@
+# algorithms/skyline.py
+from typing import List, Optional, Tuple
+from instrumentation import METRICS
+from models.shape import Rectangle
+from algorithms.base import PackingAlgorithm
+from algorithms.multi_sheet import first_fit_bins, sort_decreasing
+
+
+class Skyline:
+    """
+    "Линия горизонта" одного листа: список сегментов [x, y, width],
+    где y - нижняя граница уже занятой области над сегментом (ось Y вниз).
+    Поиск позиции - O(число сегментов), от размера листа не зависит.
+    """
+
+    def __init__(self, width: float, height: float, allow_rotation: bool = True):
+        self.width = width
+        self.height = height
+        self.allow_rotation = allow_rotation
+        self.segments: List[List[float]] = [[0, 0, width]]
+        self.used_area = 0
+        self._lowest_y = 0 # самый "свободный" сегмент: выше него деталь не поднимется
+
+    def _fit(self, index: int, w: float, h: float) -> Optional[float]:
+        """Y, на который встанет деталь шириной w, начиная с сегмента index. None - не влезает."""
+        x = self.segments[index][0]
+        if x + w > self.width:
+            return None
+        y = 0
+        width_left = w
+        i = index
+        while width_left > 0 and i < len(self.segments):
+            seg_x, seg_y, seg_w = self.segments[i]
+            y = max(y, seg_y)
+            if y + h > self.height:
+                return None
+            width_left -= seg_w
+            i += 1
+        return y
+
+    def find_position(self, w: float, h: float, can_rotate: bool = False) -> Optional[Tuple[int, float, float, bool]]:
+        """
+        Bottom-Left: минимальный низ детали, затем самый левый.
+        Возвращает (index, x, y, rotated). При can_rotate обе ориентации
+        проверяются на каждом сегменте за один проход.
+        """
+        orientations = ((w, h, False), (h, w, True)) if can_rotate else ((w, h, False),)
+        if METRICS.enabled:
+            METRICS.count('candidates', len(self.segments) * len(orientations))
+        best = None
+        best_key = None
+        for i, (seg_x, _, _) in enumerate(self.segments):
+            for ow, oh, rotated in orientations:
+                y = self._fit(i, ow, oh)
+                if y is None:
+                    continue
+                key = (y + oh, seg_x)
+                if best_key is None or key < best_key:
+                    best_key = key
+                    best = (i, seg_x, y, rotated)
+        return best
+
+    def place(self, index: int, x: float, y: float, w: float, h: float):
+        """Поднимает горизонт над [x, x + w] до y + h"""
+        new_segment = [x, y + h, w]
+        right = x + w
+        segments = self.segments
+
+        # Сегменты слева от index не затрагиваются
+        result = segments[:index]
+        result.append(new_segment)
+        for seg in segments[index:]:
+            seg_x, seg_y, seg_w = seg
+            seg_right = seg_x + seg_w
+            if seg_right <= right:
+                continue # полностью перекрыт новой деталью
+            if seg_x < right:
+                # Частично перекрыт - обрезаем слева
+                result.append([right, seg_y, seg_right - right])
+            else:
+                result.append(seg)
+
+        # Сливаем соседние сегменты одной высоты
+        merged = [result[0]]
+        for seg in result[1:]:
+            last = merged[-1]
+            if last[1] == seg[1]:
+                last[2] += seg[2]
+            else:
+                merged.append(seg)
+
+        self.segments = merged
+        self.used_area += w * h
+        self._lowest_y = min(seg[1] for seg in merged)
+
+    def might_fit(self, w: float, h: float, can_rotate: bool = False) -> bool:
+        """Быстрая отбраковка без перебора сегментов"""
+        free_h = self.height - self._lowest_y
+        if w <= self.width and h <= free_h:
+            return True
+        return can_rotate and h <= self.width and w <= free_h
+
+    def can_rotate(self, shape: Rectangle) -> bool:
+        return self.allow_rotation and shape.can_rotate and shape.width != shape.height
+
+    def insert(self, shape: Rectangle) -> bool:
+        found = self.find_position(shape.width, shape.height, self.can_rotate(shape))
+        if found is None:
+            return False
+        index, x, y, rotated = found
+        if rotated:
+            shape.rotate()
+        shape.x, shape.y = x, y
+        self.place(index, x, y, shape.width, shape.height)
+        return True
+
+
+class SkylineBottomLeft(PackingAlgorithm):
+    def __init__(self, allow_rotation: bool = True):
+        # allow_rotation: пробовать поворот на 90° (только для деталей с can_rotate=True)
+        self.allow_rotation = allow_rotation
+
+    def _sorted(self, shapes: List[Rectangle]) -> List[Rectangle]:
+        return sort_decreasing(shapes, self.allow_rotation)
+
+    def pack(self, shapes: List[Rectangle], sheet_width: float, sheet_height: float) -> List[Rectangle]:
+        sorted_shapes = self._sorted(shapes)
+
+        skyline = Skyline(sheet_width, sheet_height, self.allow_rotation)
+        placed_shapes = []
+
+        for done, shape in enumerate(sorted_shapes, 1):
+            is_placed = skyline.insert(shape)
+            if is_placed:
+                placed_shapes.append(shape)
+            self.report_progress(done, len(sorted_shapes), shape if is_placed else None)
+
+        return placed_shapes
+
+    def pack_sheets(self, shapes: List[Rectangle], sheet_width: float, sheet_height: float) -> List[List[Rectangle]]:
+        return first_fit_bins(self._sorted(shapes), sheet_width, sheet_height,
+                              lambda: Skyline(sheet_width, sheet_height, self.allow_rotation),
+                              self.allow_rotation, self.report_progress)
@@ -0,0 +1,127 @@
+"""
+Воспроизводимые (seeded) наборы задач для бенчмарка упаковщиков.
+
+Классы I-VI - Berkey & Wang (1987), VII-X - Martello & Vigo (1998),
+в том виде, как их описывают в литературе по 2D bin packing.
+Плюс "перекошенные" смеси размеров и крупные наборы для проверки масштабирования.
+"""
+import random
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Tuple
+
+Dims = List[Tuple[float, float]]
+
+
+@dataclass
+class Instance:
+    family: str      # семейство (класс) задачи
+    n: int           # число деталей
+    seed: int
+    sheet_width: float
+    sheet_height: float
+    dims: Dims       # (width, height) каждой детали
+
+    @property
+    def name(self) -> str:
+        return f"{self.family}/n{self.n}"
+
+
+# Berkey & Wang: (диапазон сторон детали, сторона листа)
+BERKEY_WANG = {
+    'bw1': ((1, 10), 10),
+    'bw2': ((1, 10), 30),
+    'bw3': ((1, 35), 40),
+    'bw4': ((1, 35), 100),
+    'bw5': ((1, 100), 100),
+    'bw6': ((1, 100), 300),
+}
+
+
+def _berkey_wang(family: str, n: int, rng: random.Random):
+    (low, high), side = BERKEY_WANG[family]
+    return side, side, [(rng.randint(low, high), rng.randint(low, high)) for _ in range(n)]
+
+
+# Martello & Vigo: лист 100 x 100, четыре типа деталей; в классе k тип k-6 выпадает с вероятностью 70%
+def _mv_item(item_type: int, rng: random.Random, side: int = 100):
+    two_thirds, half = 2 * side // 3, side // 2
+    if item_type == 1: # широкие и низкие
+        return rng.randint(two_thirds, side), rng.randint(1, half)
+    if item_type == 2: # узкие и высокие
+        return rng.randint(1, half), rng.randint(two_thirds, side)
+    if item_type == 3: # крупные
+        return rng.randint(half, side), rng.randint(half, side)
+    return rng.randint(1, half), rng.randint(1, half) # мелкие
+
+
+def _martello_vigo(family: str, n: int, rng: random.Random):
+    dominant = {'mv7': 1, 'mv8': 2, 'mv9': 3, 'mv10': 4}[family]
+    dims = []
+    for _ in range(n):
+        if rng.random() < 0.7:
+            item_type = dominant
+        else:
+            item_type = rng.choice([t for t in (1, 2, 3, 4) if t != dominant])
+        dims.append(_mv_item(item_type, rng))
+    return 100, 100, dims
+
+
+def _skewed_small(family: str, n: int, rng: random.Random):
+    """90% мелочи и 10% крупных панелей - типичный заказ с кронштейнами"""
+    dims = []
+    for _ in range(n):
+        if rng.random() < 0.9:
+            dims.append((rng.randint(20, 120), rng.randint(20, 80)))
+        else:
+            dims.append((rng.randint(600, 1400), rng.randint(400, 900)))
+    return 3000, 1500, dims
+
+
+def _skewed_lognormal(family: str, n: int, rng: random.Random):
+    """Логнормальные стороны: длинный хвост крупных деталей"""
+    dims = []
+    for _ in range(n):
+        w = min(3000, max(10, round(rng.lognormvariate(4.8, 0.7))))
+        h = min(1500, max(10, round(rng.lognormvariate(4.3, 0.6))))
+        dims.append((w, h))
+    return 3000, 1500, dims
+
+
+def _uniform_sheet(family: str, n: int, rng: random.Random):
+    """Равномерное распределение generate_random_parts на реальном листе 3000 x 1500"""
+    return 3000, 1500, [(rng.randint(50, 400), rng.randint(25, 300)) for _ in range(n)]
+
+
+FAMILIES: Dict[str, Callable] = {
+    **{name: _berkey_wang for name in BERKEY_WANG},
+    'mv7': _martello_vigo, 'mv8': _martello_vigo, 'mv9': _martello_vigo, 'mv10': _martello_vigo,
+    'skewed_small': _skewed_small,
+    'skewed_lognormal': _skewed_lognormal,
+    'uniform': _uniform_sheet,
+}
+
+# Уровни набора: что прогонять (семейство, число деталей, число сидов)
+TIERS = {
+    'quick': [(family, n, 3) for family in list(BERKEY_WANG) + ['mv7', 'mv8', 'mv9', 'mv10']
+              for n in (20, 100)] + [('skewed_small', 500, 2), ('skewed_lognormal', 500, 2)],
+    'full': [(family, n, 5) for family in list(BERKEY_WANG) + ['mv7', 'mv8', 'mv9', 'mv10']
+             for n in (20, 40, 60, 80, 100)] +
+            [('skewed_small', 2000, 3), ('skewed_lognormal', 2000, 3), ('uniform', 10_000, 1)],
+    'scale': [('uniform', 10_000, 1), ('uniform', 50_000, 1), ('uniform', 100_000, 1),
+              ('skewed_small', 100_000, 1)],
+}
+
+
+def make_instance(family: str, n: int, seed: int) -> Instance:
+    if family not in FAMILIES:
+        raise ValueError(f"Unknown instance family: {family!r}")
+    # Сид зависит от семейства и размера, чтобы наборы не повторяли друг друга
+    rng = random.Random(f"{family}:{n}:{seed}")
+    sheet_width, sheet_height, dims = FAMILIES[family](family, n, rng)
+    return Instance(family, n, seed, sheet_width, sheet_height, dims)
+
+
+def tier_instances(tier: str) -> List[Instance]:
+    if tier not in TIERS:
+        raise ValueError(f"Unknown tier: {tier!r} (available: {', '.join(TIERS)})")
+    return [make_instance(family, n, seed) for family, n, seeds in TIERS[tier] for seed in range(seeds)]
@@ -0,0 +1,188 @@
+"""
+Бенчмарк и регрессионный прогон упаковщиков.
+
+    python -m benchmarks.run --tier quick                       # таблица результатов
+    python -m benchmarks.run --tier quick --save-baseline       # записать benchmarks/baseline.json
+    python -m benchmarks.run --tier quick --check               # сравнить с baseline, код 1 при регрессии
+
+Качество (листы, размещенные детали, использование) сравнивается строго.
+Время машинозависимо, поэтому для него есть допуск --time-tolerance; baseline
+имеет смысл записывать на той же машине, где потом запускается --check.
+"""
+import argparse
+import json
+import math
+import os
+import sys
+import time
+import tracemalloc
+from typing import Dict, List
+
+from algorithms import create_algorithm
+from benchmarks.instances import TIERS, Instance, tier_instances
+from models.shape import Rectangle
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), 'baseline.json')
+
+# Конфигурации: имя -> (алгоритм из реестра, параметры, фильтр задач, входит ли в прогон по умолчанию)
+SUITE = {
+    'maxrects-bssf': ('maxrects', {'heuristic': 'bssf'}, None, True),
+    'maxrects-baf': ('maxrects', {'heuristic': 'baf'}, None, True),
+    'maxrects-bl': ('maxrects', {'heuristic': 'bl'}, None, True),
+    'skyline': ('skyline', {}, None, True),
+    'guillotine': ('guillotine', {}, None, True),
+    'guillotine-kerf': ('guillotine', {'kerf': 3.2, 'trim': 10}, lambda inst: inst.sheet_width >= 1000, True),
+    # Перебор сетки с шагом 1 - только на маленьких листах и наборах
+    'first_fit': ('first_fit', {'step': 1},
+                  lambda inst: inst.n <= 100 and inst.sheet_width * inst.sheet_height <= 100 * 100, True),
+    'optimizer': ('optimizer', {'time_budget': 0.5, 'workers': 1, 'seed': 0},
+                  lambda inst: inst.n <= 100, False),
+    'exact': ('exact', {'time_limit': 2.0}, lambda inst: inst.n <= 100, False),
+}
+
+
+def run_instance(config: str, instance: Instance, measure_memory: bool) -> dict:
+    algorithm, params, _, _ = SUITE[config]
+    packer = create_algorithm(algorithm, **params)
+    parts = [Rectangle(width=w, height=h) for w, h in instance.dims]
+
+    started = time.perf_counter()
+    sheets = packer.pack_sheets(parts, instance.sheet_width, instance.sheet_height)
+    elapsed = time.perf_counter() - started
+
+    peak = 0
+    if measure_memory:
+        # Отдельный прогон: tracemalloc замедляет выполнение и испортил бы замер времени
+        packer = create_algorithm(algorithm, **params)
+        parts_again = [Rectangle(width=w, height=h) for w, h in instance.dims]
+        tracemalloc.start()
+        packer.pack_sheets(parts_again, instance.sheet_width, instance.sheet_height)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    sheet_area = instance.sheet_width * instance.sheet_height
+    placed_area = sum(p.area for sheet in sheets for p in sheet)
+    return {
+        'time': elapsed,
+        'peak_bytes': peak,
+        'placed': sum(len(sheet) for sheet in sheets),
+        'parts': len(parts),
+        'sheets': len(sheets),
+        'utilization': placed_area / (sheet_area * len(sheets)) * 100 if sheets else 0.0,
+        # Нижняя оценка числа листов по площади (L1) - для ориентира
+        'lower_bound': math.ceil(sum(w * h for w, h in instance.dims) / sheet_area),
+    }
+
+
+def run_suite(tier: str, configs: List[str], measure_memory: bool = True, verbose: bool = True) -> Dict[str, dict]:
+    """Результаты, агрегированные по группе задач (семейство + размер): ключ 'config|family/nN'"""
+    instances = tier_instances(tier)
+    results: Dict[str, dict] = {}
+    for config in configs:
+        instance_filter = SUITE[config][2]
+        for instance in instances:
+            if instance_filter is not None and not instance_filter(instance):
+                continue
+            metrics = run_instance(config, instance, measure_memory)
+            key = f"{config}|{instance.name}"
+            group = results.setdefault(key, {'time': 0.0, 'peak_bytes': 0, 'placed': 0, 'parts': 0,
+                                             'sheets': 0, 'lower_bound': 0, 'utilization': 0.0, 'runs': 0})
+            group['time'] += metrics['time']
+            group['peak_bytes'] = max(group['peak_bytes'], metrics['peak_bytes'])
+            for field in ('placed', 'parts', 'sheets', 'lower_bound'):
+                group[field] += metrics[field]
+            group['utilization'] += metrics['utilization']
+            group['runs'] += 1
+        if verbose:
+            print(f"  {config}: done", file=sys.stderr)
+
+    for group in results.values():
+        group['utilization'] /= group['runs']
+    return results
+
+
+def compare(results: Dict[str, dict], baseline: Dict[str, dict], time_tolerance: float) -> List[str]:
+    """Список регрессий относительно baseline (пустой - все хорошо)"""
+    problems = []
+    for key, current in results.items():
+        base = baseline.get(key)
+        if base is None:
+            continue
+        if current['sheets'] > base['sheets']:
+            problems.append(f"{key}: sheets {base['sheets']} -> {current['sheets']}")
+        if current['placed'] < base['placed']:
+            problems.append(f"{key}: placed {base['placed']} -> {current['placed']}")
+        if current['utilization'] < base['utilization'] - 0.5:
+            problems.append(f"{key}: utilization {base['utilization']:.2f}% -> {current['utilization']:.2f}%")
+        # Мелкие абсолютные колебания (< 10 мс) не считаем
+        if (current['time'] > base['time'] * (1 + time_tolerance) and
+                current['time'] - base['time'] > 0.01):
+            problems.append(f"{key}: time {base['time']:.3f}s -> {current['time']:.3f}s")
+    return problems
+
+
+def print_table(results: Dict[str, dict]):
+    header = f"{'config':<15} {'instances':<22} {'time, s':>9} {'peak, KB':>9} {'placed':>13} {'sheets':>7} {'LB':>6} {'util, %':>8}"
+    print(header)
+    print('-' * len(header))
+    for key, r in results.items():
+        config, group = key.split('|')
+        print(f"{config:<15} {group:<22} {r['time']:>9.3f} {r['peak_bytes'] // 1024:>9} "
+              f"{r['placed']:>6}/{r['parts']:<6} {r['sheets']:>7} {r['lower_bound']:>6} {r['utilization']:>8.2f}")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Packing algorithms benchmark")
+    parser.add_argument('--tier', default='quick', choices=sorted(TIERS))
+    parser.add_argument('--configs', help=f"comma-separated subset of: {', '.join(SUITE)}")
+    parser.add_argument('--no-memory', action='store_true', help="skip the tracemalloc pass")
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--check', action='store_true', help="compare with baseline, exit 1 on regression")
+    parser.add_argument('--time-tolerance', type=float, default=0.5, help="allowed relative slowdown")
+    parser.add_argument('--json', help="write raw results to this file")
+    args = parser.parse_args(argv)
+
+    if args.configs:
+        configs = [c.strip() for c in args.configs.split(',')]
+        unknown = [c for c in configs if c not in SUITE]
+        if unknown:
+            parser.error(f"unknown config(s): {', '.join(unknown)}")
+    else:
+        configs = [name for name, entry in SUITE.items() if entry[3]]
+
+    results = run_suite(args.tier, configs, measure_memory=not args.no_memory)
+    print_table(results)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+    if args.save_baseline:
+        stored = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline, encoding='utf-8') as f:
+                stored = json.load(f)
+        stored.setdefault(args.tier, {}).update(results)
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(stored, f, indent=2, sort_keys=True)
+        print(f"Baseline saved: {args.baseline} [{args.tier}]")
+
+    if args.check:
+        if not os.path.exists(args.baseline):
+            print(f"No baseline at {args.baseline}", file=sys.stderr)
+            return 1
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f).get(args.tier, {})
+        problems = compare(results, baseline, args.time_tolerance)
+        if problems:
+            print(f"\n{len(problems)} regression(s):")
+            for problem in problems:
+                print(f"  {problem}")
+            return 1
+        print("\nNo regressions against baseline")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,328 @@
+"""
+Headless-раскрой без pygame: читает задания (CSV/JSON), пакует выбранным алгоритмом
+и пишет раскладки в JSON/SVG/DXF со статистикой использования листа.
+
+    python cli.py jobs_dir/ --algorithm maxrects --sheet 3000x1500 --format json,svg --out out/
+
+Большие выгрузки (.jsonl/.ndjson/.txt/.parts или любой файл с --chunk-size) пакуются потоково,
+порциями (jobs/stream.py), в <job>.placements.jsonl - по строке на деталь.
+"""
+import argparse
+import os
+import sys
+import time
+
+DEFAULT_SHEET = (800, 600)
+DEFAULT_MARGIN = 4
+
+
+def run_job(path: str, options: dict) -> dict:
+    """
+    Обрабатывает один файл задания. Функция уровня модуля - чтобы ее можно было
+    отдать в ProcessPoolExecutor. Возвращает краткую сводку для вывода.
+    """
+    from algorithms import create_algorithm
+    from instrumentation import METRICS, PROFILER
+    from jobs.reader import STREAM_EXTENSIONS, load_job
+    from jobs.writers import WRITERS, layout_to_dict
+
+    if options.get('chunk_size') or os.path.splitext(path)[1].lower() in STREAM_EXTENSIONS + ('.txt',):
+        return run_stream_job(path, options)
+    job = load_job(path)
+    sheet_w = job.sheet_width or options['sheet_width']
+    sheet_h = job.sheet_height or options['sheet_height']
+    margin = job.margin if job.margin is not None else options['margin']
+
+    packer = algorithm = create_algorithm(options['algorithm'], **options['params'])
+    # Последовательность резов (гильотина) в кэше не хранится - такие алгоритмы считаем всегда
+    if options.get('cache_dir') and not hasattr(algorithm, 'cut_sequences'):
+        # Дисковый кэш общий для всех процессов: одинаковые заказы считаются один раз
+        from algorithms.cache import CachedPacker, LayoutCache
+        packer = CachedPacker(packer, LayoutCache(directory=options['cache_dir']),
+                              context={'margin': margin})
+    if options.get('blocks'):
+        # Одинаковые детали - блоками; поверх кэша, чтобы ключ кэша строился по блокам
+        from algorithms.blocks import BlockPacker
+        packer = BlockPacker(packer)
+    if options.get('metrics'):
+        # Метрики каждого задания отдельно: из процесса-воркера они уходят в сводке, родитель их суммирует
+        METRICS.enable()
+        METRICS.reset()
+    if options.get('profile'):
+        PROFILER.start()
+    started = time.perf_counter()
+    try:
+        # Как в UI: пакуем на листе, уменьшенном на отступ, потом сдвигаем детали внутрь
+        sheets = packer.pack_sheets(job.parts, sheet_w - margin * 2, sheet_h - margin * 2)
+    finally:
+        if options.get('profile'):
+            PROFILER.stop(f"{options['profile']}{job.name}")
+    elapsed = time.perf_counter() - started
+
+    for sheet in sheets:
+        for part in sheet:
+            part.x += margin
+            part.y += margin
+    cuts = getattr(algorithm, 'cut_sequences', None)
+    for sheet_cuts in cuts or []:
+        for cut in sheet_cuts:
+            cut.x1 += margin
+            cut.y1 += margin
+            cut.x2 += margin
+            cut.y2 += margin
+    placed_ids = {id(p) for sheet in sheets for p in sheet}
+    unplaced = [p for p in job.parts if id(p) not in placed_ids]
+
+    layout = layout_to_dict(job.name, sheets, unplaced, sheet_w, sheet_h, margin,
+                            options['algorithm'], elapsed, cuts)
+    os.makedirs(options['out_dir'], exist_ok=True)
+    for fmt in options['formats']:
+        WRITERS[fmt](os.path.join(options['out_dir'], f"{job.name}.{fmt}"), layout)
+
+    report = getattr(algorithm, 'last_report', None)
+    if report is not None:
+        # Точный решатель: доказана ли оптимальность и сколько осталось до нижней границы
+        layout['stats']['optimal'] = report.optimal
+        layout['stats']['gap'] = report.gap
+        layout['stats']['lower_bound'] = report.bound
+    summary = dict(layout['stats'])
+    summary['job'] = job.name
+    if options.get('metrics'):
+        summary['metrics'] = METRICS.snapshot()
+    return summary
+
+
+def run_stream_job(path: str, options: dict) -> dict:
+    """
+    Потоковый вариант run_job для выгрузок на миллионы строк: строки читаются лениво,
+    пакуются порциями по chunk_size деталей, размещения сразу пишутся в <job>.placements.jsonl.
+    В памяти - одна порция, поэтому SVG/DXF (им нужна вся раскладка), кэш и профиль здесь не работают:
+    такие опции попадают в summary['ignored'].
+    """
+    import json
+    from algorithms import create_algorithm
+    from instrumentation import METRICS
+    from jobs.stream import DEFAULT_CHUNK_SIZE, iter_parts, pack_stream, read_job_header
+
+    name = os.path.splitext(os.path.basename(path))[0]
+    # Лист и отступ из самого задания (JSON) важнее умолчаний командной строки - как в run_job
+    job_w, job_h, job_margin = read_job_header(path)
+    sheet_w = job_w or options['sheet_width']
+    sheet_h = job_h or options['sheet_height']
+    margin = job_margin if job_margin is not None else options['margin']
+    ignored = stream_ignored_options(options)
+    packer = create_algorithm(options['algorithm'], **options['params'])
+    if options.get('blocks'):
+        from algorithms.blocks import BlockPacker
+        packer = BlockPacker(packer)
+    if options.get('metrics'):
+        METRICS.enable()
+        METRICS.reset()
+
+    os.makedirs(options['out_dir'], exist_ok=True)
+    out_path = os.path.join(options['out_dir'], f"{name}.placements.jsonl")
+    sheets = placed = unplaced = 0
+    used_area = 0.0
+    started = time.perf_counter()
+    with open(out_path, 'w', encoding='utf-8') as out:
+        chunks = pack_stream(packer, iter_parts(path), sheet_w - margin * 2, sheet_h - margin * 2,
+                             options.get('chunk_size') or DEFAULT_CHUNK_SIZE)
+        for chunk in chunks:
+            for part_id, sheet_no, x, y, w, h, rotated in chunk.placements():
+                out.write(json.dumps({'id': part_id, 'sheet': sheet_no, 'x': x + margin, 'y': y + margin,
+                                      'width': w, 'height': h, 'rotated': rotated}) + '\n')
+                placed += 1
+                used_area += w * h
+            for part_id in chunk.unplaced_ids():
+                out.write(json.dumps({'id': part_id, 'sheet': None}) + '\n')
+                unplaced += 1
+            sheets += chunk.sheets
+            METRICS.count('stream.chunks')
+            METRICS.count('stream.parts', len(chunk.store))
+    elapsed = time.perf_counter() - started
+
+    summary = {
+        'job': name,
+        'sheets': sheets,
+        'parts_placed': placed,
+        'parts_unplaced': unplaced,
+        'utilization': used_area / (sheet_w * sheet_h * sheets) * 100 if sheets else 0.0,
+        'time_sec': elapsed,
+    }
+    if ignored:
+        summary['ignored'] = ignored
+    if options.get('metrics'):
+        summary['metrics'] = METRICS.snapshot()
+    return summary
+
+
+def stream_ignored_options(options: dict) -> list:
+    """Опции командной строки, которые потоковый путь не поддерживает (для предупреждения)"""
+    ignored = [f"--format {fmt}" for fmt in options['formats'] if fmt != 'json']
+    if options.get('cache_dir'):
+        ignored.append('--cache-dir')
+    if options.get('profile'):
+        ignored.append('--profile')
+    return ignored
+
+
+def _parse_sheet(value: str):
+    try:
+        width, height = value.lower().replace('×', 'x').split('x')
+        return float(width), float(height)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected WIDTHxHEIGHT, got {value!r}") from None
+
+
+def _parse_params(items):
+    """--param key=value -> {'key': value}; числа и true/false приводятся к типам"""
+    params = {}
+    for item in items or []:
+        key, _, raw = item.partition('=')
+        if raw.lower() in ('true', 'false'):
+            value = raw.lower() == 'true'
+        else:
+            try:
+                value = int(raw)
+            except ValueError:
+                try:
+                    value = float(raw)
+                except ValueError:
+                    value = raw
+        params[key] = value
+    return params
+
+
+def build_parser() -> argparse.ArgumentParser:
+    from algorithms import ALGORITHMS
+    from jobs.writers import WRITERS
+
+    parser = argparse.ArgumentParser(description="Headless nesting of job files (CSV/JSON)")
+    parser.add_argument('inputs', nargs='+',
+                        help="job files or directories with *.csv / *.json (streamed: *.jsonl / *.ndjson / *.parts)")
+    parser.add_argument('--algorithm', '-a', default='maxrects', choices=sorted(ALGORITHMS))
+    parser.add_argument('--param', '-p', action='append', metavar='KEY=VALUE',
+                        help="algorithm constructor parameter, e.g. -p heuristic=baf -p step=5 "
+                             "(guillotine: -p kerf=3.2 -p trim=10 -p split=slas)")
+    parser.add_argument('--no-rotation', action='store_true', help="forbid 90° rotation for all parts")
+    parser.add_argument('--sheet', type=_parse_sheet, default=DEFAULT_SHEET, metavar='WxH',
+                        help="default sheet size in mm (job files may override)")
+    parser.add_argument('--margin', type=float, default=DEFAULT_MARGIN, help="edge margin in mm")
+    parser.add_argument('--format', '-f', default='json',
+                        help=f"comma-separated output formats: {', '.join(WRITERS)}")
+    parser.add_argument('--out', '-o', default='out', help="output directory")
+    parser.add_argument('--workers', '-j', type=int, default=None,
+                        help="parallel job processes (default: all cores, 1: no pool)")
+    parser.add_argument('--blocks', action='store_true',
+                        help="pack identical parts as k×m blocks (item classes), remainder one by one "
+                             "(not for algorithms with a cut sequence, e.g. guillotine)")
+    parser.add_argument('--cache-dir', default=None,
+                        help="reuse layouts of identical jobs from this directory (created if missing)")
+    parser.add_argument('--chunk-size', type=int, default=None, metavar='N',
+                        help="stream every job in chunks of N parts into <job>.placements.jsonl "
+                             "(always on for .jsonl/.ndjson/.txt/.parts)")
+    parser.add_argument('--metrics', default=None, metavar='PATH',
+                        help="write pack/collision timers and counters of all jobs to PATH "
+                             "(.prom/.txt: Prometheus text, otherwise JSON)")
+    parser.add_argument('--profile', default=None, metavar='PREFIX',
+                        help="capture cProfile + tracemalloc per job into PREFIX<job>.prof / PREFIX<job>.mem.txt")
+    return parser
+
+
+def main(argv=None) -> int:
+    from jobs.reader import find_jobs
+    from jobs.writers import WRITERS
+
+    args = build_parser().parse_args(argv)
+    formats = [f.strip() for f in args.format.split(',') if f.strip()]
+    unknown = [f for f in formats if f not in WRITERS]
+    if unknown:
+        print(f"Unknown output format(s): {', '.join(unknown)}", file=sys.stderr)
+        return 2
+
+    params = _parse_params(args.param)
+    if args.no_rotation:
+        params['allow_rotation'] = False
+    options = {
+        'algorithm': args.algorithm,
+        'params': params,
+        'sheet_width': args.sheet[0],
+        'sheet_height': args.sheet[1],
+        'margin': args.margin,
+        'formats': formats,
+        'out_dir': args.out,
+        'cache_dir': args.cache_dir,
+        'metrics': bool(args.metrics),
+        'profile': args.profile,
+        'chunk_size': args.chunk_size,
+        'blocks': args.blocks,
+    }
+
+    if args.chunk_size:
+        # Все задания пойдут потоком: неподдерживаемые опции - ошибка, а не молчаливый пропуск
+        ignored = stream_ignored_options(options)
+        if ignored:
+            print(f"--chunk-size does not support: {', '.join(ignored)}", file=sys.stderr)
+            return 2
+
+    if args.blocks:
+        # Проверяем до запуска заданий: иначе каждое упадет с одной и той же ошибкой
+        from algorithms import create_algorithm
+        from algorithms.blocks import BlockPacker
+        try:
+            BlockPacker(create_algorithm(args.algorithm, **params))
+        except (TypeError, ValueError) as error:
+            print(f"--blocks: {error}", file=sys.stderr)
+            return 2
+
+    paths = find_jobs(args.inputs)
+    if not paths:
+        print("No job files found", file=sys.stderr)
+        return 1
+
+    workers = args.workers or os.cpu_count() or 1
+    failed = 0
+    from instrumentation import Metrics
+    totals = Metrics(enabled=True) # сумма метрик всех заданий (--metrics)
+
+    def report(path, summary=None, error=None):
+        nonlocal failed
+        if error is not None:
+            failed += 1
+            print(f"{os.path.basename(path)}: FAILED: {error}", file=sys.stderr)
+            return
+        if 'metrics' in summary:
+            totals.merge(summary.pop('metrics'))
+        if summary.get('ignored'):
+            # .jsonl/.txt/.parts всегда идут потоком, даже без --chunk-size
+            print(f"{summary['job']}: streamed job, ignored {', '.join(summary['ignored'])}", file=sys.stderr)
+        print(f"{summary['job']}: sheets={summary['sheets']} placed={summary['parts_placed']} "
+              f"unplaced={summary['parts_unplaced']} utilization={summary['utilization']:.1f}% "
+              f"time={summary['time_sec']:.3f}s" +
+              (f" optimal={summary['optimal']} gap={summary['gap'] * 100:.1f}%" if 'gap' in summary else ""))
+
+    if workers <= 1 or len(paths) == 1:
+        for path in paths:
+            try:
+                report(path, run_job(path, options))
+            except Exception as error:
+                report(path, error=error)
+    else:
+        # Задания независимы: раздаем файлы по процессам и печатаем по мере готовности
+        from concurrent.futures import ProcessPoolExecutor, as_completed
+        with ProcessPoolExecutor(max_workers=min(workers, len(paths))) as executor:
+            futures = {executor.submit(run_job, path, options): path for path in paths}
+            for future in as_completed(futures):
+                try:
+                    report(futures[future], future.result())
+                except Exception as error:
+                    report(futures[future], error=error)
+
+    if args.metrics:
+        totals.export(args.metrics)
+        print(f"Metrics written to {args.metrics}")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
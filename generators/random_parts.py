@@ -1,5 +1,12 @@
 import random
+from array import array
+from typing import Iterator, Optional
 from models.shape import Rectangle
+from models.part_store import PartStore
+from jobs.stream import PartSpec
+
+# Перекошенные распределения размеров - те же смеси, что у семейств skewed_* в benchmarks/instances.py
+SKEWED_DISTRIBUTIONS = ('small', 'lognormal')
 
 def generate_random_parts(count=10, min_size=50, max_size=150):
     parts = []
@@ -7,4 +14,52 @@ def generate_random_parts(count=10, min_size=50, max_size=150):
         w = random.randint(min_size, max_size)
         h = random.randint(min_size // 2, max_size // 2)
         parts.append(Rectangle(width=w, height=h))
-    return parts
\ No newline at end of file
+    return parts
+
+def generate_random_store(count=10, min_size=50, max_size=150, seed: Optional[int] = None) -> PartStore:
+    """То же распределение, что generate_random_parts, но сразу в колонки PartStore - без объектов"""
+    rng = random.Random(seed)
+    store = PartStore()
+    store.extend_columns([rng.randint(min_size, max_size) for _ in range(count)],
+                         [rng.randint(min_size // 2, max_size // 2) for _ in range(count)])
+    return store
+
+def iter_skewed_specs(count: int, seed: Optional[int] = None, distribution: str = 'small',
+                      max_quantity: int = 500) -> Iterator[PartSpec]:
+    """
+    Поток строк заказа на count деталей, как в выгрузке ERP: размеры из перекошенного
+    распределения, количество в строке - с тяжелым хвостом (Парето: в основном 1-3 штуки,
+    изредка сотни). Один seed - одна и та же последовательность; ничего не копится в памяти.
+
+    small     - 90% мелочи 20..120 x 20..80 и 10% панелей 600..1400 x 400..900 (лист 3000x1500)
+    lognormal - логнормальные стороны с длинным хвостом крупных деталей
+    """
+    if distribution not in SKEWED_DISTRIBUTIONS:
+        raise ValueError(f"Unknown distribution: {distribution!r} (available: {', '.join(SKEWED_DISTRIBUTIONS)})")
+    rng = random.Random(seed)
+    randint, uniform, lognormal, pareto = rng.randint, rng.random, rng.lognormvariate, rng.paretovariate
+    emitted = line = 0
+    while emitted < count:
+        if distribution == 'small':
+            if uniform() < 0.9:
+                w, h = randint(20, 120), randint(20, 80)
+            else:
+                w, h = randint(600, 1400), randint(400, 900)
+        else:
+            w = min(3000, max(10, round(lognormal(4.8, 0.7))))
+            h = min(1500, max(10, round(lognormal(4.3, 0.6))))
+        quantity = min(int(pareto(1.2)), max_quantity, count - emitted)
+        emitted += quantity
+        line += 1
+        yield PartSpec(w, h, quantity, True, f"p{line}")
+
+def generate_skewed_store(count: int, seed: Optional[int] = None, distribution: str = 'small',
+                          max_quantity: int = 500) -> PartStore:
+    """iter_skewed_specs сразу в колонки PartStore: миллионы деталей без Rectangle, uuid и цветов"""
+    widths, heights = array('d'), array('d')
+    for spec in iter_skewed_specs(count, seed, distribution, max_quantity):
+        widths.extend(array('d', [spec.width]) * spec.quantity)
+        heights.extend(array('d', [spec.height]) * spec.quantity)
+    store = PartStore()
+    store.extend_columns(widths, heights)
+    return store
@@ -0,0 +1,264 @@
+"""
+Легкая инструментация: таймеры и счетчики упаковки, проверок коллизий и кадров UI.
+
+По умолчанию выключена и почти ничего не стоит: METRICS.timer() отдает общий пустой
+контекст, а горячие места проверяют METRICS.enabled один раз на вызов (на поиск позиции,
+пакет проверок, кадр), а не на каждого кандидата. Включается METRICS.enable(),
+переменной окружения CUTTING_METRICS=1, флагом cli.py --metrics или клавишей F3 в UI.
+
+    from instrumentation import METRICS
+    METRICS.enable()
+    with METRICS.timer('pack.MaxRectsPacker'):
+        ...
+    METRICS.count('candidates', len(free_rects))
+    METRICS.export('metrics.prom')   # .prom / .txt - Prometheus text, иначе JSON
+
+Профилирование (cProfile + tracemalloc) дорогое и включается отдельно: PROFILER.start() / stop(prefix).
+"""
+import cProfile
+import json
+import os
+import pstats
+import re
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Dict, List
+
+# Переменная окружения: включить метрики с самого старта (cli, UI, бенчмарки)
+METRICS_ENV = 'CUTTING_METRICS'
+PROMETHEUS_PREFIX = 'cutting_'
+
+
+@dataclass(slots=True)
+class TimerStats:
+    count: int = 0
+    total: float = 0.0 # секунды
+    max: float = 0.0
+    last: float = 0.0
+
+    def add(self, seconds: float):
+        self.count += 1
+        self.total += seconds
+        self.last = seconds
+        if seconds > self.max:
+            self.max = seconds
+
+
+class _NullTimer:
+    """Таймер выключенных метрик: один общий объект, без замеров"""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _Timer:
+    __slots__ = ('metrics', 'name', 'started')
+
+    def __init__(self, metrics: 'Metrics', name: str):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.add_time(self.name, time.perf_counter() - self.started)
+        return False
+
+
+class Metrics:
+    """
+    Реестр счетчиков и таймеров. Имена - через точку ('pack.MaxRectsPacker', 'ui.render'),
+    в Prometheus точки становятся подчеркиваниями. Пишут и поток UI, и фоновая упаковка,
+    поэтому изменения под замком (замок берется только во включенном состоянии).
+    """
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self.counters: Dict[str, int] = {}
+        self.timers: Dict[str, TimerStats] = {}
+        self._lock = threading.Lock()
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def reset(self):
+        with self._lock:
+            self.counters.clear()
+            self.timers.clear()
+
+    def count(self, name: str, n: int = 1):
+        if not self.enabled:
+            return
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def add_time(self, name: str, seconds: float):
+        if not self.enabled:
+            return
+        with self._lock:
+            stats = self.timers.get(name)
+            if stats is None:
+                stats = self.timers[name] = TimerStats()
+            stats.add(seconds)
+
+    def timer(self, name: str):
+        """Контекст замера времени блока; при выключенных метриках - пустой"""
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, name)
+
+    # --- Экспорт ---
+
+    def snapshot(self) -> dict:
+        """Все значения простыми типами (JSON, передача из процесса-воркера)"""
+        with self._lock:
+            return {
+                'counters': dict(sorted(self.counters.items())),
+                'timers': {name: {'count': s.count, 'total_sec': s.total, 'max_sec': s.max, 'last_sec': s.last}
+                           for name, s in sorted(self.timers.items())},
+            }
+
+    def merge(self, snapshot: dict):
+        """Добавляет snapshot() другого реестра (например, из ProcessPoolExecutor)"""
+        with self._lock:
+            for name, value in snapshot.get('counters', {}).items():
+                self.counters[name] = self.counters.get(name, 0) + value
+            for name, data in snapshot.get('timers', {}).items():
+                stats = self.timers.get(name)
+                if stats is None:
+                    stats = self.timers[name] = TimerStats()
+                stats.count += data['count']
+                stats.total += data['total_sec']
+                stats.max = max(stats.max, data['max_sec'])
+                stats.last = data['last_sec']
+
+    def to_prometheus(self) -> str:
+        """Текстовый формат Prometheus: счетчики - counter, таймеры - summary (_count/_sum) + _max"""
+        snapshot = self.snapshot()
+        lines = []
+        for name, value in snapshot['counters'].items():
+            metric = _prometheus_name(name) + '_total'
+            lines += [f"# TYPE {metric} counter", f"{metric} {value}"]
+        for name, data in snapshot['timers'].items():
+            metric = _prometheus_name(name) + '_seconds'
+            lines += [f"# TYPE {metric} summary",
+                      f"{metric}_count {data['count']}",
+                      f"{metric}_sum {data['total_sec']:.9f}",
+                      f"# TYPE {metric}_max gauge",
+                      f"{metric}_max {data['max_sec']:.9f}"]
+        return '\n'.join(lines) + '\n'
+
+    def export(self, path: str):
+        """Пишет метрики в файл: .prom / .txt - Prometheus text, остальное - JSON"""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            if path.endswith(('.prom', '.txt')):
+                f.write(self.to_prometheus())
+            else:
+                json.dump(self.snapshot(), f, indent=2)
+
+    def summary_lines(self, limit: int = 12) -> List[str]:
+        """Короткие строки для оверлея UI: таймеры (среднее/максимум, мс), затем счетчики"""
+        snapshot = self.snapshot()
+        lines = [f"{name} {data['total_sec'] / data['count'] * 1000:.1f}/{data['max_sec'] * 1000:.0f}ms"
+                 for name, data in snapshot['timers'].items() if data['count']]
+        lines += [f"{name} {value}" for name, value in snapshot['counters'].items()]
+        return lines[:limit]
+
+
+def _prometheus_name(name: str) -> str:
+    return PROMETHEUS_PREFIX + re.sub(r'[^a-zA-Z0-9_]', '_', name).lower()
+
+
+class ProfileCapture:
+    """
+    Опциональный захват профиля: cProfile (время по функциям) и tracemalloc (память).
+    cProfile видит только свой поток, поэтому фоновые потоки (упаковка в UI) оборачиваются
+    в thread() - их профили складываются в общий отчет при stop().
+    """
+
+    def __init__(self):
+        self.active = False
+        self._profile = None
+        self._thread_profiles: List[cProfile.Profile] = []
+        self._lock = threading.Lock()
+
+    def start(self, cpu: bool = True, memory: bool = True):
+        if self.active:
+            return
+        self.active = True
+        self._thread_profiles = []
+        if cpu:
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        if memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    @contextmanager
+    def thread(self):
+        """Профиль текущего (не главного) потока на время блока, если захват включен"""
+        if not self.active or self._profile is None:
+            yield
+            return
+        profile = cProfile.Profile()
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+            with self._lock:
+                self._thread_profiles.append(profile)
+
+    def stop(self, prefix: str) -> List[str]:
+        """
+        Останавливает захват и пишет файлы: prefix.prof (pstats, смотреть snakeviz / python -m pstats)
+        и prefix.mem.txt (пик памяти и топ мест выделения). Возвращает пути записанных файлов.
+        """
+        if not self.active:
+            return []
+        self.active = False
+        directory = os.path.dirname(prefix)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        written = []
+        if self._profile is not None:
+            self._profile.disable()
+            stats = pstats.Stats(self._profile)
+            with self._lock:
+                for profile in self._thread_profiles:
+                    stats.add(profile)
+                self._thread_profiles = []
+            stats.dump_stats(f"{prefix}.prof")
+            written.append(f"{prefix}.prof")
+            self._profile = None
+        if tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            top = tracemalloc.take_snapshot().statistics('lineno')[:25]
+            tracemalloc.stop()
+            with open(f"{prefix}.mem.txt", 'w', encoding='utf-8') as f:
+                f.write(f"current: {current / 1024:.1f} KiB\npeak: {peak / 1024:.1f} KiB\n\n")
+                f.writelines(f"{stat}\n" for stat in top)
+            written.append(f"{prefix}.mem.txt")
+        return written
+
+
+# Общие на процесс реестр метрик и захват профиля
+METRICS = Metrics(enabled=os.environ.get(METRICS_ENV, '') not in ('', '0'))
+PROFILER = ProfileCapture()
@@ -0,0 +1,112 @@
+import csv
+import json
+import os
+from dataclasses import dataclass, field
+from typing import List, Optional
+from models.shape import Rectangle
+
+JOB_EXTENSIONS = ('.csv', '.json')
+# Только потоковое чтение (jobs/stream.py): порциями, без списка Rectangle на весь заказ.
+# .txt (строки заказа) там тоже читается, но из каталогов не подбирается - слишком общее расширение
+STREAM_EXTENSIONS = ('.jsonl', '.ndjson', '.parts')
+
+
+@dataclass
+class Job:
+    """Задание на раскрой: детали + параметры листа"""
+    name: str
+    parts: List[Rectangle] = field(default_factory=list)
+    sheet_width: Optional[float] = None
+    sheet_height: Optional[float] = None
+    margin: Optional[float] = None
+
+
+def _to_bool(value) -> bool:
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() not in ('0', 'false', 'no', 'n', '')
+
+
+def _to_quantity(value) -> int:
+    """quantity строки заказа: нет значения или пусто - 1, иначе целое >= 0 (0 - строка без деталей)"""
+    if value is None or (isinstance(value, str) and not value.strip()):
+        return 1
+    if isinstance(value, bool):
+        raise ValueError(f"invalid quantity {value!r}")
+    number = float(value) if isinstance(value, str) else value
+    if isinstance(number, float):
+        if not number.is_integer():
+            raise ValueError(f"invalid quantity {value!r}")
+        number = int(number)
+    if not isinstance(number, int) or number < 0:
+        raise ValueError(f"invalid quantity {value!r}")
+    return number
+
+
+def _expand(job: Job, row: dict, line_no: int):
+    """Одна строка заказа (с quantity) -> quantity деталей Rectangle"""
+    try:
+        width = float(row['width'])
+        height = float(row['height'])
+    except (KeyError, TypeError, ValueError):
+        raise ValueError(f"{job.name}: part #{line_no} needs numeric 'width' and 'height'") from None
+    try:
+        quantity = _to_quantity(row.get('quantity'))
+    except (TypeError, ValueError):
+        raise ValueError(f"{job.name}: part #{line_no} needs a whole non-negative 'quantity', "
+                         f"got {row.get('quantity')!r}") from None
+    can_rotate = _to_bool(row.get('can_rotate', True))
+    base_id = str(row.get('id') or f"p{line_no}")
+    for k in range(quantity):
+        part_id = base_id if quantity == 1 else f"{base_id}-{k + 1}"
+        job.parts.append(Rectangle(width=width, height=height, id=part_id, can_rotate=can_rotate))
+
+
+def load_job(path: str) -> Job:
+    """
+    Читает задание из CSV или JSON.
+
+    CSV: заголовок width,height[,quantity][,can_rotate][,id].
+    JSON: {"sheet": {"width": .., "height": ..}, "margin": .., "parts": [{"width": .., "height": .., ...}]}
+          или просто список деталей.
+    Не заданные в файле параметры листа остаются None - их подставляет вызывающий код.
+    """
+    name = os.path.splitext(os.path.basename(path))[0]
+    job = Job(name=name)
+    extension = os.path.splitext(path)[1].lower()
+
+    if extension == '.csv':
+        with open(path, newline='', encoding='utf-8') as f:
+            for line_no, row in enumerate(csv.DictReader(f), 1):
+                _expand(job, row, line_no)
+        return job
+
+    if extension == '.json':
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        if isinstance(data, dict):
+            sheet = data.get('sheet') or {}
+            job.sheet_width = sheet.get('width')
+            job.sheet_height = sheet.get('height')
+            job.margin = data.get('margin')
+            rows = data.get('parts', [])
+        else:
+            rows = data
+        for line_no, row in enumerate(rows, 1):
+            _expand(job, row, line_no)
+        return job
+
+    raise ValueError(f"Unsupported job file: {path} (expected {', '.join(JOB_EXTENSIONS)})")
+
+
+def find_jobs(paths: List[str]) -> List[str]:
+    """Раскрывает каталоги в список файлов заданий (по алфавиту)"""
+    found = []
+    for path in paths:
+        if os.path.isdir(path):
+            for entry in sorted(os.listdir(path)):
+                if os.path.splitext(entry)[1].lower() in JOB_EXTENSIONS + STREAM_EXTENSIONS:
+                    found.append(os.path.join(path, entry))
+        else:
+            found.append(path)
+    return found
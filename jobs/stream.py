@@ -0,0 +1,323 @@
+"""
+Потоковое чтение больших заказов: строки читаются лениво и упаковываются порциями (chunk),
+без списка Rectangle на весь заказ. Память - O(размер порции), а не O(число деталей).
+
+Источники (iter_parts выбирает по расширению):
+    .csv           - width,height[,quantity][,can_rotate][,id] (как load_job) или колонка size "120×40"
+    .jsonl/.ndjson - по объекту на строку {"width": .., "height": .., "quantity": ..} или строка заказа
+    .txt           - строки заказа: "250 × 120×40 bracket", "120x40", "# комментарий"
+    .parts         - бинарная таблица деталей (write_part_table), читается через mmap
+
+    specs = iter_parts('erp_export.csv')
+    for chunk in pack_stream(MaxRectsPacker(), specs, 2990, 1490, chunk_size=5000):
+        for part_id, sheet_no, x, y, w, h, rotated in chunk.placements():
+            ...
+
+Плата за потоковость: сортировка и подбор деталей идут внутри порции, а лист,
+недозаполненный одной порцией, следующей не дополняется - не больше листа на порцию.
+"""
+import csv
+import json
+import mmap
+import os
+import re
+import struct
+from bisect import bisect_right
+from dataclasses import dataclass, field
+from typing import Iterable, Iterator, List, NamedTuple, Optional, Tuple
+from models.part_store import FLAG_CAN_ROTATE, FLAG_PLACED, FLAG_ROTATED, PartStore
+from jobs.reader import _to_bool, _to_quantity
+
+# Порция: packer.pack_sheets заметно сверхлинеен по числу деталей, а листов на больших
+# порциях выходит лишь на несколько процентов меньше (maxrects, skewed: 1000 - 460 листов, 10000 - 417)
+DEFAULT_CHUNK_SIZE = 5000
+
+# Бинарная таблица: заголовок (магия, версия, число записей) + записи width, height, quantity, flags
+PART_TABLE_MAGIC = b'CUTPARTS'
+PART_TABLE_HEADER = struct.Struct('<8sHQ')
+PART_TABLE_RECORD = struct.Struct('<ddIB')
+PART_TABLE_VERSION = 1
+# Сколько записей таблицы распаковывается за раз (остальное лежит в mmap, а не в памяти процесса)
+PART_TABLE_BLOCK = 65536
+
+_NUMBER = r'(\d+(?:[.,]\d+)?)'
+_TIMES = r'\s*[×xXхХ*]\s*'
+# "250 × 120×40 id", "250 pcs x 120 x 40", "120x40" - количество необязательно
+ORDER_LINE = re.compile(rf'^\s*(?:(\d+)\s*(?:pcs|pc|шт\.?)?{_TIMES})?{_NUMBER}{_TIMES}{_NUMBER}\s*[,;]?\s*(.*?)\s*$',
+                        re.IGNORECASE)
+SIZE = re.compile(rf'^\s*{_NUMBER}{_TIMES}{_NUMBER}\s*$')
+
+
+class PartSpec(NamedTuple):
+    """Строка заказа до раскрытия количества: quantity одинаковых деталей"""
+    width: float
+    height: float
+    quantity: int = 1
+    can_rotate: bool = True
+    id: Optional[str] = None
+
+
+def _number(text: str) -> float:
+    return float(text.replace(',', '.'))
+
+
+def parse_order_line(text: str, line_no: int = 0) -> Optional[PartSpec]:
+    """
+    Строка заказа "250 × 120×40 [id]" -> PartSpec(120, 40, 250, id=...).
+    Пустые строки и комментарии (#) -> None. Без id деталь получает p<line_no>.
+    """
+    text = text.strip()
+    if not text or text.startswith('#'):
+        return None
+    match = ORDER_LINE.match(text)
+    if match is None:
+        raise ValueError(f"line {line_no}: expected order line like '250 × 120×40', got {text!r}")
+    quantity, width, height, part_id = match.groups()
+    return PartSpec(_number(width), _number(height), int(quantity or 1), True, part_id or f"p{line_no}")
+
+
+def spec_from_row(row: dict, line_no: int, where: Optional[str] = None) -> PartSpec:
+    """
+    Словарь (строка CSV, объект JSON) -> PartSpec; те же поля, что у load_job, плюс size.
+    line_no - номер строки заказа (из него id p<line_no>), where - где она в файле для текста ошибки
+    (по умолчанию "line <line_no>"): в выгрузке на миллионы строк без него плохую строку не найти.
+    """
+    where = where or f"line {line_no}"
+    try:
+        if row.get('width') in (None, '') and row.get('size'):
+            match = SIZE.match(str(row['size']))
+            if match is None:
+                raise ValueError
+            width, height = _number(match.group(1)), _number(match.group(2))
+        else:
+            width = float(row['width'])
+            height = float(row['height'])
+    except (KeyError, TypeError, ValueError):
+        raise ValueError(f"{where}: part needs numeric 'width' and 'height' (or 'size' like 120×40)") from None
+    try:
+        quantity = _to_quantity(row.get('quantity'))
+    except (TypeError, ValueError):
+        raise ValueError(f"{where}: part needs a whole non-negative 'quantity', "
+                         f"got {row.get('quantity')!r}") from None
+    return PartSpec(width, height, quantity, _to_bool(row.get('can_rotate', True)),
+                    str(row.get('id') or f"p{line_no}"))
+
+
+# --- Ленивые читатели ---
+
+def iter_csv(path: str) -> Iterator[PartSpec]:
+    with open(path, newline='', encoding='utf-8') as f:
+        reader = csv.DictReader(f)
+        for line_no, row in enumerate(reader, 1):
+            # line_num - строка файла (с заголовком и переносами внутри кавычек), line_no - номер детали
+            yield spec_from_row(row, line_no, f"line {reader.line_num}")
+
+
+def iter_jsonl(path: str) -> Iterator[PartSpec]:
+    with open(path, encoding='utf-8') as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                item = json.loads(line)
+            except json.JSONDecodeError as error:
+                raise ValueError(f"line {line_no}: invalid JSON ({error.msg} at column {error.colno})") from None
+            if isinstance(item, str):
+                spec = parse_order_line(item, line_no)
+                if spec is not None:
+                    yield spec
+            elif isinstance(item, dict):
+                yield spec_from_row(item, line_no)
+            else:
+                raise ValueError(f"line {line_no}: expected an object or an order line string, got {item!r}")
+
+
+def iter_json(path: str) -> Iterator[PartSpec]:
+    """
+    Обычное задание JSON (как у load_job). Сам файл разбирается целиком - формат не потоковый,
+    но детали раскрываются порциями. Параметры листа из файла - read_job_header.
+    """
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    rows = data.get('parts', []) if isinstance(data, dict) else data
+    for line_no, row in enumerate(rows, 1):
+        yield spec_from_row(row, line_no, f"part #{line_no}")
+
+
+def read_job_header(path: str) -> Tuple[Optional[float], Optional[float], Optional[float]]:
+    """
+    (sheet_width, sheet_height, margin) из заголовка задания, как их читает load_job; None - не задано.
+    Заголовок бывает только у JSON-задания, остальные форматы - только детали.
+    """
+    if os.path.splitext(path)[1].lower() != '.json':
+        return None, None, None
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    if not isinstance(data, dict):
+        return None, None, None
+    sheet = data.get('sheet') or {}
+    return sheet.get('width'), sheet.get('height'), data.get('margin')
+
+
+def iter_order_lines(path: str) -> Iterator[PartSpec]:
+    with open(path, encoding='utf-8') as f:
+        for line_no, line in enumerate(f, 1):
+            spec = parse_order_line(line, line_no)
+            if spec is not None:
+                yield spec
+
+
+def write_part_table(path: str, specs: Iterable[PartSpec]) -> int:
+    """
+    Пишет строки заказа в бинарную таблицу .parts (21 байт на строку, без id:
+    при чтении строки получают p<номер>). Возвращает число записанных строк.
+    """
+    count = 0
+    with open(path, 'wb') as f:
+        f.write(PART_TABLE_HEADER.pack(PART_TABLE_MAGIC, PART_TABLE_VERSION, 0))
+        pack = PART_TABLE_RECORD.pack
+        for spec in specs:
+            f.write(pack(spec.width, spec.height, spec.quantity, FLAG_CAN_ROTATE if spec.can_rotate else 0))
+            count += 1
+        # Число записей - в заголовок, когда оно известно (вход может быть генератором)
+        f.seek(0)
+        f.write(PART_TABLE_HEADER.pack(PART_TABLE_MAGIC, PART_TABLE_VERSION, count))
+    return count
+
+
+def iter_part_table(path: str) -> Iterator[PartSpec]:
+    """Читает .parts через mmap блоками по PART_TABLE_BLOCK записей"""
+    with open(path, 'rb') as f:
+        header = f.read(PART_TABLE_HEADER.size)
+        if len(header) < PART_TABLE_HEADER.size:
+            raise ValueError(f"{path}: not a part table (file too short)")
+        magic, version, count = PART_TABLE_HEADER.unpack(header)
+        if magic != PART_TABLE_MAGIC or version != PART_TABLE_VERSION:
+            raise ValueError(f"{path}: not a part table (bad header)")
+        if count == 0:
+            return
+        record = PART_TABLE_RECORD.size
+        end = PART_TABLE_HEADER.size + count * record
+        if os.fstat(f.fileno()).st_size < end:
+            raise ValueError(f"{path}: part table is truncated")
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as table:
+            line_no = 0
+            for start in range(PART_TABLE_HEADER.size, end, PART_TABLE_BLOCK * record):
+                # Срез mmap - копия одного блока: генератор можно бросить на середине, не держа буфер
+                block = table[start:min(end, start + PART_TABLE_BLOCK * record)]
+                for width, height, quantity, flags in PART_TABLE_RECORD.iter_unpack(block):
+                    line_no += 1
+                    yield PartSpec(width, height, quantity, bool(flags & FLAG_CAN_ROTATE), f"p{line_no}")
+
+
+READERS = {
+    '.csv': iter_csv,
+    '.json': iter_json,
+    '.jsonl': iter_jsonl,
+    '.ndjson': iter_jsonl,
+    '.txt': iter_order_lines,
+    '.parts': iter_part_table,
+}
+
+
+def iter_parts(path: str) -> Iterator[PartSpec]:
+    """Ленивый поток строк заказа из файла; читатель выбирается по расширению"""
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in READERS:
+        raise ValueError(f"Unsupported stream file: {path} (expected {', '.join(READERS)})")
+    return READERS[extension](path)
+
+
+# --- Порции ---
+
+@dataclass
+class StreamChunk:
+    """
+    Порция потока: детали в PartStore и строки заказа, из которых они раскрыты.
+    runs - (индекс первой детали в store, строка заказа, номер первой копии) на каждый кусок строки:
+    строка с большим quantity может начаться в одной порции и закончиться в следующей.
+    """
+    index: int
+    store: PartStore
+    runs: List[Tuple[int, PartSpec, int]] = field(default_factory=list)
+    first_sheet: int = 0 # номер первого листа порции во всем потоке
+    sheets: int = 0      # листов после упаковки
+
+    def part_id(self, i: int) -> str:
+        """Id детали i, как у load_job: id строки, с quantity > 1 - id-номер_копии"""
+        start, spec, first_copy = self.runs[bisect_right([run[0] for run in self.runs], i) - 1]
+        return spec.id if spec.quantity == 1 else f"{spec.id}-{first_copy + i - start}"
+
+    def part_ids(self) -> Iterator[str]:
+        """Id всех деталей порции по порядку - без списка на всю порцию"""
+        ends = [run[0] for run in self.runs[1:]] + [len(self.store)]
+        for (start, spec, first_copy), end in zip(self.runs, ends):
+            if spec.quantity == 1:
+                yield spec.id
+            else:
+                for copy in range(first_copy, first_copy + end - start):
+                    yield f"{spec.id}-{copy}"
+
+    def placements(self) -> Iterator[Tuple[str, int, float, float, float, float, bool]]:
+        """(id, лист во всем потоке, x, y, width, height, повернута) размещенных деталей порции"""
+        store = self.store
+        for i, part_id in enumerate(self.part_ids()):
+            flags = store.flags[i]
+            if flags & FLAG_PLACED:
+                yield (part_id, self.first_sheet + store.sheet[i], store.x[i], store.y[i],
+                       store.w[i], store.h[i], bool(flags & FLAG_ROTATED))
+
+    def unplaced_ids(self) -> Iterator[str]:
+        flags = self.store.flags
+        for i, part_id in enumerate(self.part_ids()):
+            if not flags[i] & FLAG_PLACED:
+                yield part_id
+
+
+def chunked_stores(specs: Iterable[PartSpec], chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[StreamChunk]:
+    """
+    Раскрывает количество и режет поток на порции по chunk_size деталей.
+    Копии одной строки добавляются в колонки целиком (extend_columns), без цикла по деталям.
+    Id в PartStore сквозные по всему потоку - цвета деталей в UI стабильны.
+    """
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be positive")
+    index, next_id = 0, 0
+    chunk = StreamChunk(index, PartStore())
+    for spec in specs:
+        if spec.quantity < 1:
+            continue
+        copy = 1
+        while copy <= spec.quantity:
+            store = chunk.store
+            take = min(spec.quantity - copy + 1, chunk_size - len(store))
+            chunk.runs.append((len(store), spec, copy))
+            store._next_id = next_id
+            if take == 1:
+                store.append(spec.width, spec.height, spec.can_rotate)
+            else:
+                store.extend_columns([spec.width] * take, [spec.height] * take, spec.can_rotate)
+            next_id += take
+            copy += take
+            if len(store) >= chunk_size:
+                yield chunk
+                index += 1
+                chunk = StreamChunk(index, PartStore())
+    if len(chunk.store):
+        yield chunk
+
+
+def pack_stream(packer, specs: Iterable[PartSpec], sheet_width: float, sheet_height: float,
+                chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[StreamChunk]:
+    """
+    Упаковывает поток порциями через packer.pack_store. Каждая порция начинается с нового листа;
+    first_sheet у порции - сквозной номер ее первого листа. Следующая порция читается
+    только после того, как вызывающий код обработал предыдущую.
+    """
+    first_sheet = 0
+    for chunk in chunked_stores(specs, chunk_size):
+        chunk.sheets = packer.pack_store(chunk.store, sheet_width, sheet_height)
+        chunk.first_sheet = first_sheet
+        first_sheet += chunk.sheets
+        yield chunk
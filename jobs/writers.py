@@ -0,0 +1,123 @@
+import json
+from typing import List, Optional
+from models.shape import Rectangle
+
+# Зазор между листами на общем чертеже (SVG/DXF), мм
+SHEET_GAP = 50
+
+
+def layout_stats(sheets: List[List[Rectangle]], unplaced: List[Rectangle],
+                 sheet_width: float, sheet_height: float) -> dict:
+    sheet_area = sheet_width * sheet_height
+    used = [sum(p.area for p in sheet) for sheet in sheets]
+    return {
+        'sheets': len(sheets),
+        'parts_placed': sum(len(sheet) for sheet in sheets),
+        'parts_unplaced': len(unplaced),
+        'utilization': (sum(used) / (sheet_area * len(sheets)) * 100) if sheets else 0.0,
+        'sheet_utilization': [u / sheet_area * 100 for u in used],
+    }
+
+
+def layout_to_dict(name: str, sheets: List[List[Rectangle]], unplaced: List[Rectangle],
+                   sheet_width: float, sheet_height: float, margin: float,
+                   algorithm: str, elapsed: float, cuts: Optional[list] = None) -> dict:
+    """
+    Раскладка в виде, пригодном для JSON. Координаты - от угла листа, в мм.
+    cuts - последовательности резов по листам (гильотинный раскрой), если алгоритм их дает.
+    """
+    stats = layout_stats(sheets, unplaced, sheet_width, sheet_height)
+    stats['time_sec'] = elapsed
+    layout = {
+        'job': name,
+        'algorithm': algorithm,
+        'sheet': {'width': sheet_width, 'height': sheet_height, 'margin': margin},
+        'stats': stats,
+        'sheets': [
+            {'index': i, 'parts': [{'id': p.id, 'x': p.x, 'y': p.y, 'width': p.width, 'height': p.height}
+                                   for p in sheet]}
+            for i, sheet in enumerate(sheets)
+        ],
+        'unplaced': [p.id for p in unplaced],
+    }
+    if cuts is not None:
+        layout['cuts'] = [
+            [{'x1': c.x1, 'y1': c.y1, 'x2': c.x2, 'y2': c.y2, 'depth': c.depth} for c in sheet_cuts]
+            for sheet_cuts in cuts
+        ]
+    return layout
+
+
+def write_json(path: str, layout: dict):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(layout, f, ensure_ascii=False, indent=2)
+
+
+def _xml_escape(text: str) -> str:
+    # Не xml.sax.saxutils.escape: он тянет urllib/http.client, а это десятки мс старта CLI
+    return text.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;').replace('"', '&quot;')
+
+
+def write_svg(path: str, layout: dict):
+    """Все листы одним SVG, друг под другом. id деталей приходят из заказа - экранируем"""
+    sheet_w = layout['sheet']['width']
+    sheet_h = layout['sheet']['height']
+    count = max(1, len(layout['sheets']))
+    cuts = layout.get('cuts')
+    total_h = count * sheet_h + (count - 1) * SHEET_GAP
+    lines = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{sheet_w}mm" height="{total_h}mm" '
+        f'viewBox="0 0 {sheet_w} {total_h}">',
+    ]
+    for sheet in layout['sheets']:
+        top = sheet['index'] * (sheet_h + SHEET_GAP)
+        lines.append(f'  <g id="sheet-{sheet["index"] + 1}" transform="translate(0 {top})">')
+        lines.append(f'    <rect x="0" y="0" width="{sheet_w}" height="{sheet_h}" '
+                     f'fill="#32363e" stroke="#4682b4" stroke-width="2"/>')
+        for part in sheet['parts']:
+            lines.append(f'    <rect x="{part["x"]}" y="{part["y"]}" width="{part["width"]}" '
+                         f'height="{part["height"]}" fill="#3498db" stroke="#000" stroke-width="1">'
+                         f'<title>{_xml_escape(str(part["id"]))}</title></rect>')
+        for step, cut in enumerate(cuts[sheet['index']] if cuts else [], 1):
+            lines.append(f'    <line x1="{cut["x1"]}" y1="{cut["y1"]}" x2="{cut["x2"]}" y2="{cut["y2"]}" '
+                         f'stroke="#e74c3c" stroke-width="1" stroke-dasharray="6 3"><title>cut {step}</title></line>')
+        lines.append('  </g>')
+    lines.append('</svg>')
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(lines) + '\n')
+
+
+def _dxf_rect(out: List[str], layer: str, x: float, y: float, w: float, h: float):
+    # DXF: ось Y вверх, поэтому переворачиваем
+    corners = [(x, -y), (x + w, -y), (x + w, -(y + h)), (x, -(y + h))]
+    for (x1, y1), (x2, y2) in zip(corners, corners[1:] + corners[:1]):
+        out += ['0', 'LINE', '8', layer, '10', f'{x1}', '20', f'{y1}', '11', f'{x2}', '21', f'{y2}']
+
+
+def write_dxf(path: str, layout: dict):
+    """
+    Минимальный ASCII DXF (R12, только LINE): контуры листов (слой SHEET), деталей (слой PARTS)
+    и, если есть, резы в порядке выполнения (слой CUTS)
+    """
+    sheet_w = layout['sheet']['width']
+    sheet_h = layout['sheet']['height']
+    cuts = layout.get('cuts')
+    out = ['0', 'SECTION', '2', 'ENTITIES']
+    for sheet in layout['sheets']:
+        top = sheet['index'] * (sheet_h + SHEET_GAP)
+        _dxf_rect(out, 'SHEET', 0, top, sheet_w, sheet_h)
+        for part in sheet['parts']:
+            _dxf_rect(out, 'PARTS', part['x'], top + part['y'], part['width'], part['height'])
+        for cut in cuts[sheet['index']] if cuts else []:
+            out += ['0', 'LINE', '8', 'CUTS', '10', f'{cut["x1"]}', '20', f'{-(top + cut["y1"])}',
+                    '11', f'{cut["x2"]}', '21', f'{-(top + cut["y2"])}']
+    out += ['0', 'ENDSEC', '0', 'EOF']
+    with open(path, 'w', encoding='ascii') as f:
+        f.write('\n'.join(out) + '\n')
+
+
+WRITERS = {
+    'json': write_json,
+    'svg': write_svg,
+    'dxf': write_dxf,
+}
@@ -1,14 +1,26 @@
+import argparse
+from cli import _parse_sheet
 from generators.random_parts import generate_random_parts
-from ui.pygame_app import CuttingGame
 
 def main():
+    parser = argparse.ArgumentParser(description="Interactive cutting optimizer")
+    parser.add_argument('--sheet', type=_parse_sheet, default=(800, 600), metavar='WxH',
+                        help="sheet size in mm, e.g. 3000x1500 (the view fits it to the window)")
+    parser.add_argument('--parts', type=int, default=12, help="number of random parts in the menu")
+    parser.add_argument('--service', default=None, metavar='HOST[:PORT]',
+                        help="run AUTO PACK on a nesting service (python -m service.server) instead of locally")
+    args = parser.parse_args()
+
     print("Starting Cutting Optimizer...")
 
-    # Генерируем 10 случайных деталей
-    parts = generate_random_parts(count=12)
-    
-    game = CuttingGame(parts)
+    # pygame импортируем только здесь: headless-раскрой (cli.py) его не загружает
+    from ui.pygame_app import CuttingGame
+
+    # Генерируем случайные детали
+    parts = generate_random_parts(count=args.parts)
+
+    game = CuttingGame(parts, sheet_size=args.sheet, service=args.service)
     game.run()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,130 @@
+import importlib.util
+import os
+from typing import List, Optional, Sequence
+from instrumentation import METRICS
+
+# Переменная окружения для выбора бэкенда без правки кода: python | numpy | auto
+BACKEND_ENV = 'CUTTING_COLLISION_BACKEND'
+
+# NumPy импортируется лениво (при первом пакетном вызове): headless-запуск без него не платит за импорт.
+# Без NumPy работает чистый Python.
+HAS_NUMPY = importlib.util.find_spec('numpy') is not None
+
+# Ограничение размера матрицы "кандидаты x размещенные" за один вызов (элементов)
+_CHUNK_ELEMENTS = 1 << 22
+
+
+class PythonCollisionBackend:
+    """
+    Эталонная реализация пакетных проверок на чистом Python.
+    Семантика пересечения та же, что у Rectangle.intersects (касание - не пересечение).
+    """
+    name = 'python'
+
+    def feasible_mask(self, cand_x: Sequence[float], cand_y: Sequence[float], w: float, h: float,
+                      placed_x, placed_y, placed_w, placed_h,
+                      sheet_width: float, sheet_height: float) -> List[bool]:
+        """Для каждой позиции (cand_x[i], cand_y[i]) детали w x h: внутри листа и ни с кем не пересекается"""
+        placed = list(zip(placed_x, placed_y, placed_w, placed_h))
+        if METRICS.enabled:
+            METRICS.count('collision.checks', len(cand_x) * len(placed))
+        mask = []
+        for x, y in zip(cand_x, cand_y):
+            ok = x >= 0 and y >= 0 and x + w <= sheet_width and y + h <= sheet_height
+            if ok:
+                right, bottom = x + w, y + h
+                for px, py, pw, ph in placed:
+                    if not (right <= px or x >= px + pw or bottom <= py or y >= py + ph):
+                        ok = False
+                        break
+            mask.append(ok)
+        return mask
+
+    def overlap_counts(self, xs, ys, ws, hs, placed_x, placed_y, placed_w, placed_h) -> List[int]:
+        """Для каждого прямоугольника - сколько размещенных он пересекает"""
+        placed = list(zip(placed_x, placed_y, placed_w, placed_h))
+        if METRICS.enabled:
+            METRICS.count('collision.checks', len(xs) * len(placed))
+        counts = []
+        for x, y, w, h in zip(xs, ys, ws, hs):
+            right, bottom = x + w, y + h
+            counts.append(sum(1 for px, py, pw, ph in placed
+                              if not (right <= px or x >= px + pw or bottom <= py or y >= py + ph)))
+        return counts
+
+
+class NumpyCollisionBackend:
+    """
+    Векторизованные проверки: все пары "кандидат x размещенная деталь"
+    считаются одной операцией NumPy (порциями, чтобы ограничить память).
+    """
+    name = 'numpy'
+
+    def feasible_mask(self, cand_x, cand_y, w, h, placed_x, placed_y, placed_w, placed_h,
+                      sheet_width, sheet_height):
+        import numpy as np
+        cx = np.asarray(cand_x, dtype=np.float64)
+        cy = np.asarray(cand_y, dtype=np.float64)
+        mask = (cx >= 0) & (cy >= 0) & (cx + w <= sheet_width) & (cy + h <= sheet_height)
+        px = np.asarray(placed_x, dtype=np.float64)
+        if METRICS.enabled:
+            METRICS.count('collision.checks', cx.size * px.size)
+        if px.size == 0:
+            return mask
+        py = np.asarray(placed_y, dtype=np.float64)
+        pr = px + np.asarray(placed_w, dtype=np.float64)
+        pb = py + np.asarray(placed_h, dtype=np.float64)
+
+        chunk = max(1, _CHUNK_ELEMENTS // px.size)
+        for start in range(0, cx.size, chunk):
+            x = cx[start:start + chunk, None]
+            y = cy[start:start + chunk, None]
+            separated = (x + w <= px) | (x >= pr) | (y + h <= py) | (y >= pb)
+            mask[start:start + chunk] &= separated.all(axis=1)
+        return mask
+
+    def overlap_counts(self, xs, ys, ws, hs, placed_x, placed_y, placed_w, placed_h):
+        import numpy as np
+        x = np.asarray(xs, dtype=np.float64)
+        y = np.asarray(ys, dtype=np.float64)
+        r = x + np.asarray(ws, dtype=np.float64)
+        b = y + np.asarray(hs, dtype=np.float64)
+        px = np.asarray(placed_x, dtype=np.float64)
+        counts = np.zeros(x.size, dtype=np.int64)
+        if METRICS.enabled:
+            METRICS.count('collision.checks', x.size * px.size)
+        if px.size == 0:
+            return counts
+        py = np.asarray(placed_y, dtype=np.float64)
+        pr = px + np.asarray(placed_w, dtype=np.float64)
+        pb = py + np.asarray(placed_h, dtype=np.float64)
+
+        chunk = max(1, _CHUNK_ELEMENTS // px.size)
+        for start in range(0, x.size, chunk):
+            end = start + chunk
+            overlap = ((r[start:end, None] > px) & (x[start:end, None] < pr) &
+                       (b[start:end, None] > py) & (y[start:end, None] < pb))
+            counts[start:end] = overlap.sum(axis=1)
+        return counts
+
+
+def available_backends() -> List[str]:
+    return ['python', 'numpy'] if HAS_NUMPY else ['python']
+
+
+def get_backend(name: Optional[str] = None):
+    """
+    Возвращает бэкенд по имени: 'python', 'numpy' или 'auto' (NumPy, если установлен).
+    None - берется из переменной окружения CUTTING_COLLISION_BACKEND, по умолчанию 'auto'.
+    """
+    if name is None:
+        name = os.environ.get(BACKEND_ENV, 'auto')
+    if name == 'auto':
+        name = 'numpy' if HAS_NUMPY else 'python'
+    if name == 'python':
+        return PythonCollisionBackend()
+    if name == 'numpy':
+        if not HAS_NUMPY:
+            raise RuntimeError("NumPy collision backend requested, but NumPy is not installed")
+        return NumpyCollisionBackend()
+    raise ValueError(f"Unknown collision backend: {name!r}")
@@ -0,0 +1,40 @@
+from dataclasses import dataclass, field
+from typing import Dict, List, Tuple
+from models.shape import ShapeGeometry
+
+
+@dataclass(slots=True)
+class ItemClass:
+    """
+    Класс одинаковых деталей заказа: размер, можно ли поворачивать и сколько штук.
+    parts - сами детали (Rectangle или PartView), по ним раскладываются позиции.
+    Для поворачиваемых деталей размер приведен к "лежачей" ориентации (width >= height).
+    """
+    width: float
+    height: float
+    can_rotate: bool
+    count: int = 0
+    parts: List[ShapeGeometry] = field(default_factory=list)
+
+    @property
+    def area(self) -> float:
+        return self.width * self.height * self.count
+
+
+def group_items(shapes: List[ShapeGeometry], allow_rotation: bool = True) -> List[ItemClass]:
+    """
+    Группирует детали в классы (width, height, can_rotate, count) в порядке первого появления.
+    При allow_rotation=False ориентация детали - часть класса: 300x200 и 200x300 - разные классы.
+    """
+    classes: Dict[Tuple[float, float, bool], ItemClass] = {}
+    for shape in shapes:
+        width, height, can_rotate = shape.width, shape.height, bool(shape.can_rotate)
+        if allow_rotation and can_rotate and width < height:
+            width, height = height, width
+        key = (width, height, can_rotate)
+        item = classes.get(key)
+        if item is None:
+            item = classes[key] = ItemClass(width, height, can_rotate)
+        item.count += 1
+        item.parts.append(shape)
+    return list(classes.values())
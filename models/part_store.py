@@ -0,0 +1,171 @@
+from array import array
+from typing import Iterable, Iterator, List, Optional, Tuple
+from models.shape import PART_COLORS, Rectangle, ShapeGeometry
+
+# Биты колонки flags
+FLAG_CAN_ROTATE = 1
+FLAG_PLACED = 2
+FLAG_ROTATED = 4
+
+
+class PartStore:
+    """
+    Колоночное (struct-of-arrays) хранилище деталей для больших заказов.
+    Каждая деталь - строка в параллельных колонках x, y, w, h, ids, flags, sheet,
+    без отдельного объекта, __dict__, uuid и цвета на каждую деталь.
+
+    Для UI и алгоритмов, работающих с Rectangle, есть легкие представления PartView:
+    они читают и пишут прямо в колонки.
+    """
+
+    def __init__(self):
+        self.x = array('d')
+        self.y = array('d')
+        self.w = array('d')
+        self.h = array('d')
+        self.ids = array('q')
+        self.flags = array('B')
+        self.sheet = array('i') # номер листа после упаковки, -1 - не размещена
+        self._next_id = 0
+
+    def __len__(self):
+        return len(self.w)
+
+    def append(self, width: float, height: float, can_rotate: bool = True, part_id: Optional[int] = None) -> int:
+        """Добавляет деталь и возвращает ее индекс"""
+        if part_id is None:
+            part_id = self._next_id
+        self._next_id = max(self._next_id, part_id + 1)
+        self.x.append(0)
+        self.y.append(0)
+        self.w.append(width)
+        self.h.append(height)
+        self.ids.append(part_id)
+        self.flags.append(FLAG_CAN_ROTATE if can_rotate else 0)
+        self.sheet.append(-1)
+        return len(self.w) - 1
+
+    def extend(self, dims: Iterable[Tuple]):
+        """Добавляет детали из итератора кортежей (width, height) или (width, height, can_rotate)"""
+        for item in dims:
+            self.append(*item[:3])
+
+    def extend_columns(self, widths: Iterable[float], heights: Iterable[float], can_rotate: bool = True):
+        """Пакетное добавление: колонки расширяются целиком, без цикла по деталям в Python"""
+        widths, heights = array('d', widths), array('d', heights)
+        if len(widths) != len(heights):
+            raise ValueError("widths and heights must have the same length")
+        count = len(widths)
+        self.w.extend(widths)
+        self.h.extend(heights)
+        self.x.extend(array('d', bytes(8 * count)))
+        self.y.extend(array('d', bytes(8 * count)))
+        self.ids.extend(range(self._next_id, self._next_id + count))
+        self.flags.extend(bytes([FLAG_CAN_ROTATE if can_rotate else 0]) * count)
+        self.sheet.extend(array('i', [-1]) * count)
+        self._next_id += count
+
+    @classmethod
+    def from_rectangles(cls, shapes: Iterable[Rectangle]) -> 'PartStore':
+        store = cls()
+        for shape in shapes:
+            index = store.append(shape.width, shape.height, shape.can_rotate)
+            store.x[index] = shape.x
+            store.y[index] = shape.y
+        return store
+
+    def view(self, index: int) -> 'PartView':
+        return PartView(self, index)
+
+    def views(self, indices: Optional[Iterable[int]] = None) -> List['PartView']:
+        if indices is None:
+            indices = range(len(self))
+        return [PartView(self, i) for i in indices]
+
+    def __iter__(self) -> Iterator['PartView']:
+        for i in range(len(self)):
+            yield PartView(self, i)
+
+    def to_rectangles(self) -> List[Rectangle]:
+        """Полноценные Rectangle (например, для редактора). Для миллионов деталей лучше views()."""
+        return [Rectangle(width=self.w[i], height=self.h[i], x=self.x[i], y=self.y[i],
+                          id=format(self.ids[i], '06x'), can_rotate=bool(self.flags[i] & FLAG_CAN_ROTATE))
+                for i in range(len(self))]
+
+    def placed_indices(self, sheet_no: Optional[int] = None) -> List[int]:
+        if sheet_no is None:
+            return [i for i, flags in enumerate(self.flags) if flags & FLAG_PLACED]
+        return [i for i, sheet in enumerate(self.sheet) if sheet == sheet_no]
+
+    def total_area(self) -> float:
+        return sum(w * h for w, h in zip(self.w, self.h))
+
+    def as_numpy(self) -> dict:
+        """
+        Колонки как массивы NumPy без копирования (np.frombuffer).
+        Массивы становятся недействительными после append/extend.
+        NumPy необязателен: сами колонки - обычные array.array.
+        """
+        import numpy as np
+        return {name: np.frombuffer(getattr(self, name), dtype=dtype) if len(self) else np.empty(0, dtype)
+                for name, dtype in (('x', np.float64), ('y', np.float64), ('w', np.float64), ('h', np.float64),
+                                    ('ids', np.int64), ('flags', np.uint8), ('sheet', np.int32))}
+
+    def memory_bytes(self) -> int:
+        columns = (self.x, self.y, self.w, self.h, self.ids, self.flags, self.sheet)
+        return sum(column.itemsize * len(column) for column in columns)
+
+
+class PartView(ShapeGeometry):
+    """
+    Легкое представление одной строки PartStore с интерфейсом Rectangle
+    (x, y, width, height, id, color, can_rotate, rotate, intersects...).
+    Все изменения сразу записываются в колонки хранилища.
+    """
+    __slots__ = ('store', 'index')
+
+    def __init__(self, store: PartStore, index: int):
+        self.store = store
+        self.index = index
+
+    def __repr__(self):
+        return (f"PartView(index={self.index}, width={self.width}, height={self.height}, "
+                f"x={self.x}, y={self.y})")
+
+    @property
+    def x(self): return self.store.x[self.index]
+    @x.setter
+    def x(self, value): self.store.x[self.index] = value
+
+    @property
+    def y(self): return self.store.y[self.index]
+    @y.setter
+    def y(self, value): self.store.y[self.index] = value
+
+    @property
+    def width(self): return self.store.w[self.index]
+    @width.setter
+    def width(self, value): self.store.w[self.index] = value
+
+    @property
+    def height(self): return self.store.h[self.index]
+    @height.setter
+    def height(self, value): self.store.h[self.index] = value
+
+    @property
+    def id(self):
+        return format(self.store.ids[self.index], '06x')
+
+    @property
+    def color(self):
+        # Цвет не хранится: выводится из id, поэтому у детали он стабилен
+        return PART_COLORS[self.store.ids[self.index] % len(PART_COLORS)]
+
+    @property
+    def can_rotate(self):
+        return bool(self.store.flags[self.index] & FLAG_CAN_ROTATE)
+
+    def rotate(self):
+        store, i = self.store, self.index
+        store.w[i], store.h[i] = store.h[i], store.w[i]
+        store.flags[i] ^= FLAG_ROTATED
@@ -1,36 +1,30 @@
 from dataclasses import dataclass
+import os
 import random
-import uuid
 
-@dataclass
+# Flat UI colors)
+PART_COLORS = (
+    (231, 76, 60),   # Alizarin (Red)
+    (230, 126, 34),  # Carrot (Orange)
+    (241, 196, 15),  # Sun Flower (Yellow)
+    (26, 188, 156),  # Turquoise (Teal)
+    (52, 152, 219),  # Peter River (Blue)
+    (155, 89, 182),  # Amethyst (Purple)
+)
+
+@dataclass(slots=True)
 class Point:
     x: float
     y: float
 
-@dataclass
-class Rectangle:
-    width: float
-    height: float
-    x: float = 0
-    y: float = 0
-    color: tuple = (100, 149, 237) # дефолтный синий
-    id: str = None
 
-    def __post_init__(self):
-        if self.id is None:
-            self.id = str(uuid.uuid4())[:6]
-        
-        # Flat UI colors)
-        colors = [
-            (231, 76, 60),   # Alizarin (Red)
-            (230, 126, 34),  # Carrot (Orange)
-            (241, 196, 15),  # Sun Flower (Yellow)
-            (26, 188, 156),  # Turquoise (Teal)
-            (52, 152, 219),  # Peter River (Blue)
-            (155, 89, 182),  # Amethyst (Purple)
-        ]
-        self.color = random.choice(colors)
-        
+class ShapeGeometry:
+    """
+    Геометрия прямоугольной детали поверх полей x, y, width, height.
+    Общая для Rectangle и PartView (models/part_store.py).
+    """
+    __slots__ = ()
+
     @property
     def area(self):
         return self.width * self.height
@@ -47,7 +41,7 @@ class Rectangle:
     def rotate(self):
         self.width, self.height = self.height, self.width
 
-    def intersects(self, other: 'Rectangle') -> bool:
+    def intersects(self, other: 'ShapeGeometry') -> bool:
         """Проверка столкновения AABB (Axis-Aligned Bounding Box)"""
         return not (self.right <= other.x or 
                    self.x >= other.right or 
@@ -58,4 +52,23 @@ class Rectangle:
         """Проверка, что деталь полностью внутри листа"""
         return (self.x >= 0 and self.y >= 0 and 
                 self.right <= sheet_width and 
-                self.bottom <= sheet_height)
\ No newline at end of file
+                self.bottom <= sheet_height)
+
+
+# slots=True: без __dict__ у каждого экземпляра - заметно меньше памяти на больших заказах
+@dataclass(slots=True)
+class Rectangle(ShapeGeometry):
+    width: float
+    height: float
+    x: float = 0
+    y: float = 0
+    color: tuple = (100, 149, 237) # дефолтный синий
+    id: str = None
+    can_rotate: bool = True # False - направление волокна/проката, поворачивать нельзя
+
+    def __post_init__(self):
+        if self.id is None:
+            # Те же 6 hex-символов, что давал uuid4, но без построения UUID
+            self.id = os.urandom(3).hex()
+        
+        self.color = random.choice(PART_COLORS)
@@ -0,0 +1,128 @@
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from models.shape import Rectangle
+
+# Ячейка сетки: (столбец, строка)
+Cell = Tuple[int, int]
+
+
+class SpatialGrid:
+    """
+    Равномерная сетка над габаритами Rectangle.
+    Каждая деталь регистрируется во всех ячейках, которые она накрывает,
+    поэтому запрос стоит O(деталей рядом), а не O(всех деталей).
+
+    Rectangle - dataclass с eq=True (не хешируется), поэтому ключом служит id(shape).
+    """
+
+    def __init__(self, cell_size: float = 50):
+        if cell_size <= 0:
+            raise ValueError("cell_size must be positive")
+        self.cell_size = cell_size
+        self._cells: Dict[Cell, Dict[int, Rectangle]] = {}
+        # id(shape) -> (col0, row0, col1, row1), под которыми деталь сейчас записана
+        self._spans: Dict[int, Tuple[int, int, int, int]] = {}
+
+    def __len__(self):
+        return len(self._spans)
+
+    def __contains__(self, shape: Rectangle) -> bool:
+        return id(shape) in self._spans
+
+    def _span(self, x, y, width, height) -> Tuple[int, int, int, int]:
+        size = self.cell_size
+        return (int(x // size), int(y // size),
+                int((x + width) // size), int((y + height) // size))
+
+    def _cells_of(self, span) -> Iterable[Cell]:
+        col0, row0, col1, row1 = span
+        for col in range(col0, col1 + 1):
+            for row in range(row0, row1 + 1):
+                yield (col, row)
+
+    def insert(self, shape: Rectangle):
+        key = id(shape)
+        if key in self._spans:
+            self.move(shape)
+            return
+        span = self._span(shape.x, shape.y, shape.width, shape.height)
+        self._spans[key] = span
+        for cell in self._cells_of(span):
+            self._cells.setdefault(cell, {})[key] = shape
+
+    def remove(self, shape: Rectangle):
+        key = id(shape)
+        span = self._spans.pop(key, None)
+        if span is None:
+            return
+        for cell in self._cells_of(span):
+            bucket = self._cells.get(cell)
+            if bucket is not None:
+                bucket.pop(key, None)
+                if not bucket:
+                    del self._cells[cell]
+
+    def move(self, shape: Rectangle):
+        """Обновляет ячейки после изменения x/y/width/height детали"""
+        key = id(shape)
+        new_span = self._span(shape.x, shape.y, shape.width, shape.height)
+        if self._spans.get(key) == new_span:
+            return
+        self.remove(shape)
+        self._spans[key] = new_span
+        for cell in self._cells_of(new_span):
+            self._cells.setdefault(cell, {})[key] = shape
+
+    def clear(self):
+        self._cells.clear()
+        self._spans.clear()
+
+    def rebuild(self, shapes: Iterable[Rectangle]):
+        self.clear()
+        for shape in shapes:
+            self.insert(shape)
+
+    def _candidates(self, x, y, width, height) -> Dict[int, Rectangle]:
+        found = {}
+        for cell in self._cells_of(self._span(x, y, width, height)):
+            bucket = self._cells.get(cell)
+            if bucket:
+                found.update(bucket)
+        return found
+
+    def query(self, x: float, y: float, width: float, height: float) -> List[Rectangle]:
+        """Все детали, пересекающиеся (строго, как Rectangle.intersects) с областью"""
+        right, bottom = x + width, y + height
+        return [s for s in self._candidates(x, y, width, height).values()
+                if not (s.x + s.width <= x or s.x >= right or
+                        s.y + s.height <= y or s.y >= bottom)]
+
+    def query_point(self, px: float, py: float) -> List[Rectangle]:
+        """Детали под точкой (границы включительно - как при клике мышью)"""
+        return [s for s in self._candidates(px, py, 0, 0).values()
+                if s.x <= px <= s.x + s.width and s.y <= py <= s.y + s.height]
+
+    def any_intersects(self, shape: Rectangle, exclude: Optional[Rectangle] = None) -> bool:
+        """Есть ли в индексе деталь, пересекающая shape (сама shape и exclude не считаются)"""
+        for other in self._candidates(shape.x, shape.y, shape.width, shape.height).values():
+            if other is shape or other is exclude:
+                continue
+            if shape.intersects(other):
+                return True
+        return False
+
+    def overlapping(self) -> Set[int]:
+        """
+        id всех деталей, пересекающих хотя бы одну другую. Один проход по ячейкам
+        (пары только внутри ячейки) вместо any_intersects для каждой детали.
+        """
+        found = set()
+        for bucket in self._cells.values():
+            if len(bucket) < 2:
+                continue
+            rects = [(s.x, s.y, s.x + s.width, s.y + s.height, key) for key, s in bucket.items()]
+            for i, (x, y, right, bottom, key) in enumerate(rects):
+                for ox, oy, oright, obottom, other in rects[i + 1:]:
+                    if not (right <= ox or x >= oright or bottom <= oy or y >= obottom):
+                        found.add(key)
+                        found.add(other)
+        return found
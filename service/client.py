@@ -0,0 +1,129 @@
+"""
+Синхронный клиент сервиса раскроя (service/server.py) - для UI, cli и скриптов.
+Блокирующий сокет: удобно звать из фонового потока (ui/pack_worker.py).
+
+    client = NestingClient('nesting-host:8765')
+    job = job_from_parts(parts, 2992, 1492, algorithm='maxrects', params={'heuristic': 'bssf'})
+    result = client.pack(job, priority=5, on_progress=lambda done, total, placed: ...)
+"""
+import itertools
+import json
+import socket
+from typing import Callable, List, Optional, Tuple
+
+from algorithms.base import PackingCancelled
+
+DEFAULT_PORT = 8765
+# Как часто (с) проверять cancel_event, пока ждем события сервера
+POLL_INTERVAL = 0.1
+
+
+class ServiceError(Exception):
+    """Сервис отклонил задание или упаковка на нем упала"""
+
+
+def parse_address(address: str) -> Tuple[str, int]:
+    """'host:port' / 'host' -> (host, port)"""
+    host, _, port = address.rpartition(':')
+    if not host:
+        return port or '127.0.0.1', DEFAULT_PORT
+    try:
+        return host, int(port)
+    except ValueError:
+        raise ValueError(f"expected HOST[:PORT], got {address!r}") from None
+
+
+def job_from_parts(parts, sheet_width: float, sheet_height: float, algorithm: str = 'maxrects',
+                   params: Optional[dict] = None, margin: float = 0, blocks: bool = False) -> dict:
+    """
+    Задание для сервиса из деталей (Rectangle / PartView). Подряд идущие одинаковые детали
+    сворачиваются в одну строку с quantity - индексы результата при этом те же, что в parts.
+    """
+    rows: List[dict] = []
+    for part in parts:
+        width, height, can_rotate = float(part.width), float(part.height), bool(part.can_rotate)
+        last = rows[-1] if rows else None
+        if last is not None and (last['width'], last['height'], last['can_rotate']) == (width, height, can_rotate):
+            last['quantity'] += 1
+        else:
+            rows.append({'width': width, 'height': height, 'quantity': 1, 'can_rotate': can_rotate})
+    return {
+        'algorithm': algorithm,
+        'params': params or {},
+        'sheet': {'width': float(sheet_width), 'height': float(sheet_height)},
+        'margin': margin,
+        'blocks': blocks,
+        'parts': rows,
+    }
+
+
+class NestingClient:
+    def __init__(self, address: str, timeout: float = 10.0):
+        self.host, self.port = parse_address(address)
+        self.timeout = timeout # на подключение; ответ на задание ждем сколько нужно
+        self._ids = itertools.count(1)
+
+    def _connect(self) -> socket.socket:
+        return socket.create_connection((self.host, self.port), timeout=self.timeout)
+
+    @staticmethod
+    def _send(sock: socket.socket, request: dict):
+        sock.sendall(json.dumps(request).encode('utf-8') + b'\n')
+
+    def _events(self, sock: socket.socket, cancel_event=None, request_id: str = ''):
+        """События сервера по одному; при установленном cancel_event один раз шлет cancel"""
+        # Запрос уже отправлен: дальше короткий таймаут, чтобы между событиями проверять отмену
+        sock.settimeout(POLL_INTERVAL)
+        buffer = b''
+        cancel_sent = False
+        while True:
+            newline = buffer.find(b'\n')
+            if newline >= 0:
+                line, buffer = buffer[:newline], buffer[newline + 1:]
+                if line.strip():
+                    yield json.loads(line)
+                continue
+            if cancel_event is not None and cancel_event.is_set() and not cancel_sent:
+                self._send(sock, {'op': 'cancel', 'id': request_id})
+                cancel_sent = True
+            try:
+                chunk = sock.recv(1 << 16)
+            except socket.timeout:
+                continue
+            if not chunk:
+                raise ConnectionError("nesting service closed the connection")
+            buffer += chunk
+
+    def pack(self, job: dict, priority: int = 0,
+             on_progress: Optional[Callable[[int, int, Optional[list]], None]] = None,
+             on_event: Optional[Callable[[dict], None]] = None, cancel_event=None) -> dict:
+        """
+        Отправляет задание и ждет результат: {'sheets': [[[index, x, y, w, h], ...], ...], 'unplaced', 'stats'}.
+        on_progress(done, total, placed) - прогресс с сервера; placed = [index, sheet, x, y, w, h] или None.
+        on_event - все события как есть (queued с позицией в очереди, started, ...).
+        cancel_event (threading.Event) отменяет запрос: бросается PackingCancelled, как у локального алгоритма.
+        """
+        request_id = f"r{next(self._ids)}"
+        with self._connect() as sock:
+            self._send(sock, {'op': 'pack', 'id': request_id, 'priority': priority, 'job': job})
+            for event in self._events(sock, cancel_event, request_id):
+                if on_event is not None:
+                    on_event(event)
+                kind = event.get('event')
+                if kind == 'progress' and on_progress is not None:
+                    on_progress(event['done'], event['total'], event.get('placed'))
+                elif kind == 'done':
+                    return event['result']
+                elif kind == 'cancelled':
+                    raise PackingCancelled()
+                elif kind == 'error':
+                    raise ServiceError(event.get('message', 'unknown error'))
+
+    def status(self) -> dict:
+        with self._connect() as sock:
+            self._send(sock, {'op': 'status', 'id': 'status'})
+            for event in self._events(sock):
+                if event.get('event') == 'status':
+                    return event
+                if event.get('event') == 'error':
+                    raise ServiceError(event.get('message', 'unknown error'))
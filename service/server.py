@@ -0,0 +1,526 @@
+"""
+Сетевой сервис раскроя: один мощный хост пакует задания для всех рабочих мест.
+
+Протокол - JSON lines поверх TCP (asyncio): клиент пишет по запросу в строке,
+сервер отвечает потоком событий, тоже по строке на событие.
+
+    -> {"op": "pack", "id": "r1", "priority": 5, "job": {...}}
+    <- {"event": "queued", "id": "r1", "job": "3f2a...", "position": 2, "deduplicated": false}
+    <- {"event": "started", "id": "r1", "job": "3f2a..."}
+    <- {"event": "progress", "id": "r1", "done": 120, "total": 500, "placed": [index, sheet, x, y, w, h]}
+    <- {"event": "done", "id": "r1", "result": {"sheets": [[[index, x, y, w, h], ...], ...], ...}}
+    -> {"op": "cancel", "id": "r1"}          -> {"event": "cancelled", "id": "r1"}
+    -> {"op": "status", "id": "s"}           -> {"event": "status", "id": "s", "queued": .., ...}
+
+Задание (job): {"algorithm": "maxrects", "params": {...}, "sheet": {"width": .., "height": ..},
+"margin": 4, "blocks": false, "parts": [{"width": .., "height": .., "quantity": .., "can_rotate": ..}]}.
+index в результате - номер детали после раскрытия quantity, в порядке parts.
+
+Очередь - по приоритету (больше - раньше, при равном - по порядку поступления), упаковка -
+в ProcessPoolExecutor. Одинаковые задания, пока первое в очереди или считается, не дублируются:
+второй клиент подписывается на тот же расчет.
+
+    python -m service.server --host 0.0.0.0 --port 8765 --workers 64
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import math
+import multiprocessing
+import os
+import signal
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+# Предел строки запроса: задание на сотни тысяч деталей - десятки мегабайт JSON
+MAX_LINE = 64 * 1024 * 1024
+# Не чаще стольких событий progress в секунду на задание: из процесса-воркера и в сеть
+PROGRESS_RATE = 20
+# Предел деталей в задании после раскрытия quantity: один запрос не должен занять память воркера целиком
+MAX_PARTS = 500_000
+# Запросы длиннее разбираются в отдельном процессе (read_request): задание на 500 000 деталей -
+# секунды json.loads, проверки и хэша, и все это время цикл asyncio не отдавал бы прогресс другим клиентам
+INLINE_REQUEST = 256 * 1024
+
+
+# --- Процесс-воркер ---
+
+class _SharedCancel:
+    """cancel_event для PackingAlgorithm в процессе-воркере: флаг задания в общем словаре Manager"""
+
+    def __init__(self, cancelled, key: str):
+        self.cancelled = cancelled
+        self.key = key
+        self._checked = 0.0
+        self._set = False
+
+    def is_set(self) -> bool:
+        # Словарь Manager - запрос к другому процессу, поэтому спрашиваем не чаще PROGRESS_RATE раз в секунду
+        now = time.monotonic()
+        if not self._set and now - self._checked >= 1 / PROGRESS_RATE:
+            self._checked = now
+            self._set = self.key in self.cancelled
+        return self._set
+
+
+def expand_parts(job: dict) -> List:
+    """parts задания -> Rectangle, quantity раскрывается по порядку (индексы результата)"""
+    from models.shape import Rectangle
+    from jobs.reader import _to_bool
+    parts = []
+    for row in job['parts']:
+        can_rotate = _to_bool(row.get('can_rotate', True))
+        for _ in range(int(row.get('quantity') or 1)):
+            # id задан явно: без os.urandom и лишней работы на каждую деталь
+            parts.append(Rectangle(width=float(row['width']), height=float(row['height']),
+                                   id=str(len(parts)), can_rotate=can_rotate))
+    return parts
+
+
+def run_pack_job(request: bytes, key: str, progress, cancelled) -> dict:
+    """
+    Упаковывает одно задание. Функция уровня модуля - исполняется в ProcessPoolExecutor.
+    request - исходная строка запроса pack (задание разбирается здесь, а не в цикле asyncio),
+    progress - очередь Manager для (key, done, total, placed), cancelled - словарь отмененных ключей.
+    """
+    from algorithms import create_algorithm
+    from algorithms.base import PackingCancelled
+    from jobs.writers import layout_stats
+
+    job = json.loads(request)['job']
+    parts = expand_parts(job)
+    index_of = {id(part): i for i, part in enumerate(parts)}
+    sheet_w, sheet_h = float(job['sheet']['width']), float(job['sheet']['height'])
+    margin = float(job.get('margin') or 0)
+
+    packer = create_algorithm(job.get('algorithm', 'maxrects'), **job.get('params', {}))
+    if job.get('blocks'):
+        from algorithms.blocks import BlockPacker
+        packer = BlockPacker(packer)
+    last_sent = 0.0
+
+    def on_progress(done, total, placed, sheet_no):
+        nonlocal last_sent
+        now = time.monotonic()
+        if now - last_sent < 1 / PROGRESS_RATE and done < total:
+            return
+        last_sent = now
+        preview = None
+        if placed is not None and id(placed) in index_of:
+            preview = (index_of[id(placed)], sheet_no, placed.x + margin, placed.y + margin,
+                       placed.width, placed.height)
+        progress.put((key, done, total, preview))
+
+    packer.progress_callback = on_progress
+    packer.cancel_event = _SharedCancel(cancelled, key)
+    started = time.perf_counter()
+    try:
+        # Как в cli.py и UI: пакуем на листе, уменьшенном на отступ, потом сдвигаем детали внутрь
+        sheets = packer.pack_sheets(parts, sheet_w - margin * 2, sheet_h - margin * 2)
+    except PackingCancelled:
+        return {'cancelled': True}
+    elapsed = time.perf_counter() - started
+
+    placed_ids = {id(p) for sheet in sheets for p in sheet}
+    stats = layout_stats(sheets, [p for p in parts if id(p) not in placed_ids], sheet_w, sheet_h)
+    stats['time_sec'] = elapsed
+    return {
+        'sheets': [[[index_of[id(p)], p.x + margin, p.y + margin, p.width, p.height] for p in sheet]
+                   for sheet in sheets],
+        'unplaced': [i for i, p in enumerate(parts) if id(p) not in placed_ids],
+        'stats': stats,
+    }
+
+
+# --- Сервер ---
+
+def job_key(job: dict) -> str:
+    """Ключ дедупликации: задание целиком в каноническом JSON (порядок деталей важен - это индексы)"""
+    return hashlib.sha256(json.dumps(job, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+def validate_job(job, max_parts: int = MAX_PARTS) -> Optional[str]:
+    """Текст ошибки или None: проверяем до очереди, чтобы не тратить на мусор воркер"""
+    from algorithms import create_algorithm
+    if not isinstance(job, dict):
+        return "job must be an object"
+    if not isinstance(job.get('params', {}), dict):
+        return "params must be an object"
+    try:
+        packer = create_algorithm(job.get('algorithm', 'maxrects'), **job.get('params', {}))
+        if job.get('blocks'):
+            from algorithms.blocks import BlockPacker
+            BlockPacker(packer)
+    except (TypeError, ValueError) as error:
+        return str(error)
+    try:
+        sheet_w, sheet_h = float(job['sheet']['width']), float(job['sheet']['height'])
+        margin = float(job.get('margin') or 0)
+        rows = job['parts']
+        sizes = [(float(row['width']), float(row['height']), int(row.get('quantity') or 1)) for row in rows]
+    except (KeyError, TypeError, ValueError, OverflowError):
+        return "job needs sheet {width, height} and parts [{width, height[, quantity][, can_rotate]}]"
+    # not (x > 0) отсекает и NaN
+    if not (0 < sheet_w < math.inf and 0 < sheet_h < math.inf):
+        return "sheet size must be positive"
+    if not (0 <= margin and 2 * margin < min(sheet_w, sheet_h)):
+        return "margin must be non-negative and smaller than half the sheet"
+    if not sizes:
+        return "job has no parts"
+    total = 0
+    for line_no, (width, height, quantity) in enumerate(sizes, 1):
+        if not (0 < width < math.inf and 0 < height < math.inf):
+            return f"part #{line_no}: width and height must be positive"
+        if quantity < 1:
+            return f"part #{line_no}: quantity must be positive"
+        total += quantity
+        if total > max_parts:
+            return f"job has more than {max_parts} parts"
+    return None
+
+
+def read_request(line: bytes, max_parts: int = MAX_PARTS) -> Tuple[Optional[dict], Optional[str], Optional[str]]:
+    """
+    Разбирает строку запроса: (запрос без job, ошибка, ключ задания). Для pack задание проверяется
+    и хэшируется, но в цикл не возвращается - его заново разберет воркер упаковки из той же строки.
+    Функция уровня модуля: длинные запросы разбираются в отдельном процессе.
+    """
+    try:
+        request = json.loads(line)
+    except ValueError:
+        return None, "request is not valid JSON", None
+    if not isinstance(request, dict):
+        return {}, None, None
+    job = request.pop('job', None)
+    if request.get('op') != 'pack':
+        return request, None, None
+    error = validate_job(job, max_parts)
+    return request, error, job_key(job) if error is None else None
+
+
+@dataclass
+class _InFlight:
+    """Задание в очереди или в работе и все, кто ждет его результат"""
+    key: str
+    request: bytes                              # строка запроса pack: задание из нее разбирает воркер
+    priority: int
+    entry: int                                  # номер актуальной записи в очереди приоритетов
+    state: str = 'queued'                       # queued / running
+    subscribers: List[Tuple['_Connection', str]] = field(default_factory=list)
+    progress: Optional[tuple] = None            # последнее (done, total, placed)
+    submitted: float = field(default_factory=time.monotonic)
+
+
+class _Connection:
+    """Соединение клиента: запись событий под замком (ответы на разные запросы идут вперемешку)"""
+
+    def __init__(self, writer: asyncio.StreamWriter):
+        self.writer = writer
+        self.lock = asyncio.Lock()
+        self.requests: Dict[str, str] = {} # id запроса -> ключ задания
+        self.closed = False
+        self.task: Optional[asyncio.Task] = None
+
+    async def send(self, event: dict):
+        await self.send_line(json.dumps(event).encode('utf-8'))
+
+    async def send_line(self, data: bytes):
+        """Уже закодированное событие (без перевода строки)"""
+        if self.closed:
+            return
+        async with self.lock:
+            try:
+                self.writer.write(data + b'\n')
+                await self.writer.drain()
+            except (ConnectionError, RuntimeError):
+                self.closed = True
+
+
+class NestingService:
+    """
+    Очередь заданий с приоритетами и пул процессов-упаковщиков.
+    Один воркер - одно задание: workers корутин-диспетчеров забирают задания из очереди
+    и ждут ProcessPoolExecutor, прогресс из процессов приходит через очередь Manager.
+    """
+
+    def __init__(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, workers: Optional[int] = None,
+                 max_parts: int = MAX_PARTS):
+        from instrumentation import Metrics
+        self.host = host
+        self.port = port
+        self.workers = workers or os.cpu_count() or 1
+        self.max_parts = max_parts
+        self.metrics = Metrics(enabled=True)
+        self._jobs: Dict[str, _InFlight] = {}
+        self._queue: Optional[asyncio.PriorityQueue] = None
+        self._entries = 0
+        self._server = None
+        self._pool = None
+        self._parser = None
+        self._manager = None
+        self._tasks: List[asyncio.Task] = []
+        self._connections = set()
+        self._closing = False
+
+    @property
+    def address(self) -> Tuple[str, int]:
+        """Фактический адрес (при port=0 порт выбирает система)"""
+        return self._server.sockets[0].getsockname()[:2]
+
+    async def start(self):
+        self._queue = asyncio.PriorityQueue()
+        self._manager = multiprocessing.Manager()
+        self._progress = self._manager.Queue()
+        self._cancelled = self._manager.dict()
+        self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        # Отдельный процесс для разбора длинных запросов: в пуле упаковки он ждал бы своей очереди
+        self._parser = ProcessPoolExecutor(max_workers=1)
+        self._server = await asyncio.start_server(self._handle_client, self.host, self.port, limit=MAX_LINE)
+        loop = asyncio.get_running_loop()
+        self._tasks = [loop.create_task(self._dispatch()) for _ in range(self.workers)]
+        self._tasks.append(loop.create_task(self._pump_progress()))
+
+    async def close(self):
+        self._closing = True
+        self._server.close()
+        handlers = [connection.task for connection in self._connections]
+        for connection in list(self._connections):
+            connection.closed = True
+            connection.writer.close()
+        # Обработчики увидят конец потока и выйдут сами - не оставляем их отменять asyncio.run
+        if handlers:
+            await asyncio.wait(handlers, timeout=1)
+        await self._server.wait_closed()
+        for task in self._tasks:
+            task.cancel()
+        # Идущие расчеты отменяем, иначе пул будет ждать их до конца
+        for key in self._jobs:
+            self._cancelled[key] = True
+        self._progress.put(None)
+        self._pool.shutdown(wait=True, cancel_futures=True)
+        self._parser.shutdown(wait=True, cancel_futures=True)
+        self._manager.shutdown()
+
+    # --- Очередь ---
+
+    def _enqueue(self, flight: _InFlight):
+        self._entries += 1
+        flight.entry = self._entries
+        # PriorityQueue достает меньшее: больший приоритет - раньше, при равном - кто раньше пришел
+        self._queue.put_nowait((-flight.priority, flight.entry, flight.key))
+
+    def submit(self, key: str, request: bytes, priority: int, connection: _Connection,
+               request_id: str) -> Tuple[_InFlight, bool]:
+        """
+        Ставит задание в очередь или подписывает на уже идущее такое же. Возвращает (задание, дубликат ли).
+        key - job_key задания, request - строка запроса pack, из которой его разберет воркер.
+        """
+        flight = self._jobs.get(key)
+        deduplicated = flight is not None
+        if flight is None:
+            flight = self._jobs[key] = _InFlight(key, request, priority, 0)
+            self._enqueue(flight)
+            self.metrics.count('service.jobs')
+        else:
+            self.metrics.count('service.deduplicated')
+            if flight.state == 'queued' and priority > flight.priority:
+                # Срочный дубликат поднимает задание; старая запись очереди станет устаревшей
+                flight.priority = priority
+                self._enqueue(flight)
+        flight.subscribers.append((connection, request_id))
+        connection.requests[request_id] = key
+        return flight, deduplicated
+
+    def _position(self, flight: _InFlight) -> int:
+        """Сколько заданий в очереди впереди (0 - следующее или уже считается)"""
+        if flight.state != 'queued':
+            return 0
+        rank = (-flight.priority, flight.entry)
+        return sum(1 for other in self._jobs.values()
+                   if other.state == 'queued' and (-other.priority, other.entry) < rank)
+
+    def unsubscribe(self, connection: _Connection, request_id: str) -> bool:
+        key = connection.requests.pop(request_id, None)
+        flight = self._jobs.get(key) if key else None
+        if flight is None:
+            return False
+        flight.subscribers = [(c, r) for c, r in flight.subscribers if not (c is connection and r == request_id)]
+        if not flight.subscribers and not self._closing:
+            # Задание больше никому не нужно: из очереди убираем, идущий расчет останавливаем
+            if flight.state == 'queued':
+                del self._jobs[key]
+            else:
+                self._cancelled[key] = True
+            self.metrics.count('service.cancelled')
+        return True
+
+    async def _broadcast(self, flight: _InFlight, event: dict):
+        # Событие кодируется один раз (результат done - мегабайты), каждому подписчику дописываются id и job
+        body = json.dumps(event).encode('utf-8')
+        for connection, request_id in list(flight.subscribers):
+            head = json.dumps({'id': request_id, 'job': flight.key[:16]}).encode('utf-8')
+            await connection.send_line(head[:-1] + b', ' + body[1:])
+
+    async def _dispatch(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            _, entry, key = await self._queue.get()
+            flight = self._jobs.get(key)
+            if flight is None or flight.state != 'queued' or flight.entry != entry:
+                continue # отменено или поднято в приоритете (актуальна другая запись)
+            flight.state = 'running'
+            self.metrics.add_time('service.queue_wait', time.monotonic() - flight.submitted)
+            await self._broadcast(flight, {'event': 'started'})
+            try:
+                with self.metrics.timer('service.pack'):
+                    result = await loop.run_in_executor(self._pool, run_pack_job, flight.request, key,
+                                                        self._progress, self._cancelled)
+                event = {'event': 'cancelled'} if result.get('cancelled') else {'event': 'done', 'result': result}
+            except Exception as error:
+                self.metrics.count('service.errors')
+                event = {'event': 'error', 'message': f"{type(error).__name__}: {error}"}
+            self._cancelled.pop(key, None)
+            if event['event'] == 'cancelled' and flight.subscribers:
+                # Пока расчет останавливался, пришел такой же запрос: считаем заново для него
+                flight.state = 'queued'
+                self._enqueue(flight)
+                continue
+            del self._jobs[key]
+            await self._broadcast(flight, event)
+            for connection, request_id in flight.subscribers:
+                connection.requests.pop(request_id, None)
+
+    async def _pump_progress(self):
+        """Переносит прогресс из процессов-воркеров подписчикам (get очереди Manager - блокирующий)"""
+        loop = asyncio.get_running_loop()
+        while True:
+            item = await loop.run_in_executor(None, self._progress.get)
+            if item is None:
+                return
+            key, done, total, placed = item
+            flight = self._jobs.get(key)
+            if flight is None:
+                continue
+            flight.progress = (done, total, placed)
+            await self._broadcast(flight, {'event': 'progress', 'done': done, 'total': total, 'placed': placed})
+
+    def status(self) -> dict:
+        queued = sum(1 for flight in self._jobs.values() if flight.state == 'queued')
+        return {
+            'workers': self.workers,
+            'queued': queued,
+            'running': len(self._jobs) - queued,
+            'jobs': [{'job': flight.key[:16], 'state': flight.state, 'priority': flight.priority,
+                      'subscribers': len(flight.subscribers), 'progress': flight.progress[:2] if flight.progress else None}
+                     for flight in self._jobs.values()],
+            'metrics': self.metrics.snapshot(),
+        }
+
+    # --- Клиенты ---
+
+    async def _handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        connection = _Connection(writer)
+        connection.task = asyncio.current_task()
+        self._connections.add(connection)
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except (ConnectionError, asyncio.LimitOverrunError, ValueError):
+                    break
+                if not line:
+                    break
+                if line.strip():
+                    try:
+                        await self._handle_request(connection, line)
+                    except Exception as error:
+                        # Ошибка разбора одного запроса не должна рвать соединение и его остальные задания
+                        await connection.send({'event': 'error', 'message': f"bad request: {error}"})
+        finally:
+            connection.closed = True
+            self._connections.discard(connection)
+            # Клиент ушел: его подписки больше не нужны (задания без подписчиков отменяются)
+            for request_id in list(connection.requests):
+                self.unsubscribe(connection, request_id)
+            writer.close()
+
+    async def _handle_request(self, connection: _Connection, line: bytes):
+        if len(line) > INLINE_REQUEST:
+            loop = asyncio.get_running_loop()
+            with self.metrics.timer('service.parse'):
+                request, error, key = await loop.run_in_executor(self._parser, read_request, line, self.max_parts)
+        else:
+            request, error, key = read_request(line, self.max_parts)
+        if request is None:
+            await connection.send({'event': 'error', 'message': error})
+            return
+        op = request.get('op')
+        request_id = str(request.get('id', ''))
+
+        if op == 'pack':
+            priority = request.get('priority', 0)
+            if error is None and (isinstance(priority, bool) or not isinstance(priority, int)):
+                error = "priority must be an integer"
+            if error is None and request_id in connection.requests:
+                error = f"request id {request_id!r} is already in use on this connection"
+            if error is not None:
+                await connection.send({'event': 'error', 'id': request_id, 'message': error})
+                return
+            flight, deduplicated = self.submit(key, line, priority, connection, request_id)
+            await connection.send({'event': 'queued', 'id': request_id, 'job': flight.key[:16],
+                                   'position': self._position(flight), 'deduplicated': deduplicated})
+            if flight.state == 'running':
+                await connection.send({'event': 'started', 'id': request_id, 'job': flight.key[:16]})
+        elif op == 'cancel':
+            found = self.unsubscribe(connection, request_id)
+            await connection.send({'event': 'cancelled' if found else 'error', 'id': request_id,
+                                   **({} if found else {'message': "no such request"})})
+        elif op == 'status':
+            await connection.send({'event': 'status', 'id': request_id, **self.status()})
+        else:
+            await connection.send({'event': 'error', 'id': request_id, 'message': f"unknown op {op!r}"})
+
+
+async def serve(host: str, port: int, workers: Optional[int], max_parts: int = MAX_PARTS):
+    service = NestingService(host, port, workers, max_parts)
+    await service.start()
+    host, port = service.address
+    print(f"Nesting service on {host}:{port}, {service.workers} worker process(es)")
+    # Ctrl+C / SIGTERM (systemd, docker stop): закрываем соединения и отменяем идущие расчеты
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except (NotImplementedError, RuntimeError):
+            pass # Windows: остается KeyboardInterrupt
+    try:
+        await stop.wait()
+    finally:
+        await service.close()
+    print("Nesting service stopped")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Nesting service: queued pack jobs over JSON lines / TCP")
+    parser.add_argument('--host', default=DEFAULT_HOST, help="interface to listen on (0.0.0.0: all)")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--workers', '-j', type=int, default=None, help="pack processes (default: all cores)")
+    parser.add_argument('--max-parts', type=int, default=MAX_PARTS,
+                        help=f"reject jobs with more parts after expanding quantity (default: {MAX_PARTS})")
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(serve(args.host, args.port, args.workers, args.max_parts))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,111 @@
+import queue
+import threading
+from typing import Callable, List, Optional
+from instrumentation import PROFILER
+from models.shape import Rectangle
+from algorithms.base import PackingAlgorithm, PackingCancelled
+
+
+class PackWorker(threading.Thread):
+    """
+    Фоновая упаковка для UI. Алгоритм работает с копиями деталей, поэтому
+    игровой цикл может спокойно рисовать оригиналы, пока идет расчет.
+
+    События для UI складываются в self.events:
+        ('progress', done, total, (sheet_no, x, y, w, h, color) или None)
+        ('done', [[(индекс детали в parts, x, y, w, h), ...] для каждого листа], prepared)
+        ('cancelled',)
+        ('error', exception)
+
+    prepare(layouts) - дополнительная подготовка результата в этом же потоке (например, свободное
+    место листов для дорезки), ее результат приходит в prepared; без prepare - None.
+    """
+
+    def __init__(self, packer: PackingAlgorithm, parts: List[Rectangle],
+                 sheet_width: float, sheet_height: float, prepare: Optional[Callable] = None):
+        super().__init__(daemon=True)
+        self.packer = packer
+        self.prepare = prepare
+        self.sheet_width = sheet_width
+        self.sheet_height = sheet_height
+        self.events = queue.Queue()
+        self.cancel_event = threading.Event()
+        # Копии: id сохраняем, чтобы не генерировать новый uuid
+        self._copies = [Rectangle(width=p.width, height=p.height, id=p.id, can_rotate=p.can_rotate)
+                        for p in parts]
+        self._colors = {id(c): p.color for c, p in zip(self._copies, parts)}
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    def _on_progress(self, done, total, placed, sheet_no):
+        preview = None
+        if placed is not None:
+            preview = (sheet_no, placed.x, placed.y, placed.width, placed.height, self._colors[id(placed)])
+        self.events.put(('progress', done, total, preview))
+
+    def run(self):
+        self.packer.progress_callback = self._on_progress
+        self.packer.cancel_event = self.cancel_event
+        try:
+            # При включенном захвате профиля (F5) упаковка в этом потоке попадает в общий отчет
+            with PROFILER.thread():
+                sheets = self.packer.pack_sheets(self._copies, self.sheet_width, self.sheet_height)
+        except PackingCancelled:
+            self.events.put(('cancelled',))
+            return
+        except Exception as error:
+            self.events.put(('error', error))
+            return
+        finally:
+            self.packer.progress_callback = None
+            self.packer.cancel_event = None
+
+        index_of = {id(c): i for i, c in enumerate(self._copies)}
+        result = [[(index_of[id(c)], c.x, c.y, c.width, c.height) for c in sheet] for sheet in sheets]
+        self.events.put(('done', result, self.prepare(result) if self.prepare is not None else None))
+
+
+class RemotePackWorker(threading.Thread):
+    """
+    То же, что PackWorker, но упаковка идет на сервисе раскроя (service/server.py):
+    тот же набор событий в self.events, поэтому игровой цикл не знает, где считается раскладка.
+    """
+
+    def __init__(self, address: str, job_options: dict, parts: List[Rectangle],
+                 sheet_width: float, sheet_height: float, priority: int = 0,
+                 prepare: Optional[Callable] = None):
+        super().__init__(daemon=True)
+        self.address = address
+        self.priority = priority
+        self.prepare = prepare
+        self.events = queue.Queue()
+        self.cancel_event = threading.Event()
+        self._colors = [p.color for p in parts]
+        # Задание собираем сразу: список деталей UI может меняться, пока поток ждет сервис
+        from service.client import job_from_parts
+        self._job = job_from_parts(parts, sheet_width, sheet_height, **job_options)
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    def _on_progress(self, done, total, placed):
+        preview = None
+        if placed is not None:
+            index, sheet_no, x, y, w, h = placed
+            preview = (sheet_no, x, y, w, h, self._colors[index])
+        self.events.put(('progress', done, total, preview))
+
+    def run(self):
+        from service.client import NestingClient
+        try:
+            result = NestingClient(self.address).pack(self._job, self.priority, on_progress=self._on_progress,
+                                                      cancel_event=self.cancel_event)
+        except PackingCancelled:
+            self.events.put(('cancelled',))
+            return
+        except Exception as error:
+            self.events.put(('error', error))
+            return
+        layouts = [[tuple(entry) for entry in sheet] for sheet in result['sheets']]
+        self.events.put(('done', layouts, self.prepare(layouts) if self.prepare is not None else None))
@@ -1,19 +1,32 @@
+import time
 import pygame
 from ui.renderer import Renderer
+from ui.pack_worker import PackWorker, RemotePackWorker
+from ui.viewport import Viewport
 from models.shape import Rectangle
-from algorithms.first_fit import FirstFitDecreasing  
+from models.spatial_index import SpatialGrid
+from models.collision import get_backend
+from algorithms.maxrects import MaxRectsPacker
+from algorithms.cache import CachedPacker, LayoutCache
+from algorithms.incremental import IncrementalPacker
+from generators.random_parts import generate_random_parts
+from instrumentation import METRICS, PROFILER
 
 class CuttingGame:
-    def __init__(self, parts):
+    BATCH_LIMIT = 1 << 22 # пар "деталь x размещенная" для пакетной проверки NumPy
+    METRICS_REFRESH = 0.5 # период обновления оверлея метрик, с
+
+    def __init__(self, parts, collision_backend=None, retained=True, sheet_size=(800, 600), service=None):
         pygame.init()
         self.width, self.height = 1400, 900
         self.sidebar_width = 300
-        self.sheet_offset_x = 50
-        self.sheet_offset_y = 50
 
-        # Размеры листа металла
-        self.sheet_w = 800
-        self.sheet_h = 600
+        # Размеры листа металла (мм). Детали на листе хранятся в мм от угла листа,
+        # на экран их переводит окно просмотра (масштаб + сдвиг); детали меню - в пикселях экрана
+        self.sheet_w, self.sheet_h = sheet_size
+        self.viewport = Viewport()
+        self.fit_view()
+        self.panning = False
 
         self.screen = pygame.display.set_mode((self.width, self.height))
         pygame.display.set_caption("Cutting Optimizer")
@@ -21,15 +34,58 @@ class CuttingGame:
         self.renderer = Renderer(self.screen)
         self.clock = pygame.time.Clock()
 
+        # Retained-режим: неизменное (лист, размещенные детали, сайдбар) живет в готовой поверхности,
+        # на экран каждый кадр идут только изменившиеся прямоугольники (display.update(rects)).
+        # retained=False - прежняя полная перерисовка каждого кадра
+        self.retained = retained
+        self.layout_version = 0     # растет при любом изменении раскладки/меню
+        self._base = None           # кадр без "живых" элементов (перетаскиваемой детали)
+        self._base_key = None       # (layout_version, номер листа, окно просмотра) - для чего собран _base
+        self._sidebar_key = None    # состояние сайдбара, нарисованного в _base
+        self._stats = None          # (layout_version, статистика раскладки) - суммы не считаем каждый кадр
+        self._drawn_previews = 0    # сколько контуров фоновой упаковки уже нарисовано в _base
+        self._dynamic_rects = []    # где в прошлом кадре рисовалось поверх _base
+
         # Данные деталей
         self.parts = parts          # Детали в "буфере" (справа)
-        self.placed_parts = []      # Детали на листе
+        self.sheet_index = 0        # Какой лист сейчас на экране
+        self.placed_index = SpatialGrid(cell_size=50) # Индекс placed_parts (мм) для коллизий, кликов и отсечения
+        # Пакетная проверка валидности всех деталей кадра ('numpy' / 'python' / 'auto', см. models/collision.py)
+        self.collision = get_backend(collision_backend)
+        self._placed_columns = None # (x, y, w, h) деталей листа для пакетной проверки; None - устарели
+        self._overlapping = None    # id пересекающихся деталей листа (SpatialGrid.overlapping); None - устарели
+        self._draw_order = None     # id(деталь листа) -> позиция в placed_parts; None - устарел
         self.selected_part = None
         self.drag_offset = (0, 0)
 
         # --- Phase 2: AI Packer ---
-        self.packer = FirstFitDecreasing(step=10) # step=10 для скорости, 1 для точности
         self.button_rect = None     # Сюда сохраним координаты кнопки для кликов
+        self.margin = 4             # Отступ от края листа при автоупаковке (мм)
+        # MaxRects без сетки: точные координаты, скорость не зависит от размера листа.
+        # Повторный AUTO PACK того же набора деталей берется из кэша мгновенно
+        self.layout_cache = LayoutCache(max_entries=32)
+        self.packer = CachedPacker(MaxRectsPacker(heuristic='bssf'), self.layout_cache,
+                                   context={'margin': self.margin})
+        # Дорезка без полной переупаковки: свободное место листов живет между вызовами.
+        # Списки листов общие: self.sheets - это self.incremental.sheets
+        self.incremental = IncrementalPacker(self.sheet_w - self.margin * 2, self.sheet_h - self.margin * 2,
+                                             heuristic='bssf', origin=(self.margin, self.margin))
+        self.incremental.load([[]])
+        self.sheets = self.incremental.sheets # Раскладки всех листов (multi-sheet)
+        self.placed_parts = self.sheets[0]    # Детали на текущем листе
+
+        # Фоновая упаковка: окно не "зависает" на больших заказах.
+        # service - адрес сервиса раскроя 'host:port' (service/server.py): AUTO PACK считается там
+        self.service = service
+        self.pack_worker = None
+        self.pack_parts = []        # Детали, отданные в упаковку (порядок = индексы в результате)
+        self.pack_progress = (0, 0) # (done, total)
+        self.pack_preview = []      # Промежуточные размещения: (sheet_no, x, y, w, h, color)
+
+        # Инструментация (instrumentation.py): F3 - оверлей метрик, F4 - экспорт, F5 - захват профиля
+        self.show_metrics = False
+        self._metrics_lines = []    # строки оверлея; обновляются не чаще METRICS_REFRESH секунд
+        self._metrics_refreshed = 0.0
 
         # Раскидываем детали в меню при старте
         self._reset_parts_position()
@@ -45,45 +101,223 @@ class CuttingGame:
         for part in self.parts:
             part.x = current_x
             part.y = current_y
-            # Сброс вращения на дефолтное (опционально, можно убрать)
-            if part.width < part.height: 
+            # Сброс вращения на дефолтное (детали с фиксированным волокном не трогаем)
+            if part.can_rotate and part.width < part.height:
                 part.width, part.height = part.height, part.width
                 
             current_y += 40
             if current_y > self.height - 150: # -150 чтобы не наехать на кнопку
                 current_y = y_start
                 current_x += 60 
+        self._invalidate_layout()
 
     def run_auto_pack(self):
-        """Логика автоматической упаковки с отступами"""
+        """Запускает автоматическую упаковку с отступами в фоновом потоке"""
+        if self.pack_worker is not None:
+            return
         print("AI Start Packing...")
         
-        # Настройка отступа (в пикселях/мм)
-        margin = 4 
-        
-        all_parts = self.parts + self.placed_parts
+        self.selected_part = None
+        self.pack_parts = self.parts + [p for sheet in self.sheets for p in sheet]
         
         # 1. Запускаем алгоритм на УМЕНЬШЕННОМ листе
         # Мы "обманываем" алгоритм, говоря, что места меньше, чем на самом деле.
         # Так он не поставит детали вплотную к краям.
-        effective_width = self.sheet_w - (margin * 2)
-        effective_height = self.sheet_h - (margin * 2)
+        effective_width = self.sheet_w - (self.margin * 2)
+        effective_height = self.sheet_h - (self.margin * 2)
         
-        packed_results = self.packer.pack(all_parts, effective_width, effective_height)
+        # Столько листов, сколько понадобится. Считает поток, результат забираем в _poll_pack_worker
+        self.pack_progress = (0, len(self.pack_parts))
+        self.pack_preview = []
+        # Свободное место листов для дорезки строит тот же поток: на тысячах деталей это секунды
+        prepare = self.incremental.build_bins
+        if self.service:
+            # Тот же MaxRects BSSF, что и локально, но на общем хосте раскроя
+            self.pack_worker = RemotePackWorker(self.service, {'algorithm': 'maxrects', 'params': {'heuristic': 'bssf'}},
+                                                self.pack_parts, effective_width, effective_height, prepare=prepare)
+        else:
+            self.pack_worker = PackWorker(self.packer, self.pack_parts, effective_width, effective_height,
+                                          prepare=prepare)
+        self.pack_worker.start()
+
+    def cancel_auto_pack(self):
+        if self.pack_worker is not None:
+            self.pack_worker.cancel()
+
+    def _poll_pack_worker(self):
+        """Забирает события фоновой упаковки (вызывается каждый кадр)"""
+        worker = self.pack_worker
+        if worker is None:
+            return
+        while not worker.events.empty():
+            event = worker.events.get_nowait()
+            kind = event[0]
+            if kind == 'progress':
+                _, done, total, preview = event
+                self.pack_progress = (done, total)
+                if preview is not None:
+                    self.pack_preview.append(preview)
+            else:
+                self.pack_worker = None
+                self.pack_preview = []
+                self._invalidate_layout() # контуры предпросмотра больше не нужны
+                if kind == 'done':
+                    self._apply_pack_result(event[1], event[2])
+                elif kind == 'cancelled':
+                    print("Packing cancelled")
+                else:
+                    print(f"Packing failed: {event[1]!r}")
+                return
+
+    def _apply_pack_result(self, layouts, bins=None):
+        """
+        Переносит итоговую раскладку из потока на детали (только финальный результат).
+        bins - свободное место листов для дорезки, построенное в потоке упаковки (IncrementalPacker.build_bins)
+        """
+        all_parts = self.pack_parts
+        sheets = []
         
-        # 2. Применяем координаты со смещением
-        for part in packed_results:
-            # Сдвиг = (начало листа) + (отступ внутрь)
-            part.x += self.sheet_offset_x + margin
-            part.y += self.sheet_offset_y + margin
+        # 2. Применяем координаты со смещением (у каждого листа свои координаты)
+        for layout in layouts:
+            sheet = []
+            for index, x, y, w, h in layout:
+                part = all_parts[index]
+                part.width, part.height = w, h
+                # Сдвиг = отступ внутрь листа
+                part.x = x + self.margin
+                part.y = y + self.margin
+                sheet.append(part)
+            sheets.append(sheet)
         
-        # 3. Обновляем списки
-        self.placed_parts = packed_results
-        self.parts = [p for p in all_parts if p not in packed_results]
+        # 3. Обновляем списки (и свободное место для последующей дорезки)
+        self.incremental.load(sheets or [[]], bins=bins if sheets else None)
+        self.sheets = self.incremental.sheets
+        self.show_sheet(0)
+        placed_ids = {id(p) for sheet in sheets for p in sheet}
+        self.parts = [p for p in all_parts if id(p) not in placed_ids]
+        self.pack_parts = []
         
-        # 4. Возвращаем остальные в меню
+        # 4. Возвращаем остальные (те, что больше листа) в меню
         self._reset_parts_position()
-        print(f"Finish! Placed: {len(self.placed_parts)}, Left: {len(self.parts)}")
+        print(f"Finish! Sheets: {len(sheets)}, Placed: {len(placed_ids)}, Left: {len(self.parts)}")
+
+    def add_parts(self, new_parts):
+        """
+        Новые (срочные) детали: встают в свободное место готовой раскладки,
+        уже размещенные детали не двигаются. Не поместившиеся - в меню.
+        """
+        if self.pack_worker is not None:
+            return
+        added = {id(p) for p in new_parts}
+        if id(self.selected_part) in added:
+            self.selected_part = None
+        unplaced = self.incremental.add(new_parts)
+        self.parts = [p for p in self.parts if id(p) not in added] + unplaced
+        self.show_sheet(self.sheet_index)
+        self._reset_parts_position()
+        print(f"Added {len(new_parts) - len(unplaced)} part(s) to the layout, left: {len(unplaced)}")
+
+    def reoptimize_sheet(self):
+        """Переупаковывает текущий лист вокруг закрепленных (поставленных вручную) деталей"""
+        if self.pack_worker is not None:
+            return
+        if self.incremental.reoptimize(self.sheet_index):
+            self.show_sheet(self.sheet_index)
+        else:
+            print("Re-optimization did not fit, layout kept")
+
+    def show_sheet(self, index):
+        """Переключает экран на лист index (листание по раскладкам)"""
+        self.sheet_index = max(0, min(index, len(self.sheets) - 1))
+        self.placed_parts = self.sheets[self.sheet_index]
+        self.placed_index.rebuild(self.placed_parts)
+        self._invalidate_layout()
+
+    def _invalidate_layout(self):
+        """Раскладка или меню изменились: сбрасываем кэши проверки коллизий и отрисовки"""
+        self._placed_columns = None
+        self._overlapping = None
+        self._draw_order = None
+        self.layout_version += 1
+
+    # --- Окно просмотра ---
+
+    def _sheet_area(self):
+        """Экранная область листа (все, что левее сайдбара)"""
+        return (0, 0, self.width - self.sidebar_width, self.height)
+
+    def fit_view(self):
+        """Вписать лист в окно (маленькие листы - 1:1)"""
+        self.viewport.fit(self.sheet_w, self.sheet_h, self._sheet_area())
+
+    def zoom(self, factor, pos=None):
+        if pos is None:
+            area = self._sheet_area()
+            pos = (area[0] + area[2] / 2, area[1] + area[3] / 2)
+        self.viewport.zoom_at(factor, *pos)
+
+    def _over_sheet_area(self, pos):
+        return pos[0] < self.width - self.sidebar_width
+
+    def visible_parts(self):
+        """Детали текущего листа, попадающие в окно (отсечение через SpatialGrid)"""
+        x, y, w, h = self.viewport.visible_world(self._sheet_area())
+        if x <= 0 and y <= 0 and x + w >= self.sheet_w and y + h >= self.sheet_h:
+            return [p for p in self.placed_parts if p is not self.selected_part]
+        return self._in_draw_order(self.placed_index.query(x, y, w, h))
+
+    def _in_draw_order(self, parts):
+        """
+        Детали из запроса к SpatialGrid - в порядке placed_parts: тени соседних деталей перекрываются,
+        и кадр не должен зависеть от того, каким запросом (весь вид или полоса при сдвиге) их достали
+        """
+        if self._draw_order is None:
+            self._draw_order = {id(p): i for i, p in enumerate(self.placed_parts)}
+        order = self._draw_order
+        return sorted((p for p in parts if p is not self.selected_part), key=lambda p: order[id(p)])
+
+    # --- Инструментация ---
+
+    def toggle_metrics(self):
+        """F3: оверлей метрик в сайдбаре (включает сбор метрик, если он был выключен)"""
+        self.show_metrics = not self.show_metrics
+        if self.show_metrics:
+            METRICS.enable()
+            self._metrics_refreshed = 0.0
+
+    def export_metrics(self, prefix='metrics'):
+        """F4: метрики в prefix.json и prefix.prom (Prometheus text)"""
+        for path in (f"{prefix}.json", f"{prefix}.prom"):
+            METRICS.export(path)
+        print(f"Metrics exported: {prefix}.json, {prefix}.prom")
+
+    def toggle_profiling(self):
+        """F5: старт/стоп захвата cProfile + tracemalloc (упаковка в фоне попадает в тот же отчет)"""
+        if not PROFILER.active:
+            PROFILER.start()
+            print("Profiling started (F5 to stop)")
+        else:
+            written = PROFILER.stop(time.strftime("profile-%Y%m%d-%H%M%S"))
+            print(f"Profile written: {', '.join(written)}")
+
+    def _metrics_overlay_lines(self):
+        now = time.monotonic()
+        if now - self._metrics_refreshed >= self.METRICS_REFRESH:
+            self._metrics_lines = METRICS.summary_lines()
+            self._metrics_refreshed = now
+        return self._metrics_lines
+
+    def _draw_metrics_overlay(self):
+        """Оверлей поверх меню сайдбара; возвращает занятый прямоугольник (или None)"""
+        if not self.show_metrics:
+            return None
+        title = "METRICS  F4 export  F5 " + ("stop profile" if PROFILER.active else "profile")
+        return self.renderer.draw_metrics(self.width - self.sidebar_width + 10, 270, self.sidebar_width - 20,
+                                          title, self._metrics_overlay_lines())
+
+    def set_collision_backend(self, name):
+        """Переключение бэкенда проверки коллизий на лету"""
+        self.collision = get_backend(name)
 
     def run(self):
         running = True
@@ -91,114 +325,347 @@ class CuttingGame:
             mouse_pos = pygame.mouse.get_pos()
             
             # --- Event Handling ---  #
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    running = False
+            with METRICS.timer('ui.events'):
+                for event in pygame.event.get():
+                    if event.type == pygame.QUIT:
+                        self.cancel_auto_pack()
+                        running = False
                     
-                elif event.type == pygame.MOUSEBUTTONDOWN:
-                    if event.button == 1: # Left Click
-                        # Проверка клика по кнопке AUTO PACK
-                        if self.button_rect and self.button_rect.collidepoint(event.pos):
-                            self.run_auto_pack()
-                        else:
-                            self.handle_mouse_down(event)
+                    elif event.type == pygame.MOUSEBUTTONDOWN:
+                        if event.button == 1: # Left Click
+                            # Проверка клика по кнопке AUTO PACK / CANCEL
+                            if self.button_rect and self.button_rect.collidepoint(event.pos):
+                                if self.pack_worker is not None:
+                                    self.cancel_auto_pack()
+                                else:
+                                    self.run_auto_pack()
+                            elif self.pack_worker is None: # пока идет упаковка, детали не трогаем
+                                self.handle_mouse_down(event)
+                        elif event.button in (2, 3) and self._over_sheet_area(event.pos):
+                            self.panning = True # ПКМ/СКМ - двигаем лист
                             
-                elif event.type == pygame.MOUSEBUTTONUP:
-                    self.handle_mouse_up(event)
-                elif event.type == pygame.MOUSEMOTION:
-                    self.handle_mouse_move(event)
-                elif event.type == pygame.KEYDOWN:
-                    if event.key == pygame.K_r and self.selected_part:
-                        self.selected_part.rotate()
+                    elif event.type == pygame.MOUSEBUTTONUP:
+                        if event.button in (2, 3):
+                            self.panning = False
+                        else:
+                            self.handle_mouse_up(event)
+                    elif event.type == pygame.MOUSEWHEEL:
+                        if self._over_sheet_area(mouse_pos):
+                            self.zoom(1.2 ** event.y, mouse_pos)
+                    elif event.type == pygame.MOUSEMOTION:
+                        if self.panning:
+                            self.viewport.pan(*event.rel)
+                        self.handle_mouse_move(event)
+                    elif event.type == pygame.KEYDOWN:
+                        if event.key == pygame.K_ESCAPE:
+                            self.cancel_auto_pack()
+                        elif event.key == pygame.K_r and self.selected_part and self.selected_part.can_rotate:
+                            self.selected_part.rotate()
+                        elif event.key == pygame.K_i and not self.selected_part:
+                            self.add_parts(list(self.parts)) # дорезать меню в готовую раскладку
+                        elif event.key == pygame.K_n and not self.selected_part:
+                            self.add_parts(generate_random_parts(1)) # срочная деталь
+                        elif event.key == pygame.K_o and not self.selected_part:
+                            self.reoptimize_sheet()
+                        elif event.key == pygame.K_f:
+                            self.fit_view()
+                        elif event.key == pygame.K_F3:
+                            self.toggle_metrics()
+                        elif event.key == pygame.K_F4:
+                            self.export_metrics()
+                        elif event.key == pygame.K_F5:
+                            self.toggle_profiling()
+                        elif event.key in (pygame.K_PLUS, pygame.K_EQUALS, pygame.K_KP_PLUS):
+                            self.zoom(1.25)
+                        elif event.key in (pygame.K_MINUS, pygame.K_KP_MINUS):
+                            self.zoom(0.8)
+                        elif event.key in (pygame.K_RIGHT, pygame.K_PAGEDOWN) and not self.selected_part:
+                            self.show_sheet(self.sheet_index + 1)
+                        elif event.key in (pygame.K_LEFT, pygame.K_PAGEUP) and not self.selected_part:
+                            self.show_sheet(self.sheet_index - 1)
+
+                self._poll_pack_worker()
 
             # --- Rendering ---  #
-            self.renderer.draw_background()
-            
-            # Рисуем лист
-            self.renderer.draw_sheet(self.sheet_offset_x, self.sheet_offset_y, self.sheet_w, self.sheet_h)
-            
             # Статистика
-            stats = {
-                'efficiency': self.calculate_efficiency(),
-                'placed': len(self.placed_parts),
-                'total': len(self.parts) + len(self.placed_parts)
-            }
-
-            # 2.1 Сайдбар (меню)
-            self.renderer.draw_sidebar(self.width - self.sidebar_width, self.sidebar_width, self.height, stats)
-
-            # 2.2 Кнопка AUTO PACK (рисуем поверх сайдбара)
-            btn_x = self.width - self.sidebar_width + 20
-            btn_y = self.height - 80
+            stats = dict(self._layout_stats())
+            if self.pack_worker is not None:
+                stats['progress'] = self.pack_progress
+            label = "CANCEL (Esc)" if self.pack_worker is not None else "AUTO PACK (AI)"
             # Проверяем наведение мыши для эффекта подсветки
             is_hover = self.button_rect.collidepoint(mouse_pos) if self.button_rect else False
-            
-            self.button_rect = self.renderer.draw_button(
-                btn_x, btn_y, 
-                self.sidebar_width - 40, 50, 
-                "AUTO PACK (AI)", 
-                is_hover
-            )
-
-            # 2.3 Детали (рисуем поверх всего)
-            all_parts = self.parts + self.placed_parts
-            
-            # Выбранную деталь рисуем последней (чтобы была сверху)
-            if self.selected_part and self.selected_part in all_parts:
-                all_parts.remove(self.selected_part)
-                all_parts.append(self.selected_part)
-
-            for part in all_parts:
-                is_selected = (part == self.selected_part)
-                is_valid = self.check_valid_position(part)
-                
-                self.renderer.draw_shape(part, is_selected, is_valid)
-            
-            pygame.display.flip()
+
+            with METRICS.timer('ui.render'):
+                if self.retained:
+                    self._render_retained(stats, label, is_hover)
+                else:
+                    self._render_full(stats, label, is_hover)
             self.clock.tick(60)
-            
+
+        if PROFILER.active:
+            self.toggle_profiling() # не теряем захваченный профиль при выходе
         pygame.quit()
 
+    def _button_geometry(self):
+        # Кнопка AUTO PACK внизу сайдбара
+        return self.width - self.sidebar_width + 20, self.height - 80, self.sidebar_width - 40, 50
+
+    def _preview_rects(self, previews):
+        """Экранные прямоугольники контуров фоновой упаковки на текущем листе"""
+        for sheet_no, x, y, w, h, color in previews:
+            if sheet_no == self.sheet_index:
+                yield self.viewport.rect_to_screen(x + self.margin, y + self.margin, w, h), color
+
+    def _render_full(self, stats, label, is_hover):
+        """Полная перерисовка кадра (retained=False)"""
+        renderer = self.renderer
+        renderer.draw_background()
+        
+        # Рисуем лист через окно просмотра
+        renderer.draw_sheet(*renderer.sheet_view(self.viewport, self.sheet_w, self.sheet_h))
+
+        # Детали листа (только видимые) и промежуточные размещения фоновой упаковки -
+        # с отсечением по области листа: при приближении они не должны залезать на сайдбар
+        self.screen.set_clip(pygame.Rect(self._sheet_area()))
+        placed = self.visible_parts()
+        renderer.draw_shapes(placed, self.compute_validity(placed), self.viewport)
+        for rect, color in self._preview_rects(self.pack_preview):
+            renderer.draw_preview(*rect, color)
+        self.screen.set_clip(None)
+
+        # Сайдбар (меню)
+        renderer.draw_sidebar(self.width - self.sidebar_width, self.sidebar_width, self.height, stats)
+
+        # Кнопка AUTO PACK (рисуем поверх сайдбара)
+        self.button_rect = renderer.draw_button(*self._button_geometry(), label, is_hover)
+
+        # Детали меню (экранные координаты, всегда валидны)
+        for part in self._menu_parts():
+            renderer.draw_shape(part)
+        self._draw_metrics_overlay()
+
+        # Выбранную деталь рисуем последней (чтобы была сверху)
+        if self.selected_part is not None:
+            part = self.selected_part
+            renderer.draw_shape(part, True, self.check_valid_position(part), viewport=self.viewport)
+        
+        pygame.display.flip()
+
+    def _menu_parts(self):
+        """Детали меню, которые видны на экране (кроме перетаскиваемой)"""
+        return [p for p in self.parts if p is not self.selected_part and p.x < self.width and p.y < self.height]
+
+    def _render_retained(self, stats, label, is_hover):
+        """
+        Кадр поверх готовой поверхности self._base (лист + сетка + размещенные детали + сайдбар).
+        _base пересобирается только при изменении раскладки (layout_version), листа или масштаба,
+        при панорамировании - сдвигается (_scroll_base),
+        сайдбар - при изменении статистики/кнопки, контуры упаковки дорисовываются в _base по мере прихода.
+        На экран уходят только грязные прямоугольники.
+        """
+        renderer = self.renderer
+        sidebar_x = self.width - self.sidebar_width
+        sidebar_rect = pygame.Rect(sidebar_x, 0, self.sidebar_width, self.height)
+        full_redraw = False
+        dirty = []
+
+        # 1. Слой листа (строится один раз на вид) + видимые размещенные детали текущего листа
+        base_key = (self.layout_version, self.sheet_index, self.viewport.key)
+        if self._base_key != base_key and self._scroll_base(base_key):
+            full_redraw = True
+        elif self._base_key != base_key:
+            self._base = renderer.sheet_layer(*renderer.sheet_view(self.viewport, self.sheet_w, self.sheet_h)).copy()
+            placed = self.visible_parts()
+            self._base.set_clip(pygame.Rect(self._sheet_area()))
+            with renderer.target(self._base):
+                renderer.draw_shapes(placed, self.compute_validity(placed), self.viewport)
+            self._base.set_clip(None)
+            self._base_key = base_key
+            self._sidebar_key = None
+            self._drawn_previews = 0
+            full_redraw = True
+        base = self._base
+
+        # 2. Сайдбар, кнопка и детали меню - только если что-то из этого поменялось
+        sidebar_key = (tuple(sorted(stats.items())), label, is_hover)
+        if self._sidebar_key != sidebar_key:
+            base.set_clip(sidebar_rect)
+            with renderer.target(base):
+                renderer.draw_sidebar(sidebar_x, self.sidebar_width, self.height, stats)
+                self.button_rect = renderer.draw_button(*self._button_geometry(), label, is_hover)
+                for part in self._menu_parts():
+                    renderer.draw_shape(part)
+            base.set_clip(None)
+            self._sidebar_key = sidebar_key
+            dirty.append(sidebar_rect)
+
+        # 3. Новые контуры фоновой упаковки - прямо в _base, старые уже там
+        if len(self.pack_preview) > self._drawn_previews:
+            base.set_clip(pygame.Rect(0, 0, sidebar_x, self.height))
+            with renderer.target(base):
+                for rect, color in self._preview_rects(self.pack_preview[self._drawn_previews:]):
+                    renderer.draw_preview(*rect, color)
+                    dirty.append(pygame.Rect(rect).inflate(2, 2))
+            base.set_clip(None)
+            self._drawn_previews = len(self.pack_preview)
+
+        # 4. Стираем "живое" прошлого кадра и рисуем выбранную деталь заново
+        if full_redraw:
+            self.screen.blit(base, (0, 0))
+        else:
+            for rect in dirty + self._dynamic_rects:
+                self.screen.blit(base, rect, rect)
+        dynamic = []
+        overlay = self._draw_metrics_overlay()
+        if overlay is not None:
+            dynamic.append(overlay)
+        if self.selected_part is not None:
+            part = self.selected_part
+            renderer.draw_shape(part, True, self.check_valid_position(part), viewport=self.viewport)
+            dynamic.append(renderer.shape_bounds(part, True, self.viewport))
+
+        if full_redraw:
+            pygame.display.flip()
+        else:
+            pygame.display.update(dirty + self._dynamic_rects + dynamic)
+        self._dynamic_rects = dynamic
+
+    def _scroll_base(self, base_key):
+        """
+        Панорамирование без полной пересборки _base: готовый кадр сдвигается (Surface.scroll),
+        дорисовываются только открывшиеся полосы. Только для целого сдвига при том же масштабе и раскладке.
+        """
+        old_key = self._base_key
+        if old_key is None or old_key[:2] != base_key[:2] or self.pack_preview:
+            return False
+        (scale, old_x, old_y), (new_scale, new_x, new_y) = old_key[2], base_key[2]
+        dx, dy = new_x - old_x, new_y - old_y
+        area = pygame.Rect(self._sheet_area())
+        if scale != new_scale or dx != int(dx) or dy != int(dy) or abs(dx) >= area.width or abs(dy) >= area.height:
+            return False
+        dx, dy = int(dx), int(dy)
+
+        strips = []
+        if dx:
+            strips.append(pygame.Rect(area.left if dx > 0 else area.right + dx, area.top, abs(dx), area.height))
+        if dy:
+            strips.append(pygame.Rect(area.left, area.top if dy > 0 else area.bottom + dy, area.width, abs(dy)))
+        renderer, base = self.renderer, self._base
+        sheet = renderer.sheet_view(self.viewport, self.sheet_w, self.sheet_h)
+        # Тень, обводка и подпись детали выступают за ее габарит - берем детали с запасом
+        pad = 8 / new_scale
+        base.set_clip(area)
+        base.scroll(dx, dy)
+        with renderer.target(base):
+            for strip in strips:
+                base.set_clip(strip)
+                renderer.draw_background()
+                renderer.draw_sheet(*sheet)
+                x, y, w, h = self.viewport.visible_world(strip)
+                parts = self._in_draw_order(self.placed_index.query(x - pad, y - pad, w + 2 * pad, h + 2 * pad))
+                renderer.draw_shapes(parts, self.compute_validity(parts), self.viewport)
+        base.set_clip(None)
+        self._base_key = base_key
+        return True
+
     def handle_mouse_down(self, event):
         mouse_x, mouse_y = event.pos
-        # Ищем, кликнули ли по детали (проверяем с конца)
-        for part in reversed(self.parts + self.placed_parts):
-            if (part.x <= mouse_x <= part.right and 
-                part.y <= mouse_y <= part.bottom):
-                self.selected_part = part
-                self.drag_offset = (mouse_x - part.x, mouse_y - part.y)
-                
-                # Если взяли с листа - временно считаем "в полете" (возвращаем в общий пул визуально)
-                if part in self.placed_parts:
-                    self.placed_parts.remove(part)
-                    self.parts.append(part)
-                break
+        # Сначала ищем на листе через индекс (в мм), затем в меню (экранные координаты, проверяем с конца)
+        part = None
+        if self._over_sheet_area(event.pos):
+            hits = self.placed_index.query_point(*self.viewport.to_world(mouse_x, mouse_y))
+            part = hits[0] if hits else None
+        if part is None:
+            for candidate in reversed(self.parts):
+                if (candidate.x <= mouse_x <= candidate.right and
+                    candidate.y <= mouse_y <= candidate.bottom):
+                    part = candidate
+                    break
+            if part is None:
+                return
+            # Деталь из меню переходит в координаты листа: ее угол остается под тем же пикселем
+            part.x, part.y = self.viewport.to_world(part.x, part.y)
+
+        self.selected_part = part
+        world_x, world_y = self.viewport.to_world(mouse_x, mouse_y)
+        self.drag_offset = (world_x - part.x, world_y - part.y)
+        self._invalidate_layout() # выбранная деталь рисуется отдельно от слоев
+
+        # Если взяли с листа - временно считаем "в полете" (возвращаем в общий пул визуально)
+        if part in self.placed_index:
+            self.placed_index.remove(part)
+            self.incremental.remove(part) # место сразу возвращается в свободное
+            self.parts.append(part)
+            self._invalidate_layout()
 
     def handle_mouse_up(self, event):
         if self.selected_part:
-            # Проверяем границы и пересечения
-            if (self.selected_part.is_inside(self.sheet_w, self.sheet_h) and 
-                self.check_valid_position(self.selected_part)):
-                
-                # Фиксируем на листе
-                if self.selected_part in self.parts:
-                    self.parts.remove(self.selected_part)
-                self.placed_parts.append(self.selected_part)
-            else:
-                pass
+            # Проверяем границы; пересечения разрешаем только с автоматически
+            # размещенными деталями - их дорезка переставит в свободное место
+            part = self.selected_part
+            placed = False
+            if part.is_inside(self.sheet_w, self.sheet_h):
+                clean = self.check_valid_position(part)
+                # Фиксируем на листе: поставленная вручную деталь закреплена
+                placed = self.incremental.place(part, self.sheet_index, pinned=True)
+                if placed:
+                    if part in self.parts:
+                        self.parts.remove(part)
+                    if clean:
+                        self.placed_index.insert(part)
+                        self._invalidate_layout()
+                    else:
+                        self.show_sheet(self.sheet_index) # соседи переехали - пересобираем индекс
             self.selected_part = None
+            if not placed:
+                self._reset_parts_position() # не встала на лист - обратно в меню (в экранные координаты)
+            self._invalidate_layout()
 
     def handle_mouse_move(self, event):
         if self.selected_part:
-            mouse_x, mouse_y = event.pos
-            self.selected_part.x = mouse_x - self.drag_offset[0]
-            self.selected_part.y = mouse_y - self.drag_offset[1]
+            world_x, world_y = self.viewport.to_world(*event.pos)
+            self.selected_part.x = world_x - self.drag_offset[0]
+            self.selected_part.y = world_y - self.drag_offset[1]
 
     def check_valid_position(self, current_part):
-        for other in self.placed_parts:
-            if current_part != other and current_part.intersects(other):
-                return False
-        return True
+        if METRICS.enabled:
+            METRICS.count('collision.checks')
+        return not self.placed_index.any_intersects(current_part)
+
+    def compute_validity(self, parts):
+        """
+        Валидность всех деталей кадра. С NumPy - один пакетный вызов (детали x размещенные),
+        иначе поштучно через SpatialGrid.
+        """
+        # На десятках тысяч деталей матрица "все x все" слишком дорогая - тогда через сетку:
+        # детали листа - один проход по ячейкам на всю раскладку (до следующего изменения)
+        if self.collision.name != 'numpy' or len(parts) * len(self.placed_parts) > self.BATCH_LIMIT:
+            if self._overlapping is None:
+                self._overlapping = self.placed_index.overlapping()
+            return [id(part) not in self._overlapping if part in self.placed_index
+                    else self.check_valid_position(part) for part in parts]
+
+        if self._placed_columns is None:
+            placed = self.placed_parts
+            self._placed_columns = ([p.x for p in placed], [p.y for p in placed],
+                                    [p.width for p in placed], [p.height for p in placed])
+        counts = self.collision.overlap_counts([p.x for p in parts], [p.y for p in parts],
+                                               [p.width for p in parts], [p.height for p in parts],
+                                               *self._placed_columns)
+        # Деталь с листа пересекает саму себя - это не ошибка
+        return [count <= (1 if part in self.placed_index else 0) for part, count in zip(parts, counts)]
+
+    def _layout_stats(self):
+        """Статистика для сайдбара; O(n) по деталям, поэтому пересчитывается только при смене layout_version"""
+        if self._stats is None or self._stats[0] != self.layout_version:
+            self._stats = (self.layout_version, {
+                'efficiency': self.calculate_efficiency(),
+                'placed': len(self.placed_parts),
+                'total': len(self.parts) + sum(len(sheet) for sheet in self.sheets),
+                'sheet': self.sheet_index + 1,
+                'sheets': len(self.sheets)
+            })
+        return self._stats[1]
 
     def calculate_efficiency(self):
         if not self.placed_parts: return 0.0
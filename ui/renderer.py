@@ -1,3 +1,5 @@
+import math
+from contextlib import contextmanager
 import pygame
 
 COLORS = {
@@ -15,26 +17,98 @@ COLORS = {
 }
 
 class Renderer:
+    TEXT_CACHE_LIMIT = 4096 # подписей в кэше; при переполнении кэш просто сбрасывается
+    GRID_STEPS = (10, 50, 100, 250, 500, 1000, 2500) # шаги сетки листа, мм
+    MIN_GRID_PX = 25        # линии сетки не ближе этого расстояния на экране
+
     def __init__(self, screen):
         self.screen = screen
         # Используем системный шрифт, но посимпатичнее, или дефолтный
         self.title_font = pygame.font.SysFont("Verdana", 24, bold=True)
         self.font = pygame.font.SysFont("Verdana", 14)
         self.small_font = pygame.font.SysFont("Consolas", 12)
+        # Кэши для retained-режима: отрендеренный текст, тени перетаскивания, слой листа
+        self._text_cache = {}
+        self._shadow_cache = {}
+        self._sheet_layer = None
+        self._sheet_layer_key = None
+
+    def render_text(self, font, text, color):
+        """font.render с кэшем: подписи деталей и статистика почти не меняются от кадра к кадру"""
+        key = (id(font), text, color)
+        surface = self._text_cache.get(key)
+        if surface is None:
+            if len(self._text_cache) >= self.TEXT_CACHE_LIMIT:
+                self._text_cache.clear()
+            surface = self._text_cache[key] = font.render(text, True, color)
+        return surface
+
+    @contextmanager
+    def target(self, surface):
+        """Временно рисуем в другую поверхность (слой), а не на экран"""
+        screen = self.screen
+        self.screen = surface
+        try:
+            yield surface
+        finally:
+            self.screen = screen
+
+    def sheet_layer(self, sheet_x, sheet_y, width, height, size_mm=None, cell_size=50):
+        """Фон + лист + сетка + подписи одной поверхностью размером с экран (строится один раз на вид)"""
+        key = (self.screen.get_size(), sheet_x, sheet_y, width, height, size_mm, cell_size)
+        if self._sheet_layer_key != key:
+            layer = pygame.Surface(self.screen.get_size()).convert()
+            with self.target(layer):
+                self.draw_background()
+                self.draw_sheet(sheet_x, sheet_y, width, height, size_mm, cell_size)
+            self._sheet_layer, self._sheet_layer_key = layer, key
+        return self._sheet_layer
+
+    def sheet_view(self, viewport, width_mm, height_mm):
+        """
+        Аргументы draw_sheet/sheet_layer для листа width_mm x height_mm в окне viewport:
+        экранный прямоугольник, подписи в мм и шаг сетки (крупнее при отдалении, чтобы линии не сливались)
+        """
+        x, y, w, h = viewport.rect_to_screen(0, 0, width_mm, height_mm)
+        step = next((s for s in self.GRID_STEPS if s * viewport.scale >= self.MIN_GRID_PX), self.GRID_STEPS[-1])
+        return x, y, w, h, (width_mm, height_mm), step * viewport.scale
+
+    @staticmethod
+    def shape_bounds(shape, is_selected=False, viewport=None):
+        """Прямоугольник экрана, который задевает draw_shape (вместе с тенью и обводкой)"""
+        x, y, w, h = Renderer._screen_rect(shape, viewport)
+        shadow = 8 if is_selected else 2
+        return pygame.Rect(int(x) - 2, int(y) - 2, int(w) + shadow + 5, int(h) + shadow + 5)
+
+    @staticmethod
+    def _screen_rect(shape, viewport=None):
+        if viewport is None:
+            return shape.x, shape.y, shape.width, shape.height
+        return viewport.rect_to_screen(shape.x, shape.y, shape.width, shape.height)
 
     def draw_background(self):
         self.screen.fill(COLORS['background'])
 
     def draw_grid(self, x, y, width, height, cell_size=50):
         """Рисуем инженерную сетку"""
+        # Шаг может быть дробным - сетка масштабируется вместе с листом.
+        # Рисуем только линии в области отсечения: при приближении лист в разы больше экрана
+        clip = self.screen.get_clip()
         # Вертикальные линии
-        for ix in range(0, width + 1, cell_size):
+        first = max(0, int((clip.left - x) // cell_size))
+        last = min(int(width // cell_size), int((clip.right - x) // cell_size) + 1)
+        for i in range(first, last + 1):
+            ix = math.floor(x + i * cell_size) - x
             pygame.draw.line(self.screen, COLORS['grid'], (x + ix, y), (x + ix, y + height), 1)
         # Горизонтальные линии
-        for iy in range(0, height + 1, cell_size):
+        first = max(0, int((clip.top - y) // cell_size))
+        last = min(int(height // cell_size), int((clip.bottom - y) // cell_size) + 1)
+        for i in range(first, last + 1):
+            iy = math.floor(y + i * cell_size) - y
             pygame.draw.line(self.screen, COLORS['grid'], (x, y + iy), (x + width, y + iy), 1)
 
-    def draw_sheet(self, sheet_x, sheet_y, width, height):
+    def draw_sheet(self, sheet_x, sheet_y, width, height, size_mm=None, cell_size=50):
+        # width/height - экранный размер, size_mm - настоящий (для подписей; по умолчанию 1:1)
         # Тень под листом
         pygame.draw.rect(self.screen, COLORS['shadow'], 
                         (sheet_x + 10, sheet_y + 10, width, height), border_radius=4)
@@ -43,33 +117,44 @@ class Renderer:
         pygame.draw.rect(self.screen, COLORS['sheet_bg'], (sheet_x, sheet_y, width, height), border_radius=4)
         
         # Сетка
-        self.draw_grid(sheet_x, sheet_y, width, height)
+        self.draw_grid(sheet_x, sheet_y, width, height, cell_size)
         
         # Обводка листа
         pygame.draw.rect(self.screen, COLORS['sheet_border'], (sheet_x, sheet_y, width, height), 2, border_radius=4)
 
         # Размеры листа (подписи)
-        w_text = self.small_font.render(f"{width}mm", True, COLORS['text_dim'])
-        h_text = self.small_font.render(f"{height}mm", True, COLORS['text_dim'])
+        width_mm, height_mm = size_mm or (width, height)
+        w_text = self.render_text(self.small_font, f"{width_mm:g}mm", COLORS['text_dim'])
+        h_text = self.render_text(self.small_font, f"{height_mm:g}mm", COLORS['text_dim'])
         self.screen.blit(w_text, (sheet_x + width // 2 - 20, sheet_y - 20))
         self.screen.blit(h_text, (sheet_x - 45, sheet_y + height // 2))
 
-    def draw_shape(self, shape, is_selected=False, is_valid=True, offset_x=0, offset_y=0):
-        # Реальные координаты отрисовки (с учетом смещения листа, если нужно)
-        x = shape.x + offset_x
-        y = shape.y + offset_y
-        
-        rect = (x, y, shape.width, shape.height)
+    def draw_shape(self, shape, is_selected=False, is_valid=True, offset_x=0, offset_y=0, viewport=None):
+        # Реальные координаты отрисовки: через окно просмотра (деталь на листе) или как есть (меню)
+        x, y, width, height = self._screen_rect(shape, viewport)
+        x += offset_x
+        y += offset_y
+        if viewport is not None and not viewport.detailed:
+            self._draw_simple(x, y, width, height, shape.color, is_selected, is_valid)
+            return
+
+        rect = (x, y, width, height)
         
         # 1. Тень (Deep Shadow) при перетаскивании
         if is_selected:
-            shadow_rect = (x + 8, y + 8, shape.width, shape.height)
-            s = pygame.Surface((shape.width, shape.height), pygame.SRCALPHA)
-            pygame.draw.rect(s, (0, 0, 0, 80), (0,0, shape.width, shape.height), border_radius=6)
+            size = (int(width), int(height))
+            s = self._shadow_cache.get(size)
+            if s is None:
+                # Полупрозрачная тень одного размера нужна каждый кадр, пока деталь тащат
+                s = pygame.Surface(size, pygame.SRCALPHA)
+                pygame.draw.rect(s, (0, 0, 0, 80), (0, 0, *size), border_radius=6)
+                if len(self._shadow_cache) > 64:
+                    self._shadow_cache.clear()
+                self._shadow_cache[size] = s
             self.screen.blit(s, (x + 8, y + 8))
         else:
             # Легкая тень для лежащих деталей
-            shadow_rect = (x + 2, y + 2, shape.width, shape.height)
+            shadow_rect = (x + 2, y + 2, width, height)
             pygame.draw.rect(self.screen, (20, 20, 25), shadow_rect, border_radius=4)
 
         # 2. Основное тело детали
@@ -89,43 +174,89 @@ class Renderer:
             
         pygame.draw.rect(self.screen, border_color, rect, thickness, border_radius=4)
 
-        # 4. Текст размеров (автоматически прячем если деталь слишком мелкая)
-        if shape.width > 30 and shape.height > 20:
-            text = self.small_font.render(f"{int(shape.width)}x{int(shape.height)}", True, (255, 255, 255))
-            text_rect = text.get_rect(center=(x + shape.width // 2, y + shape.height // 2))
+        # 4. Текст размеров в мм (автоматически прячем если деталь на экране слишком мелкая)
+        if width > 30 and height > 20:
+            text = self.render_text(self.small_font, f"{int(shape.width)}x{int(shape.height)}", (255, 255, 255))
+            text_rect = text.get_rect(center=(x + width // 2, y + height // 2))
             self.screen.blit(text, text_rect)
 
+    def _draw_simple(self, x, y, width, height, color, is_selected=False, is_valid=True):
+        """Упрощенная деталь (LOD при отдалении): одна заливка, без тени, скруглений и подписи"""
+        if width >= 4 and height >= 4:
+            # Вместо обводки - зазор в пиксель: соседние детали не сливаются, а вызов один
+            rect = (x, y, width - 1, height - 1)
+        else:
+            rect = (x, y, max(width, 1), max(height, 1))
+        pygame.draw.rect(self.screen, color if is_valid else (200, 50, 50), rect)
+        if is_selected or not is_valid:
+            pygame.draw.rect(self.screen, (255, 255, 255) if is_valid else COLORS['danger'], rect, 2)
+
+    def draw_shapes(self, shapes, validity, viewport):
+        """
+        Детали листа через окно просмотра. Вызывающий код передает только видимые детали,
+        поэтому стоимость кадра зависит от того, что на экране, а не от размера раскладки.
+        При отдалении (LOD) - плотный цикл без подписей и теней: десятки тысяч деталей.
+        """
+        if viewport.detailed:
+            for shape, is_valid in zip(shapes, validity):
+                self.draw_shape(shape, False, is_valid, viewport=viewport)
+            return
+        to_screen, draw_rect, screen = viewport.rect_to_screen, pygame.draw.rect, self.screen
+        for shape, is_valid in zip(shapes, validity):
+            x, y, width, height = to_screen(shape.x, shape.y, shape.width, shape.height)
+            if width >= 4 and height >= 4 and is_valid:
+                draw_rect(screen, shape.color, (x, y, width - 1, height - 1))
+            else:
+                self._draw_simple(x, y, width, height, shape.color, False, is_valid)
+
+    def draw_preview(self, x, y, width, height, color):
+        """Контур детали, которую фоновая упаковка уже разместила (до применения результата)"""
+        pygame.draw.rect(self.screen, color, (x, y, width, height), 1)
+
     def draw_sidebar(self, x, width, height, stats):
         # Фон сайдбара
         pygame.draw.rect(self.screen, COLORS['sidebar'], (x, 0, width, height))
         pygame.draw.line(self.screen, (20, 20, 20), (x, 0), (x, height), 2)
 
         # Заголовок
-        title = self.title_font.render("OPTIMIZER", True, COLORS['accent'])
+        title = self.render_text(self.title_font, "OPTIMIZER", COLORS['accent'])
         self.screen.blit(title, (x + 20, 30))
         
-        subtitle = self.font.render("Interactive Packing", True, COLORS['text_dim'])
+        subtitle = self.render_text(self.font, "Interactive Packing", COLORS['text_dim'])
         self.screen.blit(subtitle, (x + 20, 60))
 
+        # Номер листа (листание стрелками / PgUp, PgDn)
+        if stats.get('sheets', 1) > 1:
+            sheet_text = self.render_text(self.small_font, f"SHEET {stats['sheet']}/{stats['sheets']}   < / >", COLORS['accent'])
+            self.screen.blit(sheet_text, (x + 20, 90))
+
         # Карточка статистики
-        self._draw_stat_card(x + 20, 120, width - 40, "EFFICIENCY", f"{stats['efficiency']:.1f}%", 
-                             COLORS['success'] if stats['efficiency'] > 70 else COLORS['text_main'])
-        
-        self._draw_stat_card(x + 20, 200, width - 40, "PARTS PLACED", f"{stats['placed']}/{stats['total']}")
+        if 'progress' in stats:
+            # Идет фоновая упаковка
+            done, total = stats['progress']
+            percent = done / total * 100 if total else 0
+            self._draw_stat_card(x + 20, 120, width - 40, "PACKING...", f"{percent:.0f}%", COLORS['accent'])
+            self._draw_stat_card(x + 20, 200, width - 40, "PARTS PROCESSED", f"{done}/{total}")
+            pygame.draw.rect(self.screen, COLORS['accent'], (x + 20, 182, int((width - 40) * percent / 100), 4))
+        else:
+            self._draw_stat_card(x + 20, 120, width - 40, "EFFICIENCY", f"{stats['efficiency']:.1f}%", 
+                                 COLORS['success'] if stats['efficiency'] > 70 else COLORS['text_main'])
+            
+            self._draw_stat_card(x + 20, 200, width - 40, "PARTS PLACED", f"{stats['placed']}/{stats['total']}")
 
         # Инструкции
         y_help = height - 150
         help_lines = [
             "LMB: Move Part",
+            "Wheel / RMB: Zoom / Pan, F: Fit",
             "Ниже, то что не реализовано:",
-            "RMB: Rotate",  # TODO: "Не реализовано"
             "R: Reset All", # TODO: "Не реализовано"
             "G: Generate New" # TODO: "Не реализовано"
         ]
         
         pygame.draw.line(self.screen, COLORS['grid'], (x + 20, y_help - 20), (x + width - 20, y_help - 20), 1)
         for i, line in enumerate(help_lines):
-            t = self.small_font.render(line, True, COLORS['text_dim'])
+            t = self.render_text(self.small_font, line, COLORS['text_dim'])
             self.screen.blit(t, (x + 20, y_help + i * 25))
 
     def _draw_stat_card(self, x, y, w, title, value, value_color=COLORS['text_main']):
@@ -133,13 +264,25 @@ class Renderer:
         pygame.draw.rect(self.screen, (50, 54, 62), (x, y, w, 60), border_radius=8)
         
         # Заголовок
-        lbl = self.small_font.render(title, True, COLORS['text_dim'])
+        lbl = self.render_text(self.small_font, title, COLORS['text_dim'])
         self.screen.blit(lbl, (x + 10, y + 8))
         
         # Значение
-        val = self.title_font.render(value, True, value_color)
+        val = self.render_text(self.title_font, value, value_color)
         self.screen.blit(val, (x + 10, y + 25))
 
+    def draw_metrics(self, x, y, width, title, lines):
+        """Полупрозрачная панель метрик (оверлей F3). Возвращает Rect панели"""
+        height = 30 + max(len(lines), 1) * 16
+        panel = pygame.Surface((width, height), pygame.SRCALPHA)
+        panel.fill((20, 22, 28, 225))
+        self.screen.blit(panel, (x, y))
+        pygame.draw.rect(self.screen, COLORS['accent'], (x, y, width, height), 1, border_radius=4)
+        self.screen.blit(self.render_text(self.small_font, title, COLORS['accent']), (x + 8, y + 6))
+        for i, line in enumerate(lines or ["no samples yet"]):
+            self.screen.blit(self.render_text(self.small_font, line, COLORS['text_main']), (x + 8, y + 26 + i * 16))
+        return pygame.Rect(x, y, width, height)
+
     def draw_button(self, x, y, width, height, text, hover=False):
         color = COLORS['accent'] if not hover else (70, 170, 240) # Светлее при наведении
         
@@ -149,7 +292,7 @@ class Renderer:
         pygame.draw.rect(self.screen, color, (x, y, width, height), border_radius=6)
         
         # Текст
-        lbl = self.font.render(text, True, (255, 255, 255))
+        lbl = self.render_text(self.font, text, (255, 255, 255))
         lbl_rect = lbl.get_rect(center=(x + width // 2, y + height // 2))
         self.screen.blit(lbl, lbl_rect)
         
@@ -0,0 +1,76 @@
+import math
+from typing import Tuple
+
+
+class Viewport:
+    """
+    Окно просмотра листа: мировые координаты (мм от угла листа) <-> экранные пиксели.
+
+    screen = world * scale + offset. Реальные листы (3000x1500 и больше) не влезают
+    в окно 1:1, поэтому масштаб свободный: колесо мыши, перетаскивание ПКМ/СКМ, "вписать лист".
+    """
+
+    MIN_SCALE = 0.02
+    MAX_SCALE = 20.0
+    # Ниже этого масштаба детали рисуются упрощенно (LOD): без подписей, теней и скруглений
+    DETAIL_SCALE = 0.5
+
+    def __init__(self, scale: float = 1.0, offset_x: float = 0, offset_y: float = 0):
+        self.scale = scale
+        self.offset_x = offset_x
+        self.offset_y = offset_y
+
+    @property
+    def key(self) -> Tuple[float, float, float]:
+        """Состояние для ключей кэшей отрисовки"""
+        return (self.scale, self.offset_x, self.offset_y)
+
+    @property
+    def detailed(self) -> bool:
+        return self.scale >= self.DETAIL_SCALE
+
+    def to_screen(self, x: float, y: float) -> Tuple[float, float]:
+        return x * self.scale + self.offset_x, y * self.scale + self.offset_y
+
+    def to_world(self, px: float, py: float) -> Tuple[float, float]:
+        return (px - self.offset_x) / self.scale, (py - self.offset_y) / self.scale
+
+    def rect_to_screen(self, x: float, y: float, width: float, height: float) -> Tuple[int, int, int, int]:
+        """
+        Экранный прямоугольник в целых пикселях. Края округляются вниз (floor), а не отбрасыванием
+        дробной части, как делает pygame: иначе при сдвиге на целое число пикселей детали
+        слева/сверху от экрана (отрицательные координаты) "прыгали" бы на пиксель
+        """
+        left = math.floor(x * self.scale + self.offset_x)
+        top = math.floor(y * self.scale + self.offset_y)
+        return (left, top, math.floor((x + width) * self.scale + self.offset_x) - left,
+                math.floor((y + height) * self.scale + self.offset_y) - top)
+
+    def visible_world(self, area: Tuple[float, float, float, float]) -> Tuple[float, float, float, float]:
+        """Какая часть мира видна в экранной области area = (x, y, w, h)"""
+        x, y = self.to_world(area[0], area[1])
+        return x, y, area[2] / self.scale, area[3] / self.scale
+
+    def pan(self, dx: float, dy: float):
+        self.offset_x += dx
+        self.offset_y += dy
+
+    def zoom_at(self, factor: float, px: float, py: float):
+        """Масштабирование вокруг экранной точки (px, py): точка под курсором остается на месте"""
+        scale = min(self.MAX_SCALE, max(self.MIN_SCALE, self.scale * factor))
+        wx, wy = self.to_world(px, py)
+        self.scale = scale
+        self.offset_x = px - wx * scale
+        self.offset_y = py - wy * scale
+
+    def fit(self, width: float, height: float, area: Tuple[float, float, float, float],
+            padding: float = 50, max_scale: float = 1.0):
+        """
+        Вписывает лист width x height в экранную область area с отступом padding.
+        max_scale=1.0 - маленькие листы не растягиваем (800x600 остается 1:1, как раньше).
+        """
+        ax, ay, aw, ah = area
+        scale = min((aw - 2 * padding) / width, (ah - 2 * padding) / height, max_scale)
+        self.scale = max(self.MIN_SCALE, scale)
+        self.offset_x = ax + padding
+        self.offset_y = ay + padding